@@ -1,17 +1,105 @@
-from flask import Flask, request, send_from_directory, jsonify, abort
+from flask import Flask, Response, request, send_from_directory, jsonify, abort, stream_with_context
 from flask_cors import CORS
+import base64
+import binascii
+import json
 import os
-from database import Database
+import re
+from concurrent.futures import ThreadPoolExecutor
+from database import Database, ADAPTIVE_MAX_RADIUS, SEARCH_RADIUS
+from specialties import recommended_specialties
+
+from multiturn import run_web_prompt, sessions
+from session_store import new_session_id
+
+MAX_PAGE_SIZE = 100
+DEFAULT_ADAPTIVE_RESULTS = 20
+SESSION_COOKIE = "medlama_session"
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+    return offset if isinstance(offset, int) and offset >= 0 else None
+
+
+def read_page():
+    """Read the optional limit/cursor parameters, returning (limit, offset) or None when invalid"""
+    limit = request.args.get('limit', type=int)
+    cursor = request.args.get('cursor', type=str)
+    offset = decode_cursor(cursor) if cursor else 0
+
+    if offset is None or (limit is not None and not 0 < limit <= MAX_PAGE_SIZE):
+        return None
+    if cursor and limit is None:
+        limit = MAX_PAGE_SIZE
+    return limit, offset
+
+
+def paginate(fetch, limit, offset):
+    """Fetch one extra result to tell whether another page exists"""
+    if limit is None:
+        return fetch(None, 0)
+
+    results = fetch(limit + 1, offset)
+    return {
+        "results": results[:limit],
+        "next_cursor": encode_cursor(offset + limit) if len(results) > limit else None,
+    }
+
+
+def read_adaptive():
+    """Read k/max_radius for mode=adaptive, returning (k, max_radius) or None when invalid"""
+    k = request.args.get('limit', type=int, default=DEFAULT_ADAPTIVE_RESULTS)
+    max_radius = request.args.get('max_radius', type=float, default=ADAPTIVE_MAX_RADIUS)
+    if not 0 < k <= MAX_PAGE_SIZE or not 0 < max_radius <= ADAPTIVE_MAX_RADIUS:
+        return None
+    return k, max_radius
+
+
+def read_session_id():
+    """Session id from the session_id parameter or cookie, or a new one"""
+    session_id = request.args.get('session_id') or request.cookies.get(SESSION_COOKIE)
+    return session_id if session_id and SESSION_ID.match(session_id) else new_session_id()
+
+
+def with_session(result, session_id):
+    """JSON response carrying the session id, also set as a cookie for the next request"""
+    response = jsonify({**result, "session_id": session_id})
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="Lax")
+    return response
+
+
+def read_stream():
+    """Read limit/radius for format=ndjson, returning (limit, radius) or None when invalid"""
+    limit = request.args.get('limit', type=int)
+    radius = request.args.get('radius', type=float, default=SEARCH_RADIUS)
+    if (limit is not None and limit <= 0) or not 0 < radius <= ADAPTIVE_MAX_RADIUS:
+        return None
+    return limit, radius
 
-from multiturn import run_web_prompt
 
 class HooHacksApp:
     def __init__(self):
         self.app = Flask(__name__, static_folder="medLama/out", static_url_path="/")
         CORS(self.app)
         self.database = Database()
+        # Lets a single request run its doctor and health-center lookups side by side
+        self.executor = ThreadPoolExecutor(max_workers=int(os.environ.get("PROVIDER_LOOKUP_THREADS", 8)))
         self.setup_routes()
 
+    def ndjson(self, documents):
+        """Stream documents one JSON object per line as the generator produces them"""
+        lines = (self.app.json.dumps(document) + "\n" for document in documents)
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson")
+
     def setup_routes(self):
         @self.app.route('/')
         def index():
@@ -27,7 +115,29 @@ class HooHacksApp:
             if latitude is None or longitude is None:
                 return "Request must contain latitude and longitude", 400
 
-            return jsonify(self.database.get_doctors(latitude, longitude, specialty))
+            if request.args.get('mode') == 'adaptive':
+                adaptive = read_adaptive()
+                if adaptive is None:
+                    return f"limit must be between 1 and {MAX_PAGE_SIZE} and max_radius between 0 and {ADAPTIVE_MAX_RADIUS}", 400
+                k, max_radius = adaptive
+                results, meta = self.database.search_doctors(latitude, longitude, k, specialty, max_radius=max_radius)
+                return jsonify({"results": results, "meta": meta})
+
+            if request.args.get('format') == 'ndjson':
+                stream = read_stream()
+                if stream is None:
+                    return f"limit must be positive and radius between 0 and {ADAPTIVE_MAX_RADIUS}", 400
+                limit, radius = stream
+                return self.ndjson(self.database.iter_doctors(latitude, longitude, specialty, limit=limit, radius=radius))
+
+            page = read_page()
+            if page is None:
+                return f"limit must be between 1 and {MAX_PAGE_SIZE} and cursor must come from a previous response", 400
+
+            return jsonify(paginate(
+                lambda limit, offset: self.database.get_doctors(latitude, longitude, specialty, limit=limit, offset=offset),
+                *page
+            ))
 
         @self.app.route('/api/health-centers/')
         def get_health_centers():
@@ -37,16 +147,89 @@ class HooHacksApp:
             if latitude is None or longitude is None:
                 return "Request must contain latitude and longitude", 400
 
-            return jsonify(self.database.get_health_centers(latitude, longitude))
+            if request.args.get('mode') == 'adaptive':
+                adaptive = read_adaptive()
+                if adaptive is None:
+                    return f"limit must be between 1 and {MAX_PAGE_SIZE} and max_radius between 0 and {ADAPTIVE_MAX_RADIUS}", 400
+                k, max_radius = adaptive
+                results, meta = self.database.search_health_centers(latitude, longitude, k, max_radius=max_radius)
+                return jsonify({"results": results, "meta": meta})
+
+            if request.args.get('format') == 'ndjson':
+                stream = read_stream()
+                if stream is None:
+                    return f"limit must be positive and radius between 0 and {ADAPTIVE_MAX_RADIUS}", 400
+                limit, radius = stream
+                return self.ndjson(self.database.iter_health_centers(latitude, longitude, limit=limit, radius=radius))
+
+            page = read_page()
+            if page is None:
+                return f"limit must be between 1 and {MAX_PAGE_SIZE} and cursor must come from a previous response", 400
+
+            return jsonify(paginate(
+                lambda limit, offset: self.database.get_health_centers(latitude, longitude, limit=limit, offset=offset),
+                *page
+            ))
+
+        @self.app.route('/api/care-nearby/', methods=['GET', 'POST'])
+        def get_care_nearby():
+            # Analysis reports are long, so they can be POSTed as JSON instead of sent in the query string
+            body = request.get_json(silent=True) or {}
+            try:
+                latitude = float(body.get('latitude', request.args.get('latitude')))
+                longitude = float(body.get('longitude', request.args.get('longitude')))
+            except (TypeError, ValueError):
+                return "Request must contain latitude and longitude", 400
+
+            limit = body.get('limit', request.args.get('limit', type=int, default=DEFAULT_ADAPTIVE_RESULTS))
+            if not isinstance(limit, int) or not 0 < limit <= MAX_PAGE_SIZE:
+                return f"limit must be between 1 and {MAX_PAGE_SIZE}", 400
+
+            specialty = body.get('specialty', request.args.get('specialty', type=str, default=None))
+            report = body.get('report', request.args.get('report', type=str, default=None))
+            specialties = recommended_specialties(report) if report and not specialty else []
+            if specialties:
+                specialty = " ".join(specialties)
+
+            doctors = self.executor.submit(self.database.get_doctors, latitude, longitude, specialty, limit=limit)
+            health_centers = self.executor.submit(self.database.get_health_centers, latitude, longitude, limit=limit)
+
+            doctors = doctors.result()
+            if specialties and not doctors:
+                # Nobody nearby practises what the report recommends; show every nearby doctor instead
+                specialties = []
+                doctors = self.database.get_doctors(latitude, longitude, limit=limit)
+
+            results = [{**doctor, "type": "doctor"} for doctor in doctors]
+            results += [{**health_center, "type": "health_center"} for health_center in health_centers.result()]
+            results.sort(key=lambda x: x["distance"])
+
+            return jsonify({"results": results, "specialties": specialties})
+
+        @self.app.route('/api/health/ready')
+        def ready():
+            if self.database.ready():
+                return jsonify({"status": "ready"})
+            return jsonify({"status": "unavailable", "detail": self.database.ping()}), 503
+
+        @self.app.route('/api/providers/cache/')
+        def provider_cache_stats():
+            return jsonify(self.database.cache_stats())
 
         @self.app.route('/api/llm/response/')
         def prompt():
             message = request.args.get("message", type=str, default="")
-            return jsonify(run_web_prompt(message))
+            session_id = read_session_id()
+            return with_session(run_web_prompt(message, session_id), session_id)
 
         @self.app.route('/api/llm/delete/')
         def delete_conversation():
-            return jsonify(run_web_prompt("exit"))
+            session_id = read_session_id()
+            return with_session(run_web_prompt("exit", session_id), session_id)
+
+        @self.app.route('/api/llm/sessions/')
+        def llm_session_stats():
+            return jsonify(sessions.stats())
 
         @self.app.route('/<path:path>')
         def serve_static_files(path):
@@ -1,79 +1,381 @@
+import heapq
 import os
-from pymongo import MongoClient
-from pymongo.errors import ConnectionFailure
+import threading
+import time
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import PyMongoError
 from pymongo.server_api import ServerApi
 
+from provider_cache import ProviderCache
+from spatial_index import INTERNAL_FIELDS, CollectionIndex, haversine_meters, planar_distance
+from specialties import normalize_specialty
+
+PROVIDER_COLLECTIONS = ("doctors", "health_centers")
+
+# Half-width of the search box in degrees; $geoNear converts it to metres
+METERS_PER_DEGREE = 111_320
+SEARCH_RADIUS = 0.1
+
+# Adaptive search starts with a small box and doubles it until enough providers are found
+ADAPTIVE_START_RADIUS = 0.01
+ADAPTIVE_MAX_RADIUS = 1.0
+
+# Every backend returns the same public document shape; the index strips the same fields in memory
+PUBLIC_PROJECTION = {field: 0 for field in INTERNAL_FIELDS}
+
+# Upper bound on documents returned by a single $geoNear lookup
+GEO_NEAR_LIMIT = int(os.environ.get("PROVIDER_GEONEAR_LIMIT", 200))
+
+# Documents fetched per round-trip when streaming $geoNear results
+STREAM_BATCH_SIZE = 50
+
+# Response cache for MongoDB-backed lookups; a size of 0 disables it
+PROVIDER_CACHE_SIZE = int(os.environ.get("PROVIDER_CACHE_SIZE", 1024))
+PROVIDER_CACHE_TTL = float(os.environ.get("PROVIDER_CACHE_TTL", 300))
+
+# How often to look for provider collection changes made by other processes
+CACHE_VERSION_CHECK_SECONDS = 5
+
+# Connection pool and timeout settings; reads are retried once across a failover or dropped socket
+CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.environ.get("DATABASE_POOL_SIZE", 50)),
+    "minPoolSize": int(os.environ.get("DATABASE_MIN_POOL_SIZE", 0)),
+    "maxIdleTimeMS": int(os.environ.get("DATABASE_MAX_IDLE_MS", 60_000)),
+    "waitQueueTimeoutMS": int(os.environ.get("DATABASE_WAIT_QUEUE_TIMEOUT_MS", 2_000)),
+    "serverSelectionTimeoutMS": int(os.environ.get("DATABASE_SERVER_SELECTION_TIMEOUT_MS", 5_000)),
+    "connectTimeoutMS": int(os.environ.get("DATABASE_CONNECT_TIMEOUT_MS", 5_000)),
+    "socketTimeoutMS": int(os.environ.get("DATABASE_SOCKET_TIMEOUT_MS", 10_000)),
+    "retryReads": True,
+    "retryWrites": True,
+}
+
 class Database:
-    def __init__(self):
-        try:
-            self.client = MongoClient(os.environ["database-connection-string"], server_api=ServerApi('1'))
-            self.database = self.client.get_database("main")
-        except Exception as e:
-            print(f"---ERROR--- Failed to connect to MongoDB: {e}")
-            self.client = None
-            self.database = None
+    def __init__(self, backend=None, connection_string=None, **client_options):
+        # "box" queries MongoDB on every request, "index" answers from an in-memory spatial index,
+        # "geonear" runs a $geoNear aggregation against a 2dsphere index (see migrate_geojson)
+        self.backend = backend or os.environ.get("PROVIDER_BACKEND", "box")
+        self.connection_string = connection_string or os.environ.get("database-connection-string")
+        # Shared with the AI service, which reads the provider collections from the same database
+        self.database_name = os.environ.get("MONGODB_DATABASE", "main")
+        self.client_options = {**CLIENT_OPTIONS, **client_options}
+        self.indexes = {}
+        self.cache = ProviderCache(PROVIDER_CACHE_SIZE, PROVIDER_CACHE_TTL) if PROVIDER_CACHE_SIZE > 0 else None
+        self._versions = {}
+        self._versions_checked_at = float("-inf")
+        self._client = None
+        self._client_lock = threading.Lock()
+
+        # The index backend has to load every provider up front; everything else connects on first use
+        if self.backend == "index":
+            self.start_spatial_indexes()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    if not self.connection_string:
+                        raise RuntimeError("database-connection-string is not set")
+                    self._client = MongoClient(self.connection_string, server_api=ServerApi('1'), **self.client_options)
+        return self._client
+
+    @property
+    def database(self):
+        return self.client.get_database(self.database_name)
+
+    def close(self):
+        for index in self.indexes.values():
+            index.stop()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    def start_spatial_indexes(self):
+        refresh_interval = float(os.environ.get("PROVIDER_INDEX_REFRESH_SECONDS", 30))
+        for name in PROVIDER_COLLECTIONS:
+            try:
+                index = CollectionIndex(self.database[name], refresh_interval=refresh_interval)
+                index.start()
+                self.indexes[name] = index
+            except Exception as e:
+                print(f"---ERROR--- Failed to build spatial index for {name}, falling back to MongoDB: {e}")
 
     def ping(self):
-        if not self.client:
+        if not self.connection_string:
             return "Database connection not initialized."
         try:
             self.client.admin.command('ping')
             return "Database connection successful!"
-        except ConnectionFailure as e:
+        except PyMongoError as e:
             return f"---ERROR--- Database connection failed: {e}"
 
-    def get_doctors(self, latitude, longitude, specialty=None):
+    def ready(self):
+        """Readiness probe: True when a pooled connection can reach the server"""
+        if not self.connection_string:
+            return False
+        try:
+            self.client.admin.command('ping')
+            return True
+        except PyMongoError:
+            return False
+
+    def mark_changed(self, name):
+        """Record that a provider collection changed so every process drops its cached lookups"""
+        self.database.provider_versions.update_one({"_id": name}, {"$inc": {"version": 1}}, upsert=True)
+        if self.cache:
+            self.cache.invalidate(name)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache else {"enabled": False}
+
+    def _sync_cache_versions(self):
+        now = time.monotonic()
+        if now < self._versions_checked_at + CACHE_VERSION_CHECK_SECONDS:
+            return
+        self._versions_checked_at = now
+        for version in self.database.provider_versions.find({}):
+            name = version["_id"]
+            # A version document that first appears also counts: entries cached before it may be stale
+            if self._versions.get(name) != version["version"]:
+                self.cache.invalidate(name)
+            self._versions[name] = version["version"]
+
+    def ensure_indexes(self):
+        """Create every index the provider lookups use; safe to call repeatedly"""
+        for name in PROVIDER_COLLECTIONS:
+            self.database[name].create_index([("location", "2dsphere")])
+        doctors = self.database.doctors
+        doctors.create_index([("specialty_tokens", 1), ("latitude", 1), ("longitude", 1)])
+        doctors.create_index([("location", "2dsphere"), ("specialty_tokens", 1)])
+
+    def migrate_geojson(self):
+        """Add GeoJSON ``location`` points to existing providers and build the 2dsphere indexes."""
+        results = {}
+        for name in PROVIDER_COLLECTIONS:
+            collection = self.database[name]
+            # A pipeline update runs entirely on the server, so no documents travel to the client
+            result = collection.update_many(
+                {
+                    "location": {"$exists": False},
+                    "latitude": {"$type": "number"},
+                    "longitude": {"$type": "number"},
+                },
+                [{"$set": {"location": {"type": "Point", "coordinates": ["$longitude", "$latitude"]}}}],
+            )
+            collection.create_index([("location", "2dsphere")])
+            results[name] = result.modified_count
+            self.mark_changed(name)
+        return results
+
+    def migrate_specialty_tokens(self, batch_size=1000):
+        """Fill or refresh ``specialty_tokens`` on existing doctors and build the multikey indexes that serve specialty filters."""
+        doctors = self.database.doctors
+        modified = 0
+        batch = []
+        for doctor in doctors.find({}, {"specialty": 1, "specialty_tokens": 1}):
+            # Rerun after changing the normalization rules; only stale documents are rewritten
+            tokens = normalize_specialty(doctor.get("specialty"))
+            if doctor.get("specialty_tokens") == tokens:
+                continue
+            batch.append(UpdateOne({"_id": doctor["_id"]}, {"$set": {"specialty_tokens": tokens}}))
+            if len(batch) >= batch_size:
+                modified += doctors.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            modified += doctors.bulk_write(batch, ordered=False).modified_count
+
+        # Equality on the token first, then the coordinate ranges, for the box backend;
+        # a compound 2dsphere index for $geoNear
+        doctors.create_index([("specialty_tokens", 1), ("latitude", 1), ("longitude", 1)])
+        doctors.create_index([("location", "2dsphere"), ("specialty_tokens", 1)])
+        self.mark_changed("doctors")
+        return {"doctors": modified}
+
+    def _geo_near(self, collection, latitude, longitude, query=None, limit=None, offset=0, radius=SEARCH_RADIUS, inner_radius=0):
+        return list(self._geo_near_cursor(
+            collection, latitude, longitude, query,
+            limit=min(limit, GEO_NEAR_LIMIT) if limit else GEO_NEAR_LIMIT,
+            offset=offset, radius=radius, inner_radius=inner_radius
+        ))
+
+    def _geo_near_cursor(self, collection, latitude, longitude, query=None, limit=None, offset=0, radius=SEARCH_RADIUS, inner_radius=0, batch_size=None):
+        # Results come back ordered by great-circle distance, reported in metres
+        stage = {
+            "near": {"type": "Point", "coordinates": [longitude, latitude]},
+            "distanceField": "distance",
+            "maxDistance": radius * METERS_PER_DEGREE,
+            "spherical": True,
+        }
+        if inner_radius:
+            stage["minDistance"] = inner_radius * METERS_PER_DEGREE
+        if query:
+            stage["query"] = query
+
+        pipeline = [{"$geoNear": stage}]
+        if offset:
+            pipeline.append({"$skip": offset})
+        if limit:
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": PUBLIC_PROJECTION})
+
+        if batch_size:
+            return collection.aggregate(pipeline, batchSize=batch_size)
+        return collection.aggregate(pipeline)
+
+    def _box(self, collection, latitude, longitude, query=None, limit=None, offset=0, radius=SEARCH_RADIUS, inner_radius=0):
         parameters = {
-            "latitude": { "$lt": latitude + 0.1, "$gt": latitude - 0.1 },
-            "longitude": { "$lt": longitude + 0.1, "$gt": longitude - 0.1 },
+            "latitude": { "$lt": latitude + radius, "$gt": latitude - radius },
+            "longitude": { "$lt": longitude + radius, "$gt": longitude - radius },
         }
+        if inner_radius:
+            # Only fetch the ring between the inner and outer box
+            parameters["$nor"] = [{
+                "latitude": { "$lt": latitude + inner_radius, "$gt": latitude - inner_radius },
+                "longitude": { "$lt": longitude + inner_radius, "$gt": longitude - inner_radius },
+            }]
+        if query:
+            parameters.update(query)
 
-        if latitude is None or longitude is None:
-            return "Request must contain latitude and longitude", 400
+        results = []
+        for document in collection.find(parameters, PUBLIC_PROJECTION):
+            document["distance"] = ((document["latitude"] - latitude) ** 2 + (document["longitude"] - longitude) ** 2) ** 0.5
+            results.append(document)
 
-        query = self.database.database.doctors.find(
-            parameters,
-            {"_id": 0}
-        )
+        # The box cannot be sorted by distance server-side, so select the top-k instead of sorting everything
+        if limit:
+            return heapq.nsmallest(offset + limit, results, key=lambda x: x["distance"])[offset:]
+        results.sort(key=lambda x: x["distance"])
+        return results[offset:]
 
-        doctors = []
-        for doctor in query:
-            doctor["distance"] = ((doctor["latitude"] - latitude) ** 2 + (doctor["longitude"] - longitude) ** 2) ** 0.5
-            doctors.append(doctor)
-        doctors.sort(key=lambda x: x["distance"])
+    def _nearby(self, name, latitude, longitude, query=None, predicate=None, limit=None, offset=0, radius=SEARCH_RADIUS, inner_radius=0):
+        if name in self.indexes:
+            k = offset + limit if limit else None
+            return self.indexes[name].nearest(
+                latitude, longitude, k=k, radius=radius, inner_radius=inner_radius, predicate=predicate
+            )[offset:]
 
-        if specialty:
-            regex_conditions = [{"specialty": {"$regex": word, "$options": "i"}} for word in specialty.split()]
-            parameters["$or"] = regex_conditions
+        if self.backend == "geonear":
+            return self._geo_near(
+                self.database[name], latitude, longitude, query,
+                limit=limit, offset=offset, radius=radius, inner_radius=inner_radius
+            )
 
-        query = self.database.doctors.find(
-            parameters,
-            {"_id": 0}
+        return self._box(
+            self.database[name], latitude, longitude, query,
+            limit=limit, offset=offset, radius=radius, inner_radius=inner_radius
         )
 
-        doctors = []
-        for doctor in query:
-            doctor["distance"] = ((doctor["latitude"] - latitude) ** 2 + (doctor["longitude"] - longitude) ** 2) ** 0.5
-            doctors.append(doctor)
-        doctors.sort(key=lambda x: x["distance"])
+    def _iter_nearby(self, name, latitude, longitude, query=None, predicate=None, limit=None, radius=SEARCH_RADIUS):
+        """Yield providers closest first without building the whole result list up front"""
+        if name in self.indexes:
+            yield from self.indexes[name].nearest(latitude, longitude, k=limit, radius=radius, predicate=predicate)
+        elif self.backend == "geonear":
+            # $geoNear already sorts, so documents can be forwarded batch by batch as the cursor fills
+            yield from self._geo_near_cursor(
+                self.database[name], latitude, longitude, query,
+                limit=limit, radius=radius, batch_size=STREAM_BATCH_SIZE
+            )
+        else:
+            # The box query cannot be sorted by distance server-side, so it is ranked before streaming
+            yield from self._box(self.database[name], latitude, longitude, query, limit=limit, radius=radius)
 
-        return doctors
+    def _cached_nearby(self, name, latitude, longitude, query=None, predicate=None, tokens=(), limit=None, offset=0):
+        if self.cache is None or name in self.indexes:
+            return self._nearby(name, latitude, longitude, query, predicate, limit=limit, offset=offset)
 
-    def get_health_centers(self, latitude, longitude):
-        parameters = {
-            "latitude": { "$lt": latitude + 0.1, "$gt": latitude - 0.1 },
-            "longitude": { "$lt": longitude + 0.1, "$gt": longitude - 0.1 },
-        }
+        self._sync_cache_versions()
+        key = self.cache.key(name, latitude, longitude, tokens)
+        candidates = self.cache.get(key)
+        if candidates is None:
+            # Widen the search around the cell centre so the entry covers every point in the cell
+            center_latitude, center_longitude = self.cache.cell_center(latitude, longitude)
+            candidates = self._nearby(
+                name, center_latitude, center_longitude, query, predicate,
+                radius=SEARCH_RADIUS + self.cache.cell_size
+            )
+            if self.backend == "geonear" and len(candidates) >= GEO_NEAR_LIMIT:
+                # $geoNear stopped at its cap, so the entry would miss providers near this cell's edges
+                # and beyond the cap; answer from the exact coordinates and leave it uncached
+                return self._nearby(name, latitude, longitude, query, predicate, limit=limit, offset=offset)
+            self.cache.put(key, candidates)
+
+        # Re-rank against the exact coordinates and drop anything outside this user's search area
+        results = []
+        for candidate in candidates:
+            if self.backend == "geonear":
+                distance = haversine_meters(latitude, longitude, candidate["latitude"], candidate["longitude"])
+                if distance > SEARCH_RADIUS * METERS_PER_DEGREE:
+                    continue
+            else:
+                if abs(candidate["latitude"] - latitude) >= SEARCH_RADIUS or abs(candidate["longitude"] - longitude) >= SEARCH_RADIUS:
+                    continue
+                distance = planar_distance(latitude, longitude, candidate["latitude"], candidate["longitude"])
+            results.append({**candidate, "distance": distance})
+
+        if limit:
+            return heapq.nsmallest(offset + limit, results, key=lambda x: x["distance"])[offset:]
+        results.sort(key=lambda x: x["distance"])
+        return results[offset:]
 
-        query = self.database.health_centers.find(
-            parameters,
-            {"_id": 0}
+    def _search_adaptive(self, name, latitude, longitude, k, query=None, predicate=None, max_radius=ADAPTIVE_MAX_RADIUS):
+        """Widen the search ring by ring until k providers are found or max_radius is reached.
+
+        Returns the k nearest results and metadata with the number of queries issued and the
+        radius (in degrees) that was reached.
+        """
+        # Distances are reported in metres by $geoNear and in degrees everywhere else
+        scale = METERS_PER_DEGREE if self.backend == "geonear" and name not in self.indexes else 1
+        radius = min(ADAPTIVE_START_RADIUS, max_radius)
+        inner_radius = 0
+        results = []
+        queries = 0
+
+        while True:
+            results.extend(self._nearby(
+                name, latitude, longitude, query, predicate, radius=radius, inner_radius=inner_radius
+            ))
+            queries += 1
+
+            # A box ring can hold results further away than the next ring's nearest point,
+            # so only results within the searched radius count as settled.
+            settled = sum(1 for result in results if result["distance"] <= radius * scale)
+            if settled >= k or radius >= max_radius:
+                break
+            inner_radius, radius = radius, min(radius * 2, max_radius)
+
+        return heapq.nsmallest(k, results, key=lambda x: x["distance"]), {"queries": queries, "radius": radius}
+
+    def _specialty_filter(self, specialty):
+        tokens = normalize_specialty(specialty)
+        if not tokens:
+            return None, None
+        query = {"specialty_tokens": {"$in": tokens}}
+        wanted = set(tokens)
+        predicate = lambda doctor: not wanted.isdisjoint(doctor.get("specialty_tokens") or ())
+        return query, predicate
+
+    def get_doctors(self, latitude, longitude, specialty=None, limit=None, offset=0):
+        if latitude is None or longitude is None:
+            return "Request must contain latitude and longitude", 400
+
+        query, predicate = self._specialty_filter(specialty)
+        return self._cached_nearby(
+            "doctors", latitude, longitude, query, predicate, normalize_specialty(specialty), limit=limit, offset=offset
         )
 
-        health_centers = []
-        for health_center in query:
-            health_center["distance"] = ((health_center["latitude"] - latitude) ** 2 + (health_center["longitude"] - longitude) ** 2) ** 0.5
-            health_centers.append(health_center)
-        health_centers.sort(key=lambda x: x["distance"])
+    def get_health_centers(self, latitude, longitude, limit=None, offset=0):
+        return self._cached_nearby("health_centers", latitude, longitude, limit=limit, offset=offset)
+
+    def search_doctors(self, latitude, longitude, k, specialty=None, max_radius=ADAPTIVE_MAX_RADIUS):
+        query, predicate = self._specialty_filter(specialty)
+        return self._search_adaptive("doctors", latitude, longitude, k, query, predicate, max_radius=max_radius)
+
+    def search_health_centers(self, latitude, longitude, k, max_radius=ADAPTIVE_MAX_RADIUS):
+        return self._search_adaptive("health_centers", latitude, longitude, k, max_radius=max_radius)
+
+    def iter_doctors(self, latitude, longitude, specialty=None, limit=None, radius=SEARCH_RADIUS):
+        query, predicate = self._specialty_filter(specialty)
+        return self._iter_nearby("doctors", latitude, longitude, query, predicate, limit=limit, radius=radius)
 
-        return health_centers
\ No newline at end of file
+    def iter_health_centers(self, latitude, longitude, limit=None, radius=SEARCH_RADIUS):
+        return self._iter_nearby("health_centers", latitude, longitude, limit=limit, radius=radius)
@@ -0,0 +1,103 @@
+import csv
+import json
+import time
+from datetime import datetime, timezone
+from itertools import islice
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from provider_cache import quantize
+from specialties import normalize_specialty
+
+# Cell size used for the precomputed geo_cell field, the same as the response cache
+GEO_CELL_SIZE = 0.01
+
+DEFAULT_KEY_FIELDS = ("name", "address")
+
+
+def read_rows(path):
+    """Stream provider rows from a CSV or JSONL file without loading it into memory"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(handle)
+
+
+def prepare(row, collection, loaded_at):
+    """Coerce coordinates and precompute the fields lookups rely on; None for rows without a location"""
+    try:
+        latitude = float(row["latitude"])
+        longitude = float(row["longitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+    document = {key: value for key, value in row.items() if key != "_id" and value not in (None, "")}
+    cell = quantize(latitude, longitude, GEO_CELL_SIZE)
+    document.update({
+        "latitude": latitude,
+        "longitude": longitude,
+        "location": {"type": "Point", "coordinates": [longitude, latitude]},
+        "geo_cell": f"{cell[0]}:{cell[1]}",
+        "updated_at": loaded_at,
+    })
+    if collection == "doctors":
+        document["specialty_tokens"] = normalize_specialty(document.get("specialty"))
+    return document
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def ingest(database, collection, path, key_fields=DEFAULT_KEY_FIELDS, batch_size=1000, report=print):
+    """Upsert providers from ``path`` into ``collection`` in unordered batches.
+
+    Returns counts of rows read, skipped, failed, inserted and updated, plus the rate in rows per second.
+    """
+    target = database.database[collection]
+    database.ensure_indexes()
+    target.create_index([(field, 1) for field in key_fields])
+
+    stats = {"rows": 0, "skipped": 0, "errors": 0, "inserted": 0, "updated": 0}
+    started = time.perf_counter()
+
+    for batch in batches(read_rows(path), batch_size):
+        # Stamped per batch so the spatial index refresher can follow a long-running ingest
+        loaded_at = datetime.now(timezone.utc)
+        operations = []
+        for row in batch:
+            document = prepare(row, collection, loaded_at)
+            if document is None or any(field not in document for field in key_fields):
+                stats["skipped"] += 1
+                continue
+            key = {field: document[field] for field in key_fields}
+            operations.append(UpdateOne(key, {"$set": document}, upsert=True))
+
+        stats["rows"] += len(batch)
+        if operations:
+            # Unordered writes let the server apply the batch in parallel and keep going past bad rows
+            try:
+                result = target.bulk_write(operations, ordered=False).bulk_api_result
+            except BulkWriteError as e:
+                result = e.details
+                stats["errors"] += len(result["writeErrors"])
+            stats["inserted"] += result["nUpserted"]
+            stats["updated"] += result["nModified"]
+
+        elapsed = time.perf_counter() - started
+        report(f"{collection}: {stats['rows']} rows ({stats['rows'] / elapsed:.0f} rows/s)")
+
+    elapsed = time.perf_counter() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["rows"] / elapsed) if elapsed else 0
+    database.mark_changed(collection)
+    return stats
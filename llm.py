@@ -1,11 +1,10 @@
 import os
 import sys
-import time
 import requests
-from functools import wraps
 from typing import List, Dict, Any
 from typing_extensions import Annotated, TypedDict
 from dotenv import load_dotenv
+from rate_limiter import api_rate_limit
 from operator import itemgetter
 
 import google.api_core.exceptions
@@ -41,23 +40,11 @@ env_vars = init_environment()
 GEMINI_API_KEY = env_vars['GEMINI_API_KEY']
 PERPLEXITY_API_KEY = env_vars['PERPLEXITY_API_KEY']
 
-# Rate Limiting Decorator
-# Prevents API rate limit issues by adding delays between calls
-def api_rate_limit(seconds: int = 2):
-    """Decorator to add sleep time between API calls"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            time.sleep(seconds)  # Wait before making the API call
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
-
 # Medical Research Tool
 # Queries Perplexity API for medical information with specific parameters
 # Important: Switch order of decorators - @tool must be the innermost decorator
 @tool
-@api_rate_limit(1)
+@api_rate_limit("perplexity", tokens=lambda query: len(query) // 4 + 2048)
 def perplexity_research(query: str) -> str:
     """Research medical conditions using Perplexity API."""
     headers = {
@@ -123,7 +110,7 @@ class State(TypedDict):
 
 # Initial Conversation Handler
 # Processes user input and generates initial response
-@api_rate_limit(1)
+@api_rate_limit("gemini")
 def intake_conversation(state: State):
     """Initial conversation to gather symptom information"""
     current_messages = state["messages"]
@@ -141,8 +128,6 @@ def intake_conversation(state: State):
 # Research Determination
 # Analyzes symptoms and queries medical research
 # Modify the determine_research_needs function to explicitly use the tool:
-@api_rate_limit(1)
-@api_rate_limit(1)
 def determine_research_needs(state: State):
     """Determine what medical conditions to research and fetch data."""
     messages = state["messages"]
@@ -165,7 +150,7 @@ def determine_research_needs(state: State):
 
 # Analysis Generation
 # Processes research data and generates medical analysis
-@api_rate_limit(1)
+@api_rate_limit("gemini")
 def generate_analysis(state: State):
     """Generate medical condition analysis with confidence scores"""
     research_data = state.get('research_results', {}).get('medical_research', 'No research data available')
@@ -183,7 +168,7 @@ def generate_analysis(state: State):
 
 # Final Response Formation
 # Creates structured medical report with disclaimers
-@api_rate_limit(1)
+@api_rate_limit("gemini")
 def final_response(state: State):
     """Formulate final response with analysis and disclaimer"""
     summary_prompt = (
@@ -0,0 +1,53 @@
+import argparse
+import json
+
+from database import Database, PROVIDER_COLLECTIONS
+from ingest import DEFAULT_KEY_FIELDS, ingest
+
+
+def migrate_geo(database, args):
+    print(json.dumps({"modified": database.migrate_geojson()}, indent=2))
+
+
+def migrate_specialties(database, args):
+    print(json.dumps({"modified": database.migrate_specialty_tokens()}, indent=2))
+
+
+def ingest_providers(database, args):
+    stats = ingest(database, args.collection, args.path, key_fields=args.key, batch_size=args.batch_size)
+    print(json.dumps(stats, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance commands for the provider database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser(
+        "migrate-geo",
+        help="Add GeoJSON location fields to doctors and health_centers and build 2dsphere indexes",
+    ).set_defaults(handler=migrate_geo)
+
+    commands.add_parser(
+        "migrate-specialties",
+        help="Add or refresh normalized specialty_tokens on doctors and build the specialty indexes",
+    ).set_defaults(handler=migrate_specialties)
+
+    ingest_parser = commands.add_parser(
+        "ingest",
+        help="Upsert providers from a CSV or JSONL file",
+    )
+    ingest_parser.add_argument("collection", choices=PROVIDER_COLLECTIONS)
+    ingest_parser.add_argument("path", help="CSV file, or JSONL file ending in .jsonl/.ndjson")
+    ingest_parser.add_argument("--key", nargs="+", default=list(DEFAULT_KEY_FIELDS), help="Fields identifying a provider")
+    ingest_parser.add_argument("--batch-size", type=int, default=1000)
+    ingest_parser.set_defaults(handler=ingest_providers)
+
+    args = parser.parse_args(argv)
+    database = Database(backend="box")
+    if not database.ready():
+        parser.exit(1, f"{database.ping()}\n")
+    args.handler(database, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,7 +14,7 @@ import { Bot, Send, User, ArrowRight, Moon, Sun, Stethoscope, Video, Clock, Arro
 import { SeverityIndicator } from "@/components/severity-indicator";
 import { useTheme } from "next-themes";
 import type { Doctor, SymptomAnalysis, Message, Conversation, EmergencyFacility } from "@/lib/types";
-import { findAvailableDoctors, findNearbyHospitals } from "@/lib/analysis";
+import { findCareNearby } from "@/lib/analysis";
 
 // UI stage types for main app view
 type Stage = "chat" | "analysis" | "doctors" | "history";
@@ -122,8 +122,9 @@ export default function Home() {
         };
 
         setAnalysis(result);
-        setDoctors(await findAvailableDoctors(""));
-        setFacilities(await findNearbyHospitals());
+        const care = await findCareNearby(jsonResponse.messages);
+        setDoctors(care.doctors);
+        setFacilities(care.facilities);
 
         setStage("analysis");
       }
@@ -262,8 +263,10 @@ export default function Home() {
       };
 
       setAnalysis(result);
-      setDoctors(await findAvailableDoctors(""));
-      setFacilities(await findNearbyHospitals());
+      // The last chat message is not an analysis report, so there are no recommendations to filter by
+      const care = await findCareNearby();
+      setDoctors(care.doctors);
+      setFacilities(care.facilities);
       // Add a slight delay to simulate processing and make it feel interactive
       setTimeout(() => {
         setStage("analysis");
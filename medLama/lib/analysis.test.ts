@@ -1,4 +1,4 @@
-import { analyzeData, findAvailableDoctors, findNearbyHospitals } from './analysis';
+import { analyzeData, findAvailableDoctors, findCareNearby, findNearbyHospitals } from './analysis';
 
 describe('analyzeData', () => {
   it('returns expected result for valid input', () => {
@@ -73,4 +73,29 @@ describe('findNearbyHospitals', () => {
     expect(hospitals[0]).toHaveProperty('name');
   });
 });
+
+describe('findCareNearby', () => {
+  beforeEach(() => {
+    global.fetch = jest.fn(() => Promise.resolve({
+      ok: true,
+      status: 200,
+      json: () => Promise.resolve({
+        results: [
+          { name: 'Dr. Smith', specialty: 'cardiology', type: 'doctor' },
+          { name: 'General Hospital', type: 'health_center' },
+        ],
+        specialties: ['cardiology'],
+      }),
+    } as Response));
+  });
+  afterEach(() => {
+    jest.resetAllMocks();
+  });
+  it('splits the merged results into doctors and facilities', async () => {
+    const care = await findCareNearby('See a cardiologist.');
+    expect(global.fetch).toHaveBeenCalledTimes(1);
+    expect(care.doctors[0]).toHaveProperty('name', 'Dr. Smith');
+    expect(care.facilities[0]).toHaveProperty('name', 'General Hospital');
+  });
+});
 // Removed duplicate test blocks and imports
@@ -26,4 +26,22 @@ export async function findNearbyHospitals(latitude: number = 38.02931000, longit
     console.log(err);
   }
   return [];
-}
\ No newline at end of file
+}
+
+export async function findCareNearby(report: string = "", latitude: number = 38.02931000, longitude: number = -78.47668000): Promise<{ doctors: Doctor[]; facilities: EmergencyFacility[] }> {
+  try {
+    const res = await fetch(`/api/care-nearby/`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ latitude, longitude, report }),
+    });
+    const { results } = await res.json();
+    return {
+      doctors: results.filter((result: any) => result.type === "doctor"),
+      facilities: results.filter((result: any) => result.type === "health_center"),
+    };
+  } catch (err) {
+    console.log(err);
+  }
+  return { doctors: [], facilities: [] };
+}
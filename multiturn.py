@@ -1,10 +1,11 @@
 import os
-import time
+import json
 import requests
-from functools import wraps
 from typing import List, Dict, Any
 from typing_extensions import Annotated, TypedDict
 from dotenv import load_dotenv
+from rate_limiter import api_rate_limit
+from session_store import SessionStore
 from langgraph.errors import GraphRecursionError
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import tool
@@ -49,20 +50,9 @@ def init_environment():
 
     return required_vars
 
-# Rate Limiting Decorator
-def api_rate_limit(seconds: int = 2):
-    """Decorator to add sleep time between API calls"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            time.sleep(seconds)  # Wait before making the API call
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
-
 # Medical Research Tool
 @tool
-@api_rate_limit(2)
+@api_rate_limit("perplexity", tokens=lambda query: len(query) // 4 + 2048)
 def perplexity_research(query: str) -> str:
     """Research medical conditions using Perplexity API."""
     headers = {
@@ -123,6 +113,11 @@ llm = ChatGoogleGenerativeAI(
 tools = [perplexity_research]
 llm_with_tools = llm.bind_tools(tools=tools)
 
+@api_rate_limit("gemini")
+def invoke_llm(prompt):
+    """Call Gemini; every request waits for the Gemini budget, however many a node makes"""
+    return llm.invoke(prompt)
+
 # State Management
 class State(TypedDict):
     messages: Annotated[List[Dict[str, Any]], "Chat messages"]
@@ -143,36 +138,67 @@ def format_conversation_history(messages):
         formatted += f"{role}: {msg['content']}\n\n"
     return formatted
 
-def extract_symptom_details(messages):
-    """Extract symptom information from user messages to update the symptom_details"""
-    # Combine all user messages to analyze
-    all_user_input = " ".join([msg["content"] for msg in messages if msg["role"] == "user"])
-
-    # Use the LLM to extract structured symptom information
+# Symptom profile fields: lists gain new entries, text fields are replaced by newer values
+PROFILE_LIST_FIELDS = ("symptoms", "modifiers", "history")
+PROFILE_TEXT_FIELDS = ("onset", "severity")
+
+def merge_symptom_profile(profile, update):
+    """Merge newly extracted details into a symptom profile dict"""
+    merged = {name: list(profile.get(name, [])) for name in PROFILE_LIST_FIELDS}
+    merged.update({name: profile.get(name) for name in PROFILE_TEXT_FIELDS})
+    for name in PROFILE_LIST_FIELDS:
+        values = update.get(name) or []
+        if isinstance(values, str):
+            values = [values]
+        seen = {str(item).lower() for item in merged[name]}
+        for value in values:
+            if str(value).strip() and str(value).lower() not in seen:
+                merged[name].append(str(value).strip())
+                seen.add(str(value).lower())
+    for name in PROFILE_TEXT_FIELDS:
+        if isinstance(update.get(name), str) and update[name].strip():
+            merged[name] = update[name].strip()
+    return merged
+
+def extract_symptom_details(messages, symptom_details=None):
+    """Update the symptom profile with only the user messages received since the last extraction"""
+    symptom_details = symptom_details or {}
+    profile = symptom_details.get("profile", {})
+    last_updated = symptom_details.get("last_updated", 0)
+    new_input = "\n".join([msg["content"] for msg in messages[last_updated:] if msg["role"] == "user"])
+    if not new_input:
+        return {**symptom_details, "last_updated": len(messages)}
+
+    # Use the LLM to extract what the new messages add to the profile
     extract_prompt = f"""
-    Based on the following user messages, extract key symptom information:
+    You maintain a structured symptom profile for a medical consultation.
 
-    {all_user_input}
+    Current profile (JSON):
+    {json.dumps(profile)}
 
-    Extract and organize these details into a structured format:
-    - Primary symptoms (list each with severity and duration)
-    - Secondary/associated symptoms
-    - Timing and patterns
-    - Aggravating or relieving factors
-    - Relevant medical history mentioned
+    New patient message(s):
+    {new_input}
 
-    Return as a concise, structured JSON-like format.
+    Return ONLY a JSON object with the fields the new message(s) add or change:
+    - "symptoms": list of symptoms with severity and duration
+    - "onset": when it started / how long it has lasted
+    - "severity": how bad it is
+    - "modifiers": list of aggravating or relieving factors
+    - "history": list of relevant medical history mentioned
+    Omit fields the new message(s) say nothing about. Return {{}} if nothing is new.
     """
 
     try:
-        response = llm.invoke(extract_prompt)
-        # This won't be perfect JSON but will be a structured text representation of symptoms
-        return {"extracted_data": response.content, "last_updated": len(messages)}
+        response = invoke_llm(extract_prompt)
+        match = re.search(r'\{.*\}', response.content, re.DOTALL)
+        profile = merge_symptom_profile(profile, json.loads(match.group()) if match else {})
+        return {"profile": profile, "extracted_data": json.dumps(profile, indent=2), "last_updated": len(messages)}
     except Exception as e:
+        # Keep the previous profile and retry these messages on the next turn
         print(f"Error extracting symptom details: {str(e)}")
-        return {"extracted_data": "Error processing symptoms", "last_updated": len(messages)}
+        extracted_data = json.dumps(profile, indent=2) if profile else "Error processing symptoms"
+        return {"profile": profile, "extracted_data": extracted_data, "last_updated": last_updated}
 
-@api_rate_limit(2)
 def interactive_conversation(state: State):
     """Handle multi-turn conversation to gather detailed symptom information"""
     current_messages = state["messages"]
@@ -184,7 +210,7 @@ def interactive_conversation(state: State):
         # Only extract details if we have new user messages since last extraction
         last_updated = symptom_details.get("last_updated", 0)
         if len(current_messages) > last_updated:
-            symptom_details = extract_symptom_details(current_messages)
+            symptom_details = extract_symptom_details(current_messages, symptom_details)
 
     # Format prompt based on conversation stage
     if question_count == 0:
@@ -219,7 +245,7 @@ def interactive_conversation(state: State):
         instead of asking a question, say "I have enough information to analyze your symptoms now."
         """
 
-    response = llm.invoke(prompt)
+    response = invoke_llm(prompt)
 
     # Check if the response indicates we have enough information
     has_enough_info = "enough information" in response.content.lower()
@@ -242,7 +268,6 @@ def wait_for_user_response(state: State):
     # This is essentially a no-op node
     return state
 
-@api_rate_limit(2)
 def determine_research_needs(state: State):
     """Determine what medical conditions to research based on the entire conversation"""
     messages = state["messages"]
@@ -276,7 +301,6 @@ def determine_research_needs(state: State):
 
     return {"research_results": {"medical_research": results}}
 
-@api_rate_limit(2)
 def generate_analysis(state: State):
     """Generate medical condition analysis with confidence scores"""
     research_data = state.get('research_results', {}).get('medical_research', 'No research data available')
@@ -311,10 +335,9 @@ def generate_analysis(state: State):
     5. Clear indication if any symptoms suggest urgent/emergency care is needed
     """
 
-    analysis = llm.invoke(analysis_prompt)
+    analysis = invoke_llm(analysis_prompt)
     return {"analysis_complete": True, "report": {"content": analysis.content}}
 
-@api_rate_limit(2)
 def final_response(state: State):
     # Add termination marker
     report_content = state.get("report", {}).get("content", "")
@@ -479,7 +502,12 @@ def handle_recursion_limit(state):
         ]
     }
 
-state = None
+# Web conversations, one per browser session
+DEFAULT_SESSION = "default"
+sessions = SessionStore(
+    max_sessions=int(os.environ.get("LLM_MAX_SESSIONS", 1000)),
+    ttl=int(os.environ.get("LLM_SESSION_TTL", 3600)),
+)
 
 def run_command_line():
     """Run an interactive demo of the medical chatbot"""
@@ -519,13 +547,18 @@ def run_command_line():
             print("Or you can continue discussing the current condition with follow-up questions.")
 
 
-def run_web_prompt(input: str):
-    global state
+def run_web_prompt(input: str, session_id: str = DEFAULT_SESSION):
+    # Requests for the same session run one at a time; other sessions are not blocked
+    with sessions.session(session_id):
+        return _run_session_prompt(input, session_id)
+
+def _run_session_prompt(input, session_id):
+    state = sessions.get(session_id)
 
     if not state:
         state = start_medical_chat(input)
     elif input.lower() == 'exit':
-        state = None  # Reset state to None
+        sessions.delete(session_id)
         return {
             "messages": "Chat session ended. You can start a new conversation.",
             "analysis_complete": False
@@ -538,7 +571,7 @@ def run_web_prompt(input: str):
         # Store the final response
         final_response = state["messages"][-1]["content"] + additional_message
         # Reset the state
-        state = None
+        sessions.delete(session_id)
         # Add reset notification to the message
         additional_message += "\nAnalysis complete. Starting fresh conversation. Type your new symptoms or concerns.\n"
         return {
@@ -546,6 +579,7 @@ def run_web_prompt(input: str):
             "analysis_complete": True
         }
 
+    sessions.put(session_id, state)
     messages = state["messages"]
     response = messages[-1]["content"] + additional_message
 
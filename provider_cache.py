@@ -0,0 +1,80 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+def quantize(latitude, longitude, cell_size):
+    return (math.floor(latitude / cell_size), math.floor(longitude / cell_size))
+
+
+class ProviderCache:
+    """Bounded LRU cache of provider candidates keyed by a quantized location cell.
+
+    Every user inside the same ``cell_size`` degree cell shares one entry. The
+    entry holds a superset of the providers any of those users could see, so
+    callers re-rank it against the exact coordinates on every hit.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, cell_size=0.01):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cell_size = cell_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def cell(self, latitude, longitude):
+        return quantize(latitude, longitude, self.cell_size)
+
+    def cell_center(self, latitude, longitude):
+        row, col = self.cell(latitude, longitude)
+        return ((row + 0.5) * self.cell_size, (col + 0.5) * self.cell_size)
+
+    def key(self, name, latitude, longitude, tokens=()):
+        return (name, self.cell(latitude, longitude), tuple(tokens))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, name=None):
+        """Drop every entry, or only the entries for one collection"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if key[0] == name]:
+                    del self._entries[key]
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,26 @@
+"""
+Token-bucket rate limiting shared with the AI service
+
+The implementation lives in services/ai-service/utils/rate_limiter.py; this module
+loads that file so the Flask app and the AI service cannot drift apart.
+"""
+import importlib.util
+import os
+import sys
+
+_MODULE = "medlama_rate_limiter"
+_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "services", "ai-service", "utils", "rate_limiter.py")
+
+if _MODULE not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(_MODULE, _PATH)
+    sys.modules[_MODULE] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules[_MODULE])
+_shared = sys.modules[_MODULE]
+
+PROVIDER_LIMITS = _shared.PROVIDER_LIMITS
+PROVIDER_KEY_ENV = _shared.PROVIDER_KEY_ENV
+TokenBucket = _shared.TokenBucket
+ProviderLimiter = _shared.ProviderLimiter
+RateLimiterRegistry = _shared.RateLimiterRegistry
+rate_limiters = _shared.rate_limiters
+api_rate_limit = _shared.api_rate_limit
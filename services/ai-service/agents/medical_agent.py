@@ -2,17 +2,19 @@
 Main medical diagnostic agent using LangGraph (local only)
 """
 import os
-import time
 import json
 import re
-from typing import Dict, Any, List, Optional, TypedDict, Annotated
-from functools import wraps
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional, TypedDict, Annotated, Callable
 
 # LangGraph and LLM imports
 from langgraph.graph import StateGraph, START, END
 from langgraph.errors import GraphRecursionError
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.tools import tool
+from langchain_core.runnables import RunnableConfig
 
 # Import utility functions
 from utils.text_processing import (
@@ -20,32 +22,39 @@ from utils.text_processing import (
     extract_user_messages,
     beautify_text
 )
-from utils.conversation_state import ConversationSession, parse_structured_response
+from utils.conversation_state import (
+    ConversationSession, ReplaceMessages, merge_messages, apply_update
+)
+from utils.streaming import EventStream, Emit
+from utils.history import HistoryManager
+from utils.research_cache import ResearchCache, research_cache as shared_research_cache, profile_key
+from utils.research_fanout import build_ranking_prompt, parse_ranked_conditions, merge_research
+from utils.prefetch import ResearchPrefetcher, research_prefetcher
+from utils.triage import red_flag_matcher
+from utils.symptom_profile import (
+    SymptomProfile, build_profile_update_prompt, validate_turn_response, TURN_RESPONSE_SCHEMA
+)
+from utils.json_extract import extract_json
+from utils.checkpoints import ThreadedSqliteSaver
 
 # Import model clients
-from models.perplexity_client import perplexity_research
+from models.perplexity_client import perplexity_research, aperplexity_research, get_medical_research, aget_medical_research
+from models.llm_cache import LLMCache, llm_cache as shared_llm_cache
+from models.nim_client import NIMClient
+from models.router import ModelRouter, ModelTier
 
 # State Management for the Agent
 class State(TypedDict):
     """State definition for the medical diagnostic agent"""
-    messages: Annotated[List[Dict[str, Any]], "Chat messages"]
+    messages: Annotated[List[Dict[str, Any]], merge_messages]  # appended; ReplaceMessages replaces
     research_results: Annotated[Dict[str, Any], "Medical research data"]
     analysis_complete: Annotated[bool, "Whether analysis is complete"]
     report: Annotated[Dict[str, Any], "Final medical analysis report"]
     conversation_stage: Annotated[str, "Current stage: conversation, research, complete"]
     symptom_details: Annotated[Dict[str, Any], "Collected symptom information"]
     question_count: Annotated[int, "Number of questions asked so far"]
-
-# Rate Limiting Decorator
-def api_rate_limit(seconds: int = 1):
-    """Decorator to add sleep time between API calls"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            time.sleep(seconds)  # Wait before making the API call
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+    history_summary: Annotated[Dict[str, Any], "Rolling summary of messages folded out of the prompt"]
+    triage: Annotated[Dict[str, Any], "Red flags found in the user's messages"]
 
 # System Prompt for medical reasoning
 SYSTEM_PROMPT = """
@@ -59,102 +68,252 @@ You are an advanced AI medical assistant with access to up-to-date medical liter
 IMPORTANT: If a user describes symptoms that suggest a medical emergency (such as signs of heart attack, stroke, severe bleeding, difficulty breathing, or severe allergic reaction), immediately advise them to seek emergency medical care.
 """
 
+def _env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean switch from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 class MedicalAgent:
     """Medical diagnostic agent implementation (local only)"""
-    def __init__(self, gemini_api_key: str, perplexity_api_key: str, model_name: str = "gemini-1.5-pro"):
-        """Initialize the medical agent with LLM and research tools"""
+    def __init__(self, gemini_api_key: str, perplexity_api_key: str, model_name: str = "gemini-1.5-pro",
+                 combined_turn: Optional[bool] = None, history_manager: Optional[HistoryManager] = None,
+                 research_cache: Optional[ResearchCache] = None, llm_cache: Optional[LLMCache] = None,
+                 research_mode: Optional[str] = None, speculative_research: Optional[bool] = None,
+                 prefetcher: Optional[ResearchPrefetcher] = None, checkpoint_path: Optional[str] = None,
+                 router: Optional[ModelRouter] = None):
+        """
+        Initialize the medical agent with LLM and research tools
+
+        Args:
+            combined_turn: Update the symptom profile and decide the next step in a
+                single LLM call per turn instead of two (defaults to MEDLAMA_COMBINED_TURN)
+            history_manager: Token budget for the conversation history in prompts
+                (defaults to the MEDLAMA_HISTORY_* settings)
+            research_cache: Cache for research results (defaults to the process-wide cache)
+            llm_cache: Cache for LLM responses, enabled per node (defaults to the process-wide cache)
+            research_mode: "single" for one combined Perplexity query, "fanout" to rank conditions
+                and research each one concurrently (defaults to MEDLAMA_RESEARCH_MODE)
+            speculative_research: Start research in the background once the symptom profile
+                is stable, before the conversation ends (defaults to MEDLAMA_SPECULATIVE_RESEARCH)
+            prefetcher: Runs speculative research (defaults to the process-wide prefetcher)
+            checkpoint_path: SQLite file for graph checkpoints, enabling chat_thread() where the
+                conversation state stays in the checkpointer between turns (defaults to
+                MEDLAMA_CHECKPOINT_PATH; disabled when empty)
+            router: Picks the model tier for each node; by default "large" (Gemini) serves every
+                node unless MEDLAMA_MODEL_ROUTES sends some to "fast" (NVIDIA NIM)
+        """
+        self.combined_turn = _env_flag("MEDLAMA_COMBINED_TURN") if combined_turn is None else combined_turn
+        self.history = history_manager or HistoryManager.from_env()
+        self.research_cache = research_cache or shared_research_cache
+        self.llm_cache = llm_cache or shared_llm_cache
+        self.research_mode = research_mode or os.getenv("MEDLAMA_RESEARCH_MODE", "single")
+        self.research_fanout = int(os.getenv("MEDLAMA_RESEARCH_FANOUT", "3"))
+        self.research_concurrency = int(os.getenv("MEDLAMA_RESEARCH_CONCURRENCY", "3"))
+        self.speculative_research = _env_flag("MEDLAMA_SPECULATIVE_RESEARCH") if speculative_research is None else speculative_research
+        self.prefetcher = prefetcher or research_prefetcher
         # LLM Configuration
+        self.model_name = model_name
+        self.temperature = 0.3
         self.llm = ChatGoogleGenerativeAI(
             model=model_name,
             google_api_key=gemini_api_key,
-            temperature=0.3
+            temperature=self.temperature
         )
         # Bind tools
         self.tools = [perplexity_research]
         self.llm_with_tools = self.llm.bind_tools(tools=self.tools)
-        # Build the graph
+        self.router = router or ModelRouter.from_env(self._model_tiers(), default="large")
+        # Build the graphs: sync nodes for invoke/stream, async nodes for ainvoke
         self.graph = self._build_graph()
-    
-    def _extract_symptom_details(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Extract structured symptom information from conversation"""
-        # Combine all user messages to analyze
-        all_user_input = " ".join([
-            msg["content"] for msg in messages 
-            if msg.get("role") == "user"
-        ])
+        self.async_graph = self._build_graph(asynchronous=True)
+        # Checkpointed twins keyed by thread id, for callers that do not keep the state themselves
+        self.checkpointer = ThreadedSqliteSaver.from_path(checkpoint_path or os.getenv("MEDLAMA_CHECKPOINT_PATH"))
+        if self.checkpointer is not None:
+            self.thread_graph = self._build_graph(checkpointer=self.checkpointer)
+            self.async_thread_graph = self._build_graph(asynchronous=True, checkpointer=self.checkpointer)
 
-        extract_prompt = f"""
-        Based on the following user messages, extract key symptom information:
+    def _model_tiers(self) -> Dict[str, ModelTier]:
+        """The Gemini model as the "large" tier and the NVIDIA NIM Gemma endpoint as the "fast" tier"""
+        async def gemini_ainvoke(prompt: str) -> str:
+            return (await self.llm.ainvoke(prompt)).content
 
-        {all_user_input}
+        async def gemini_astream(prompt: str):
+            async for chunk in self.llm.astream(prompt):
+                yield chunk.content
 
-        Extract and organize these details into a structured format:
-        - Primary symptoms (list each with severity and duration)
-        - Secondary/associated symptoms
-        - Timing and patterns
-        - Aggravating or relieving factors
-        - Relevant medical history mentioned
+        nim = NIMClient()
+        nim_model = os.getenv("NIM_MODEL_NAME", "gemma-2")
+        nim_timeout = os.getenv("MEDLAMA_FAST_TIER_TIMEOUT", "5")
 
-        Return as a concise, structured text summary.
+        def nim_invoke(prompt: str) -> str:
+            response = nim.text_completion(prompt, model=nim_model, temperature=self.temperature)
+            return response["choices"][0]["message"]["content"]
+
+        async def nim_ainvoke(prompt: str) -> str:
+            response = await nim.atext_completion(prompt, model=nim_model, temperature=self.temperature)
+            return response["choices"][0]["message"]["content"]
+
+        return {
+            "large": ModelTier(
+                "large", self.model_name,
+                invoke=lambda prompt: self.llm.invoke(prompt).content,
+                ainvoke=gemini_ainvoke,
+                stream=lambda prompt: (chunk.content for chunk in self.llm.stream(prompt)),
+                astream=gemini_astream,
+                provider="gemini"
+            ),
+            "fast": ModelTier(
+                "fast", nim_model,
+                invoke=nim_invoke,
+                ainvoke=nim_ainvoke,
+                timeout=float(nim_timeout) if nim_timeout else None,
+                provider="nim"
+            ),
+        }
+
+    def _cache_key(self, tier: ModelTier, prompt: str) -> str:
+        """LLM cache key of a prompt on a tier"""
+        return LLMCache.key(tier.model, {"temperature": self.temperature}, prompt)
+
+    def _invoke(self, node: str, prompt: str, token_sink: Optional[Callable[[str], None]] = None) -> str:
         """
+        Run a prompt on the node's model tier, serving it from the response cache when the node allows it
+
+        Args:
+            node: Calling node ("extraction", "conversation", "summary", "ranking" or "analysis")
+            prompt: Exact prompt text
+            token_sink: Receives each chunk as it is generated (a cached reply arrives as one chunk)
+
+        Returns:
+            The completion text
+        """
+        content = self.llm_cache.get(node, self._cache_key(self.router.primary(node), prompt))
+        if content is not None:
+            if token_sink:
+                token_sink(content)
+            return content
+        content, tier = self.router.invoke(node, prompt, token_sink)
+        self.llm_cache.put(node, self._cache_key(tier, prompt), content)
+        return content
+
+    async def _ainvoke(self, node: str, prompt: str, token_sink: Optional[Callable[[str], None]] = None) -> str:
+        """Async version of _invoke"""
+        content = self.llm_cache.get(node, self._cache_key(self.router.primary(node), prompt))
+        if content is not None:
+            if token_sink:
+                token_sink(content)
+            return content
+        content, tier = await self.router.ainvoke(node, prompt, token_sink)
+        self.llm_cache.put(node, self._cache_key(tier, prompt), content)
+        return content
+
+    def _pending_profile_update(self, messages: List[Dict[str, Any]], symptom_details: Dict[str, Any]):
+        """Current profile, where it was last updated, and the user messages it has not seen yet"""
+        profile = SymptomProfile.from_dict(symptom_details.get("profile"))
+        last_updated = symptom_details.get("last_updated", 0)
+        return profile, last_updated, extract_user_messages(messages[last_updated:])
+
+    def _profile_details(self, profile: SymptomProfile, last_updated: int, failed: bool = False) -> Dict[str, Any]:
+        """Symptom details stored in the graph state for a profile"""
+        return {
+            "profile": profile.to_dict(),
+            "extracted_data": "Error processing symptoms" if failed and profile.is_empty() else profile.summary(),
+            "last_updated": last_updated
+        }
+
+    @staticmethod
+    def _parse_profile_update(response: str) -> Dict[str, Any]:
+        """Profile update in the extractor's reply; a reply without a JSON object is a failed extraction"""
+        update = extract_json(response)
+        if update is None:
+            raise ValueError("No JSON object in the extraction reply.")
+        return update
+
+    def _extract_symptom_details(self, messages: List[Dict[str, Any]], symptom_details: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Update the structured symptom profile with the user messages that arrived
+        since the last extraction, reusing everything already extracted.
+        """
+        symptom_details = symptom_details or {}
+        profile, last_updated, new_messages = self._pending_profile_update(messages, symptom_details)
+        if not new_messages:
+            return {**symptom_details, "last_updated": len(messages)}
 
         try:
-            response = self.llm.invoke(extract_prompt)
-            return {
-                "extracted_data": response.content,
-                "last_updated": len(messages)
-            }
+            response = self._invoke("extraction", build_profile_update_prompt(profile, new_messages))
+            profile.merge(self._parse_profile_update(response))
         except Exception as e:
+            # Leave last_updated alone so these messages are retried on the next turn
             print(f"Error extracting symptom details: {str(e)}")
-            return {
-                "extracted_data": "Error processing symptoms",
-                "last_updated": len(messages)
-            }
+            return self._profile_details(profile, last_updated, failed=True)
+
+        return self._profile_details(profile, len(messages))
+
+    async def _aextract_symptom_details(self, messages: List[Dict[str, Any]], symptom_details: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Async version of _extract_symptom_details"""
+        symptom_details = symptom_details or {}
+        profile, last_updated, new_messages = self._pending_profile_update(messages, symptom_details)
+        if not new_messages:
+            return {**symptom_details, "last_updated": len(messages)}
+
+        try:
+            response = await self._ainvoke("extraction", build_profile_update_prompt(profile, new_messages))
+            profile.merge(self._parse_profile_update(response))
+        except Exception as e:
+            print(f"Error extracting symptom details: {str(e)}")
+            return self._profile_details(profile, last_updated, failed=True)
+
+        return self._profile_details(profile, len(messages))
     
-    @api_rate_limit(1)
-    def _interactive_conversation(self, state: State) -> Dict[str, Any]:
-        """
-        Handle multi-turn conversation using structured JSON output from LLM
-        to dynamically decide when enough detail is present.
-        """
-        print("PROCESSING: Entering interactive_conversation node...")
-        current_messages = state["messages"]
-        question_count = state.get("question_count", 0) + 1
-        symptom_details = state.get("symptom_details", {})
+    def _symptom_summary(self, messages: List[Dict[str, Any]], symptom_details: Dict[str, Any]) -> str:
+        """Structured symptom summary when one exists, otherwise the raw user messages"""
+        extracted_data = symptom_details.get("extracted_data", "No structured data.")
+        if "Error processing symptoms" in extracted_data or extracted_data in ("No structured data.", "No structured summary yet."):
+            return "\n".join(extract_user_messages(messages))
+        return extracted_data
 
-        # Failsafe check to prevent infinite loops
-        FAILSAFE_LIMIT = 10
-        if question_count > FAILSAFE_LIMIT:
-            print(f"DEBUG: Failsafe question limit ({FAILSAFE_LIMIT}) reached. Forcing research.")
-            return {
-                "messages": current_messages + [{
-                    "role": "assistant", 
-                    "content": "Based on the information gathered so far, I will now proceed with the analysis."
-                }],
-                "question_count": question_count,
-                "conversation_stage": "research",
-                "symptom_details": symptom_details
-            }
+    def _conversation_prompt(self, messages: List[Dict[str, Any]], symptom_details: Dict[str, Any],
+                             question_count: int, combined: bool = False, history: Optional[str] = None) -> str:
+        """
+        Build the information-gathering prompt.
 
-        # Update symptom details if new user message arrived
-        if current_messages and current_messages[-1].get("role") == "user":
-            last_updated = symptom_details.get("last_updated", -1)
-            if len(current_messages) > last_updated:
-                print("PROCESSING: Extracting details from latest user message...")
-                symptom_details = self._extract_symptom_details(current_messages)
+        ``history`` is the compacted conversation history; without it the full
+        transcript is used. In combined mode the prompt also carries the current profile and the new user
+        messages, and asks for the profile update under "symptom_profile".
+        """
+        profile_section = ""
+        profile_key = ""
+        profile_example = ""
+        if combined:
+            profile = SymptomProfile.from_dict(symptom_details.get("profile"))
+            new_messages = extract_user_messages(messages[symptom_details.get("last_updated", 0):])
+            profile_section = f"""
+        Current symptom profile (JSON):
+        {json.dumps(profile.to_dict())}
 
-        # Prompt requesting JSON output for decision making
-        prompt = f"""
+        New patient message(s) since the profile was last updated:
+        {chr(10).join(new_messages)}
+        """
+            profile_key = """
+           * `"symptom_profile"`: An object with only the fields the new message(s) add or change:
+             `"symptoms"` (list), `"onset"` (string), `"severity"` (string), `"modifiers"` (list),
+             `"history"` (list). Use `{}` if nothing is new.
+"""
+            profile_example = """
+          "symptom_profile": {"symptoms": ["shortness of breath on exertion"], "onset": "2 weeks ago"},"""
+        return f"""
         {SYSTEM_PROMPT}
 
         You are in the **information gathering** stage of a medical consultation. Your goal is to gather sufficient detail to perform a preliminary analysis following a standard procedure.
         
         Conversation History:
-        {format_conversation_history(current_messages)}
+        {format_conversation_history(messages) if history is None else history}
 
         Current Symptom Understanding (internal summary - may be incomplete):
         {symptom_details.get("extracted_data", "No structured summary yet.")}
-
+{profile_section}
         Based on the conversation history and your understanding:
 
         1. **Assess Sufficiency:** Do you have enough detail about the main complaints? Consider key aspects like:
@@ -167,17 +326,17 @@ class MedicalAgent:
            * Associated Symptoms
            * Relevant Medical History
 
-        2. **Decide Action and Format Output:** Respond ONLY with a valid JSON object containing two keys:
+        2. **Decide Action and Format Output:** Respond ONLY with a valid JSON object containing these keys:
            * `"proceed_to_research"`: A boolean value (`true` if you have sufficient detail, `false` otherwise).
            * `"assistant_message"`: The message to display to the user.
              - If proceeding to research, a brief, empathetic confirmation.
-             - If continuing conversation, the single most important follow-up question.
+             - If continuing conversation, the single most important follow-up question.{profile_key}
 
         Do not include any emergency recommendations in the `assistant_message` at this stage.
         This is conversation turn {question_count}.
 
         Example of valid JSON output if continuing conversation:
-        {{
+        {{{profile_example}
           "proceed_to_research": false,
           "assistant_message": "When you feel short of breath, does anything seem to make it better or worse?"
         }}
@@ -191,72 +350,196 @@ class MedicalAgent:
         Ensure your entire response is ONLY the JSON object without any explanation.
         """
 
-        try:
-            print(f"DEBUG: Invoking LLM for conversation (Turn {question_count})")
-            response = self.llm.invoke(prompt)
-            response_content = response.content
+    def _begin_turn(self, state: State) -> Dict[str, Any]:
+        """
+        Work out what a conversation turn has to do.
+
+        Returns the turn's messages, question_count and symptom_details, whether new
+        user messages need extracting ("extract") or go into the combined call
+        ("combined"), and "forced" holding the node's result when the failsafe fires.
+        """
+        current_messages = state["messages"]
+        question_count = state.get("question_count", 0) + 1
+        symptom_details = state.get("symptom_details", {})
+        turn = {
+            "messages": current_messages,
+            "question_count": question_count,
+            "symptom_details": symptom_details,
+            "history_summary": state.get("history_summary", {}),
+            "extract": False,
+            "combined": False,
+            "forced": None
+        }
 
+        # Failsafe check to prevent infinite loops
+        FAILSAFE_LIMIT = 10
+        if question_count > FAILSAFE_LIMIT:
+            print(f"DEBUG: Failsafe question limit ({FAILSAFE_LIMIT}) reached. Forcing research.")
+            turn["forced"] = {
+                "messages": [{
+                    "role": "assistant", 
+                    "content": "Based on the information gathered so far, I will now proceed with the analysis."
+                }],
+                "question_count": question_count,
+                "conversation_stage": "research",
+                "symptom_details": symptom_details
+            }
+            return turn
+
+        # Find user messages the symptom profile has not seen yet
+        last_updated = symptom_details.get("last_updated", 0)
+        has_new_messages = bool(current_messages) and current_messages[-1].get("role") == "user" \
+            and len(current_messages) > last_updated
+
+        # Separate extraction call unless the decision call also returns the profile
+        turn["combined"] = self.combined_turn and has_new_messages
+        turn["extract"] = has_new_messages and not turn["combined"]
+        return turn
+
+    def _finish_turn(self, turn: Dict[str, Any], response_content: Optional[str]) -> Dict[str, Any]:
+        """
+        Parse the LLM's JSON decision and build the node's state update
+
+        Args:
+            turn: Turn details from _begin_turn (with symptom_details already extracted)
+            response_content: Raw LLM output, or None if the call failed
+        """
+        current_messages = turn["messages"]
+        symptom_details = turn["symptom_details"]
+
+        if response_content is None:
+            has_enough_info = False
+            assistant_content = "I encountered an issue. Could you please try again?"
+        else:
             # Parse JSON response
             try:
-                # Clean potential code fences
-                if response_content.strip().startswith("```json"):
-                    response_content = response_content.strip()[7:-3].strip()
-                elif response_content.strip().startswith("```"):
-                     response_content = response_content.strip()[3:-3].strip()
-                
-                # Parse JSON
-                parsed_data = json.loads(response_content)
-                
-                # Validate expected keys and types
-                if not isinstance(parsed_data, dict) or \
-                   "proceed_to_research" not in parsed_data or \
-                   "assistant_message" not in parsed_data:
-                    raise ValueError("Parsed JSON missing required keys.")
-
-                has_enough_info = parsed_data["proceed_to_research"]
-                assistant_content = parsed_data["assistant_message"]
+                # Find the turn object among fences, prose or other objects, then validate it
+                parsed_data = extract_json(response_content, TURN_RESPONSE_SCHEMA) or extract_json(response_content)
+                has_enough_info, assistant_content, profile_update = validate_turn_response(
+                    parsed_data, require_profile=turn["combined"]
+                )
+
+                if turn["combined"]:
+                    profile = SymptomProfile.from_dict(symptom_details.get("profile"))
+                    profile.merge(profile_update)
+                    symptom_details = self._profile_details(profile, len(current_messages))
                 
-            except (json.JSONDecodeError, ValueError) as json_error:
+            except ValueError as json_error:
                 print(f"ERROR: Failed to parse JSON: {json_error}")
                 has_enough_info = False
                 assistant_content = "I seem to be having trouble. Could you please clarify your symptoms?"
-        
-        except Exception as llm_error:
-            print(f"ERROR: LLM invocation failed: {llm_error}")
-            has_enough_info = False
-            assistant_content = "I encountered an issue. Could you please try again?"
 
         # Determine the next stage
         new_stage = "research" if has_enough_info else "conversation"
         
-        # Create response
+        # Create response (the messages reducer appends it to the history)
         new_message = {"role": "assistant", "content": assistant_content}
-        updated_messages = current_messages + [new_message]
         
         return {
-            "messages": updated_messages,
-            "question_count": question_count,
+            "messages": [new_message],
+            "question_count": turn["question_count"],
             "conversation_stage": new_stage,
-            "symptom_details": symptom_details
+            "symptom_details": symptom_details,
+            "history_summary": turn["history_summary"]
         }
-    
-    @api_rate_limit(2)
-    def _determine_research_needs(self, state: State) -> Dict[str, Any]:
-        """Determine what conditions to research based on conversation"""
-        print("DEBUG: Entering determine_research_needs node...")
+
+    def _compact_history(self, turn: Dict[str, Any]) -> str:
+        """Fold old messages into the rolling summary if due and return the prompt history"""
+        history, turn["history_summary"] = self.history.compact(
+            turn["messages"], turn["history_summary"], lambda prompt: self._invoke("summary", prompt)
+        )
+        return history
+
+    async def _acompact_history(self, turn: Dict[str, Any]) -> str:
+        """Async version of _compact_history"""
+        summary_state, to_fold = self.history.pending(turn["messages"], turn["history_summary"])
+        if to_fold:
+            new_summary = None
+            try:
+                new_summary = await self._ainvoke("summary", self.history.fold_prompt(summary_state["text"], to_fold))
+            except Exception as e:
+                print(f"ERROR: History summarization failed: {str(e)}")
+            summary_state = self.history.fold(summary_state, to_fold, new_summary)
+        turn["history_summary"] = summary_state
+        return self.history.render(turn["messages"], summary_state)
+
+    def _triage(self, state: State) -> Dict[str, Any]:
+        """
+        Check the user's messages for red flags before any LLM call.
+
+        Runs first on every invocation so an emergency advisory is available (and
+        streamed) immediately; the conversation and analysis continue as usual.
+        """
         messages = state["messages"]
-        symptom_details = state.get("symptom_details", {})
+        if not messages or messages[-1].get("role") != "user":
+            return {}
+        previous = state.get("triage") or {}
+        result = red_flag_matcher.triage(extract_user_messages(messages), previous.get("flags", []))
+        if result is None:
+            return {"triage": {**previous, "new_flags": []}} if previous else {}
+        if result["new_flags"]:
+            print(f"TRIAGE: Red flags detected: {', '.join(result['new_flags'])}")
+        return {"triage": result}
+
+    def _interactive_conversation(self, state: State) -> Dict[str, Any]:
+        """
+        Handle multi-turn conversation using structured JSON output from LLM
+        to dynamically decide when enough detail is present.
+        """
+        print("PROCESSING: Entering interactive_conversation node...")
+        turn = self._begin_turn(state)
+        if turn["forced"]:
+            return turn["forced"]
+
+        if turn["extract"]:
+            print("PROCESSING: Extracting details from latest user message...")
+            turn["symptom_details"] = self._extract_symptom_details(turn["messages"], turn["symptom_details"])
+
+        history = self._compact_history(turn)
+        prompt = self._conversation_prompt(turn["messages"], turn["symptom_details"], turn["question_count"],
+                                           turn["combined"], history)
+
+        try:
+            print(f"DEBUG: Invoking LLM for conversation (Turn {turn['question_count']})")
+            response_content = self._invoke("conversation", prompt)
+        except Exception as llm_error:
+            print(f"ERROR: LLM invocation failed: {llm_error}")
+            response_content = None
+
+        update = self._finish_turn(turn, response_content)
+        self._speculate(state, update)
+        return update
+
+    async def _ainteractive_conversation(self, state: State) -> Dict[str, Any]:
+        """Async version of _interactive_conversation"""
+        print("PROCESSING: Entering interactive_conversation node (async)...")
+        turn = self._begin_turn(state)
+        if turn["forced"]:
+            return turn["forced"]
+
+        if turn["extract"]:
+            turn["symptom_details"] = await self._aextract_symptom_details(turn["messages"], turn["symptom_details"])
+
+        history = await self._acompact_history(turn)
+        prompt = self._conversation_prompt(turn["messages"], turn["symptom_details"], turn["question_count"],
+                                           turn["combined"], history)
+
+        try:
+            response_content = await self._ainvoke("conversation", prompt)
+        except Exception as llm_error:
+            print(f"ERROR: LLM invocation failed: {llm_error}")
+            response_content = None
 
+        update = self._finish_turn(turn, response_content)
+        self._speculate(state, update)
+        return update
+    
+    def _research_prompt(self, state: State) -> str:
+        """Research query built from the symptom information gathered so far"""
         # Use structured details if available, otherwise fall back to user messages
-        extracted_data = symptom_details.get("extracted_data", "No structured data.")
-        if "Error processing symptoms" in extracted_data or extracted_data == "No structured data.":
-            # Fallback to raw user input
-            user_inputs = extract_user_messages(messages)
-            symptom_summary = "\n".join(user_inputs)
-        else:
-            symptom_summary = extracted_data
+        symptom_summary = self._symptom_summary(state["messages"], state.get("symptom_details", {}))
 
-        research_prompt = f"""
+        return f"""
         Based on the following symptom information:
         {symptom_summary}
 
@@ -267,29 +550,218 @@ class MedicalAgent:
         4. Suggest potential diagnostic steps.
         """
 
+    def _research_key(self, state: State) -> Optional[str]:
+        """Research cache key for the current presentation"""
+        profile = SymptomProfile.from_dict(state.get("symptom_details", {}).get("profile"))
+        return profile_key(profile, extract_user_messages(state["messages"]))
+
+    def _store_research(self, key: Optional[str], results: str) -> None:
+        """Cache research results unless the call failed"""
+        if not str(results).startswith("Error researching topic"):
+            self.research_cache.put(key, results)
+
+    def _ranked_conditions(self, ranking_response: str) -> List[str]:
+        conditions = parse_ranked_conditions(ranking_response, self.research_fanout)
+        if not conditions:
+            print("ERROR: Could not rank conditions; falling back to a single research query.")
+        return conditions
+
+    def _fanout_research(self, state: State, research_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Rank the candidate conditions, then research the top ones concurrently.
+
+        Each condition's result goes to ``research_sink`` as soon as it arrives.
+
+        Returns:
+            Merged research results, or None when ranking or every research call failed
+        """
+        symptom_summary = self._symptom_summary(state["messages"], state.get("symptom_details", {}))
+        try:
+            conditions = self._ranked_conditions(self._invoke("ranking", build_ranking_prompt(symptom_summary, self.research_fanout)))
+        except Exception as e:
+            print(f"ERROR: Condition ranking failed: {str(e)}")
+            return None
+        if not conditions:
+            return None
+
+        print(f"RESPONSE: Researching {len(conditions)} conditions concurrently...")
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.research_concurrency, len(conditions))) as executor:
+            futures = {executor.submit(get_medical_research, condition): condition for condition in conditions}
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"ERROR: Research for {futures[future]} failed: {str(e)}")
+                    continue
+                results[futures[future]] = result
+                if research_sink:
+                    research_sink(result)
+
+        if not results:
+            return None
+        return merge_research([results[condition] for condition in conditions if condition in results])
+
+    async def _afanout_research(self, state: State, research_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Optional[Dict[str, Any]]:
+        """Async version of _fanout_research"""
+        symptom_summary = self._symptom_summary(state["messages"], state.get("symptom_details", {}))
+        try:
+            conditions = self._ranked_conditions(await self._ainvoke("ranking", build_ranking_prompt(symptom_summary, self.research_fanout)))
+        except Exception as e:
+            print(f"ERROR: Condition ranking failed: {str(e)}")
+            return None
+        if not conditions:
+            return None
+
+        semaphore = asyncio.Semaphore(self.research_concurrency)
+
+        async def research(condition: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await aget_medical_research(condition)
+
+        results = {}
+        for next_result in asyncio.as_completed([research(condition) for condition in conditions]):
+            try:
+                result = await next_result
+            except Exception as e:
+                print(f"ERROR: Research call failed: {str(e)}")
+                continue
+            results[result["condition"]] = result
+            if research_sink:
+                research_sink(result)
+
+        if not results:
+            return None
+        return merge_research([results[condition] for condition in conditions if condition in results])
+
+    def _research(self, state: State, research_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run research in the configured mode and return the research results"""
+        if self.research_mode == "fanout":
+            research = self._fanout_research(state, research_sink)
+            if research is not None:
+                return research
+
         print("RESPONSE: Starting Perplexity research...")
-        results = perplexity_research(research_prompt)
+        results = perplexity_research(self._research_prompt(state))
         print("RESPONSE: Perplexity research complete.")
+        return {"medical_research": results}
 
-        return {"research_results": {"medical_research": results}}
+    async def _aresearch(self, state: State, research_sink: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Async version of _research"""
+        if self.research_mode == "fanout":
+            research = await self._afanout_research(state, research_sink)
+            if research is not None:
+                return research
 
-    @api_rate_limit(1)
-    def _generate_analysis(self, state: State) -> Dict[str, Any]:
-        """Generate medical analysis incorporating research"""
-        print("DEBUG: Entering generate_analysis node...")
+        return {"medical_research": await aperplexity_research(self._research_prompt(state))}
+
+    def _speculate(self, state: State, update: Dict[str, Any]) -> None:
+        """
+        Start research in the background once the symptom profile is stable.
+
+        The shared prefetcher is process-wide, so prefetch keys are the research cache
+        key scoped by a per-conversation id (research_results["prefetch_scope"]); two
+        sessions with the same presentation never claim or discard each other's prefetch.
+        research_results["prefetch_key"] is only recorded while a prefetch is running
+        for this conversation; a prefetch for an older profile is discarded.
+        """
+        if not self.speculative_research or update.get("conversation_stage") != "conversation":
+            return
+        symptom_details = update.get("symptom_details", {})
+        if not SymptomProfile.from_dict(symptom_details.get("profile")).is_stable():
+            return
+
+        snapshot = {"messages": merge_messages(state["messages"], update["messages"]), "symptom_details": symptom_details}
+        research_results = state.get("research_results", {})
+        scope = research_results.get("prefetch_scope") or uuid.uuid4().hex
+        key = self._prefetch_key(scope, self._research_key(snapshot))
+        previous = research_results.get("prefetch_key")
+        if key is None or key == previous:
+            return
+        self.prefetcher.discard(previous)
+        update["research_results"] = {"prefetch_scope": scope}
+        print("PROCESSING: Prefetching research for the current symptom profile...")
+        if self.prefetcher.prefetch(key, lambda: self._research(snapshot)):
+            update["research_results"]["prefetch_key"] = key
+
+    @staticmethod
+    def _prefetch_key(scope: Optional[str], key: Optional[str]) -> Optional[str]:
+        """Prefetcher key of a research cache key within one conversation"""
+        return f"{scope}:{key}" if scope and key is not None else None
+
+    def _claim_prefetch(self, state: State, key: Optional[str]):
+        """Prefetched research future for the current profile, discarding a stale one"""
+        research_results = state.get("research_results", {})
+        prefetch_key = research_results.get("prefetch_key")
+        if prefetch_key is None:
+            return None
+        key = self._prefetch_key(research_results.get("prefetch_scope"), key)
+        if prefetch_key != key:
+            self.prefetcher.discard(prefetch_key)
+            return None
+        return self.prefetcher.take(key)
+
+    def _determine_research_needs(self, state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """
+        Determine what conditions to research based on conversation.
+
+        In "fanout" mode the run's config may carry a "research_sink" callable that
+        receives each condition's research as it completes.
+        """
+        print("DEBUG: Entering determine_research_needs node...")
+        key = self._research_key(state)
+        results = self.research_cache.get(key)
+        if results is not None:
+            print("RESPONSE: Using cached research for this presentation.")
+            return {"research_results": {"medical_research": results}}
+
+        research = None
+        prefetched = self._claim_prefetch(state, key)
+        if prefetched is not None:
+            try:
+                print("RESPONSE: Using prefetched research.")
+                research = prefetched.result()
+            except Exception as e:
+                print(f"ERROR: Prefetched research failed: {str(e)}")
+
+        if research is None:
+            research_sink = (config or {}).get("configurable", {}).get("research_sink")
+            research = self._research(state, research_sink)
+        self._store_research(key, research["medical_research"])
+
+        return {"research_results": research}
+
+    async def _adetermine_research_needs(self, state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """Async version of _determine_research_needs"""
+        key = self._research_key(state)
+        results = self.research_cache.get(key)
+        if results is not None:
+            return {"research_results": {"medical_research": results}}
+
+        research = None
+        prefetched = self._claim_prefetch(state, key)
+        if prefetched is not None:
+            try:
+                research = await asyncio.wrap_future(prefetched)
+            except Exception as e:
+                print(f"ERROR: Prefetched research failed: {str(e)}")
+
+        if research is None:
+            research_sink = (config or {}).get("configurable", {}).get("research_sink")
+            research = await self._aresearch(state, research_sink)
+        self._store_research(key, research["medical_research"])
+
+        return {"research_results": research}
+
+    def _analysis_prompt(self, state: State) -> str:
+        """Report prompt combining the symptom summary and research findings"""
         research_data = state.get('research_results', {}).get('medical_research', 'No research data available.')
-        messages = state["messages"]
-        symptom_details = state.get("symptom_details", {})
 
         # Prepare symptom summary
-        extracted_data = symptom_details.get("extracted_data", "No structured data.")
-        if "Error processing symptoms" in extracted_data or extracted_data == "No structured data.":
-            user_inputs = extract_user_messages(messages)
-            symptom_summary = "\n".join(user_inputs)
-        else:
-            symptom_summary = extracted_data
+        symptom_summary = self._symptom_summary(state["messages"], state.get("symptom_details", {}))
+        red_flags = ", ".join(state.get("triage", {}).get("flags", [])) or "None detected"
 
-        analysis_prompt = f"""
+        return f"""
         {SYSTEM_PROMPT}
         Generate a detailed medical analysis based on the conversation and research.
         Format the entire report using Markdown syntax. Use headings, bullet points, and
@@ -298,6 +770,9 @@ class MedicalAgent:
         SYMPTOM SUMMARY:
         {symptom_summary}
 
+        RED FLAGS (already reported to the patient as an emergency advisory):
+        {red_flags}
+
         RESEARCH FINDINGS:
         {research_data}
 
@@ -309,13 +784,32 @@ class MedicalAgent:
         5. Reiterate if any symptoms warrant immediate emergency care. Include medical disclaimers.
         """
 
+    def _generate_analysis(self, state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """
+        Generate medical analysis incorporating research.
+
+        When the run's config carries a "token_sink" callable, the report is streamed
+        from the LLM and each chunk is passed to it as soon as it arrives.
+        """
+        print("DEBUG: Entering generate_analysis node...")
+        analysis_prompt = self._analysis_prompt(state)
+
+        token_sink = (config or {}).get("configurable", {}).get("token_sink")
         print("DEBUG: Invoking LLM for analysis generation...")
-        analysis_response = self.llm.invoke(analysis_prompt)
-        analysis_content = analysis_response.content
+        analysis_content = self._invoke("analysis", analysis_prompt, token_sink)
         print("DEBUG: Analysis generation complete.")
         
         return {"analysis_complete": True, "report": {"content": analysis_content}}
 
+    async def _agenerate_analysis(self, state: State, config: Optional[RunnableConfig] = None) -> Dict[str, Any]:
+        """Async version of _generate_analysis"""
+        analysis_prompt = self._analysis_prompt(state)
+
+        token_sink = (config or {}).get("configurable", {}).get("token_sink")
+        analysis_content = await self._ainvoke("analysis", analysis_prompt, token_sink)
+
+        return {"analysis_complete": True, "report": {"content": analysis_content}}
+
     def _final_response(self, state: State) -> Dict[str, Any]:
         """Format the final report for the user"""
         print("DEBUG: Entering final_response node...")
@@ -326,7 +820,7 @@ class MedicalAgent:
         }
 
         return {
-            "messages": state["messages"] + [final_message],
+            "messages": [final_message],
             "conversation_stage": "complete",
             "analysis_complete": True,
             "report": state["report"]
@@ -396,28 +890,45 @@ class MedicalAgent:
         new_messages = [last_user_message, acknowledgment] if last_user_message else [acknowledgment]
 
         return {
-            "messages": new_messages,
+            "messages": ReplaceMessages(new_messages),
             "research_results": {},
             "analysis_complete": False,
             "report": {},
             "conversation_stage": "conversation",
             "symptom_details": {},
-            "question_count": 0
+            "question_count": 0,
+            "history_summary": {},
+            # Keep the red flags of the message that opened the new topic
+            "triage": (red_flag_matcher.triage([str(last_user_message.get("content", ""))])
+                       if last_user_message else None) or {}
         }
 
-    def _build_graph(self) -> StateGraph:
-        """Build the LangGraph state graph"""
+    def _build_graph(self, asynchronous: bool = False, checkpointer: Optional[ThreadedSqliteSaver] = None) -> StateGraph:
+        """
+        Build the LangGraph state graph
+
+        Args:
+            asynchronous: Use the async node implementations, for ainvoke/astream
+            checkpointer: Persist the state per thread id between invocations
+        """
         graph_builder = StateGraph(State)
 
         # Add nodes
-        graph_builder.add_node("interactive_conversation", self._interactive_conversation)
-        graph_builder.add_node("determine_research_needs", self._determine_research_needs)
-        graph_builder.add_node("generate_analysis", self._generate_analysis)
+        if asynchronous:
+            graph_builder.add_node("interactive_conversation", self._ainteractive_conversation)
+            graph_builder.add_node("determine_research_needs", self._adetermine_research_needs)
+            graph_builder.add_node("generate_analysis", self._agenerate_analysis)
+        else:
+            graph_builder.add_node("interactive_conversation", self._interactive_conversation)
+            graph_builder.add_node("determine_research_needs", self._determine_research_needs)
+            graph_builder.add_node("generate_analysis", self._generate_analysis)
+        graph_builder.add_node("triage", self._triage)
         graph_builder.add_node("final_response", self._final_response)
         graph_builder.add_node("reset_conversation", self._reset_conversation)
 
-        # Starting edge
-        graph_builder.add_edge(START, "interactive_conversation")
+        # Starting edges: deterministic triage runs before any LLM call
+        graph_builder.add_edge(START, "triage")
+        graph_builder.add_edge("triage", "interactive_conversation")
 
         # Add conditional edges for the conversation flow
         graph_builder.add_conditional_edges(
@@ -438,19 +949,25 @@ class MedicalAgent:
         graph_builder.add_edge("reset_conversation", "interactive_conversation")
 
         # Compile the graph
-        return graph_builder.compile()
+        return graph_builder.compile(checkpointer=checkpointer)
     
-    def start_chat(self, initial_message: str) -> Dict[str, Any]:
-        """Start a new chat with an initial user message"""
-        initial_state = {
+    def _initial_state(self, initial_message: str) -> Dict[str, Any]:
+        """State for a new chat"""
+        return {
             "messages": [{"role": "user", "content": initial_message}],
             "research_results": {},
             "analysis_complete": False,
             "report": {},
             "conversation_stage": "conversation",
             "symptom_details": {},
-            "question_count": 0
+            "question_count": 0,
+            "history_summary": {},
+            "triage": {}
         }
+
+    def start_chat(self, initial_message: str) -> Dict[str, Any]:
+        """Start a new chat with an initial user message"""
+        initial_state = self._initial_state(initial_message)
         
         try:
             result_state = self.graph.invoke(initial_state, {"recursion_limit": 10})
@@ -462,8 +979,7 @@ class MedicalAgent:
     def continue_chat(self, state: Dict[str, Any], user_message: str) -> Dict[str, Any]:
         """Continue an existing chat with a new user message"""
         # Add the new message
-        updated_messages = state.get("messages", []) + [{"role": "user", "content": user_message}]
-        updated_state = {**state, "messages": updated_messages}
+        updated_state = apply_update(state, {"messages": [{"role": "user", "content": user_message}]})
         
         try:
             result_state = self.graph.invoke(updated_state, {"recursion_limit": 10})
@@ -472,13 +988,174 @@ class MedicalAgent:
         
         return result_state
     
+    async def astart_chat(self, initial_message: str) -> Dict[str, Any]:
+        """Async version of start_chat; awaits I/O instead of blocking the event loop"""
+        initial_state = self._initial_state(initial_message)
+
+        try:
+            return await self.async_graph.ainvoke(initial_state, {"recursion_limit": 10})
+        except GraphRecursionError:
+            return await self._ahandle_recursion_limit(initial_state)
+
+    async def acontinue_chat(self, state: Dict[str, Any], user_message: str) -> Dict[str, Any]:
+        """Async version of continue_chat"""
+        updated_state = apply_update(state, {"messages": [{"role": "user", "content": user_message}]})
+
+        try:
+            return await self.async_graph.ainvoke(updated_state, {"recursion_limit": 10})
+        except GraphRecursionError:
+            return await self._ahandle_recursion_limit(updated_state)
+
+    def _thread_graph(self, asynchronous: bool = False):
+        """Checkpointed graph, failing when no checkpoint path is configured"""
+        if self.checkpointer is None:
+            raise RuntimeError("Checkpointed chats need MEDLAMA_CHECKPOINT_PATH or checkpoint_path")
+        return self.async_thread_graph if asynchronous else self.thread_graph
+
+    def _thread_run(self, thread_id: str, user_message: str, new_thread: bool, **configurable):
+        """Graph input and config for one turn of a checkpointed chat"""
+        if new_thread:
+            graph_input = self._initial_state(user_message)
+        else:
+            # The graph resumes from the thread's checkpoint; only the new message is sent
+            graph_input = {"messages": [{"role": "user", "content": user_message}]}
+        config = {"recursion_limit": 10, "configurable": {"thread_id": thread_id, **configurable}}
+        return graph_input, config
+
+    @staticmethod
+    def _replace_state(state: Dict[str, Any]) -> Dict[str, Any]:
+        """Update that overwrites a thread's checkpoint with a complete state"""
+        return {**state, "messages": ReplaceMessages(state.get("messages", []))}
+
+    def chat_thread(self, thread_id: str, user_message: str, new_thread: bool = False) -> Dict[str, Any]:
+        """
+        Start or continue a chat whose state lives in the checkpointer under a thread id
+
+        Args:
+            thread_id: Conversation id, e.g. the API session id
+            user_message: New user message
+            new_thread: Start the thread from a fresh state
+
+        Returns:
+            The thread's state after the turn
+        """
+        graph = self._thread_graph()
+        graph_input, config = self._thread_run(thread_id, user_message, new_thread)
+        try:
+            return graph.invoke(graph_input, config)
+        except GraphRecursionError:
+            final_state = self._handle_recursion_limit(graph.get_state(config).values)
+            graph.update_state(config, self._replace_state(final_state), as_node="final_response")
+            return final_state
+
+    async def achat_thread(self, thread_id: str, user_message: str, new_thread: bool = False) -> Dict[str, Any]:
+        """Async version of chat_thread"""
+        graph = self._thread_graph(asynchronous=True)
+        graph_input, config = self._thread_run(thread_id, user_message, new_thread)
+        try:
+            return await graph.ainvoke(graph_input, config)
+        except GraphRecursionError:
+            snapshot = await graph.aget_state(config)
+            final_state = await self._ahandle_recursion_limit(snapshot.values)
+            await graph.aupdate_state(config, self._replace_state(final_state), as_node="final_response")
+            return final_state
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Drop every checkpoint of a thread"""
+        if self.checkpointer is None:
+            return
+        self.checkpointer.delete_thread(thread_id)
+
+    def stream_chat(self, user_message: str, state: Optional[Dict[str, Any]] = None,
+                    thread_id: Optional[str] = None, new_thread: bool = False) -> EventStream:
+        """
+        Start or continue a chat, streaming progress while the graph runs.
+
+        Events are ("triage", advisory) when the message raises new red flags, before any
+        LLM call, ("node", {"node", "stage"}) after each graph step, ("research", result)
+        for each condition researched in fanout mode, ("token", text) for each chunk of
+        the analysis report, and finally ("done", result_state),
+        the same state start_chat/continue_chat would return.
+
+        Args:
+            user_message: New user message
+            state: Existing chat state, or None to start a new chat
+            thread_id: Run the turn on a checkpointed thread instead (state is ignored)
+            new_thread: Start the thread from a fresh state
+
+        Returns:
+            Iterable of (event, data) pairs; the graph runs in a background thread
+        """
+        if thread_id is not None:
+            graph = self._thread_graph()
+        elif state is None:
+            current_state = self._initial_state(user_message)
+        else:
+            current_state = apply_update(state, {"messages": [{"role": "user", "content": user_message}]})
+
+        def run(emit: Emit) -> Dict[str, Any]:
+            sinks = {
+                "token_sink": lambda text: emit("token", text),
+                "research_sink": lambda result: emit("research", result)
+            }
+            if thread_id is not None:
+                return self._stream_thread(graph, thread_id, user_message, new_thread, sinks, emit)
+
+            result_state = dict(current_state)
+            config = {"recursion_limit": 10, "configurable": sinks}
+            try:
+                for step in self.graph.stream(current_state, config):
+                    for node, update in step.items():
+                        if node == END:
+                            result_state = dict(update)
+                            continue
+                        result_state = apply_update(result_state, update or {})
+                        self._emit_triage(emit, node, update)
+                        emit("node", {"node": node, "stage": result_state.get("conversation_stage")})
+            except GraphRecursionError:
+                return self._handle_recursion_limit(current_state)
+            return result_state
+
+        return EventStream(run)
+
+    @staticmethod
+    def _emit_triage(emit: Emit, node: str, update: Optional[Dict[str, Any]]) -> None:
+        """Stream the emergency advisory as soon as triage raises new red flags"""
+        triage = (update or {}).get("triage") or {}
+        if node == "triage" and triage.get("new_flags"):
+            emit("triage", triage)
+
+    def _stream_thread(self, graph, thread_id: str, user_message: str, new_thread: bool,
+                       sinks: Dict[str, Any], emit: Emit) -> Dict[str, Any]:
+        """Run one streamed turn on a checkpointed thread and return the thread's state"""
+        graph_input, config = self._thread_run(thread_id, user_message, new_thread, **sinks)
+        try:
+            for step in graph.stream(graph_input, config):
+                for node, update in step.items():
+                    if node != END:
+                        self._emit_triage(emit, node, update)
+                        emit("node", {"node": node, "stage": (update or {}).get("conversation_stage")})
+        except GraphRecursionError:
+            final_state = self._handle_recursion_limit(graph.get_state(config).values)
+            graph.update_state(config, self._replace_state(final_state), as_node="final_response")
+            return final_state
+        return graph.get_state(config).values
+
     def _handle_recursion_limit(self, state: Dict[str, Any]) -> Dict[str, Any]:
         """Force final report generation when recursion limit is hit"""
         warning = {"role": "assistant", "content": "[SYSTEM] Generating final analysis report due to complexity..."}
-        updated_state = {**state, "messages": state.get("messages", []) + [warning]}
+        updated_state = apply_update(state, {"messages": [warning]})
         
         # Force analysis
-        analyzed_state = self._generate_analysis(updated_state)
-        final_state = self._final_response({**updated_state, **analyzed_state})
+        analyzed_state = {**updated_state, **self._generate_analysis(updated_state)}
+        final_state = apply_update(analyzed_state, self._final_response(analyzed_state))
         
         return final_state
+
+    async def _ahandle_recursion_limit(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of _handle_recursion_limit"""
+        warning = {"role": "assistant", "content": "[SYSTEM] Generating final analysis report due to complexity..."}
+        updated_state = apply_update(state, {"messages": [warning]})
+
+        analyzed_state = {**updated_state, **(await self._agenerate_analysis(updated_state))}
+        return apply_update(analyzed_state, self._final_response(analyzed_state))
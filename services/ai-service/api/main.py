@@ -1,7 +1,14 @@
-
 # FastAPI entrypoint for MedLama AI/ML service (local only)
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from api.routes import chat, auth
+from utils.database import database
+from utils.rate_limiter import rate_limiters
+from utils.research_cache import research_cache
+from utils.prefetch import research_prefetcher
+from models import perplexity_client
+from models.llm_cache import llm_cache
+from models.router import tier_metrics
 
 # Create FastAPI app
 app = FastAPI()
@@ -9,3 +16,26 @@ app = FastAPI()
 # Include chat and auth routes (local endpoints)
 app.include_router(chat.router)
 app.include_router(auth.router)
+
+@app.get("/api/health/ready")
+async def ready():
+    """Readiness probe backed by a MongoDB ping"""
+    if await database.ready():
+        return {"status": "ready"}
+    return JSONResponse(status_code=503, content={"status": "unavailable"})
+
+@app.get("/api/metrics")
+async def metrics():
+    """Rate limiter, cache and model tier counters"""
+    return {
+        "rate_limits": rate_limiters.metrics(),
+        "research_cache": research_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "research_prefetch": research_prefetcher.stats(),
+        "model_tiers": tier_metrics.stats()
+    }
+
+@app.on_event("shutdown")
+async def close_clients():
+    database.close()
+    await perplexity_client.aclose()
@@ -2,11 +2,13 @@
 Chat API routes
 """
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 
 from utils.conversation_state import ConversationStateManager
 from agents.medical_agent import MedicalAgent
+from utils.streaming import format_sse, DONE_EVENT
 
 # Router
 router = APIRouter(prefix="/api/chat", tags=["chat"])
@@ -27,6 +29,7 @@ class ChatResponse(BaseModel):
     messages: List[Dict[str, Any]] = Field(..., description="Message history")
     complete: bool = Field(False, description="Whether analysis is complete")
     report: Optional[Dict[str, Any]] = Field(None, description="Analysis report if complete")
+    advisory: Optional[str] = Field(None, description="Emergency advisory when this message raised new red flags")
 
 # Set dependencies
 def set_dependencies(manager: ConversationStateManager, agent: MedicalAgent):
@@ -35,48 +38,111 @@ def set_dependencies(manager: ConversationStateManager, agent: MedicalAgent):
     conversation_manager = manager
     medical_agent = agent
 
-# Routes
-@router.post("", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Process chat message and return response"""
+def _require_agent() -> None:
+    """Fail with 503 when the agent could not be created"""
     if not medical_agent:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="Medical agent not initialized. Please check API keys."
         )
+
+def _get_session(session_id: str):
+    """Look up a session or fail with 404"""
+    session = conversation_manager.get_session(session_id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Session {session_id} not found"
+        )
+    return session
+
+# Session fields kept up to date when the conversation itself lives in the agent's checkpointer
+CHECKPOINTED_FIELDS = ("conversation_stage", "analysis_complete", "question_count", "triage")
+
+def _checkpointed() -> bool:
+    """Whether conversations are stored as checkpointed graph threads keyed by session id"""
+    return medical_agent.checkpointer is not None
+
+def _save_result(session, result: Dict[str, Any]) -> ChatResponse:
+    """Copy the agent's result onto the session and build the response"""
+    fields = CHECKPOINTED_FIELDS if _checkpointed() else result.keys()
+    for key in fields:
+        if key in result:
+            setattr(session, key, result[key])
+    conversation_manager.update_session(session)
+    
+    # Prepare response
+    is_complete = result.get("conversation_stage") == "complete"
+    report = result.get("report") if is_complete else None
+    triage = result.get("triage") or {}
+    
+    return ChatResponse(
+        session_id=session.session_id,
+        messages=result.get("messages", []),
+        complete=is_complete,
+        report=report,
+        advisory=triage.get("advisory") if triage.get("new_flags") else None
+    )
+
+# Routes
+@router.post("", response_model=ChatResponse)
+async def chat(request: ChatRequest):
+    """Process chat message and return response"""
+    _require_agent()
     
     # Get or create session
     session_id = request.session_id
     if session_id:
-        session = conversation_manager.get_session(session_id)
-        if not session:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Session {session_id} not found"
-            )
-        
+        session = _get_session(session_id)
+    else:
+        session = conversation_manager.create_session()
+
+    if _checkpointed():
+        # The graph resumes from the session's checkpoint; only the new message is sent
+        result = await medical_agent.achat_thread(session.session_id, request.message, new_thread=not session_id)
+    elif session_id:
         # Continue existing conversation
         state = session.to_dict()
-        result = medical_agent.continue_chat(state, request.message)
+        result = await medical_agent.acontinue_chat(state, request.message)
     else:
         # Start new conversation
-        session = conversation_manager.create_session()
-        result = medical_agent.start_chat(request.message)
+        result = await medical_agent.astart_chat(request.message)
     
     # Update session with new state
-    for key, value in result.items():
-        setattr(session, key, value)
-    conversation_manager.update_session(session)
-    
-    # Prepare response
-    is_complete = session.conversation_stage == "complete"
-    report = session.report if is_complete else None
-    
-    return ChatResponse(
-        session_id=session.session_id,
-        messages=session.messages,
-        complete=is_complete,
-        report=report
+    return _save_result(session, result)
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Process chat message and stream the response as server-sent events.
+
+    Emits "session" right away, "triage" with an emergency advisory before any model call
+    when the message raises red flags, "node" as each graph step finishes, "token" for each
+    chunk of the analysis report, then "done" with the same body as POST /api/chat.
+    """
+    _require_agent()
+    if request.session_id:
+        session = _get_session(request.session_id)
+        state = None if _checkpointed() else session.to_dict()
+    else:
+        session = conversation_manager.create_session()
+        state = None
+    thread_id = session.session_id if _checkpointed() else None
+
+    def events():
+        yield format_sse("session", {"session_id": session.session_id})
+        stream = medical_agent.stream_chat(request.message, state, thread_id=thread_id,
+                                           new_thread=not request.session_id)
+        for event, data in stream:
+            if event == DONE_EVENT:
+                data = _save_result(session, data).model_dump()
+            yield format_sse(event, data)
+
+    # The generator is synchronous, so Starlette iterates it in a worker thread
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @router.delete("/{session_id}")
@@ -88,6 +154,8 @@ async def delete_chat(session_id: str):
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Session {session_id} not found"
         )
+    if medical_agent:
+        medical_agent.delete_thread(session_id)
     
     return {"status": "success", "message": f"Session {session_id} deleted"}
 
@@ -0,0 +1,53 @@
+"""
+Micro-benchmark of utils.json_extract against the previous regex-based parser
+
+Run from services/ai-service:
+    python -m benchmarks.bench_json_extract
+"""
+import re
+import json
+import timeit
+from typing import Any, Dict, Optional
+
+from utils.json_extract import extract_json
+
+TURN = {"proceed_to_research": False, "assistant_message": "How long have you had the headache?",
+        "symptom_profile": {"symptoms": ["headache", "nausea"], "duration": "2 days"}}
+TURN_JSON = json.dumps(TURN)
+
+# LLM outputs seen in practice, from the easy case to the ones the old parser got wrong
+CASES = {
+    "plain": TURN_JSON,
+    "fenced": f"```json\n{TURN_JSON}\n```",
+    "trailing prose": f"{TURN_JSON}\nLet me know if {{anything}} else is unclear.",
+    "two objects": f'Example: {{"proceed_to_research": true}}\n{TURN_JSON}',
+    "trailing comma": TURN_JSON[:-1] + ",}",
+    "single quotes": "{'proceed_to_research': False, 'assistant_message': 'Any fever?'}",
+    "long report": "Analysis follows. " * 2000 + TURN_JSON + " Closing remarks." * 2000,
+}
+
+
+def legacy_parse(response: str) -> Optional[Dict[str, Any]]:
+    """The parser used before json_extract: a greedy DOTALL regex and json.loads"""
+    match = re.search(r'\{.*\}', response, re.DOTALL)
+    if not match:
+        return None
+    try:
+        return json.loads(match.group())
+    except json.JSONDecodeError:
+        return None
+
+
+def main(number: int = 2000) -> None:
+    print(f"{'case':<16} {'legacy us':>10} {'new us':>10}  legacy ok  new ok")
+    for name, text in CASES.items():
+        runs = number if len(text) < 10000 else number // 20
+        legacy = timeit.timeit(lambda: legacy_parse(text), number=runs) / runs * 1e6
+        new = timeit.timeit(lambda: extract_json(text), number=runs) / runs * 1e6
+        legacy_ok = isinstance(legacy_parse(text), dict) and "assistant_message" in legacy_parse(text)
+        new_ok = "assistant_message" in (extract_json(text, {"assistant_message": str}) or {})
+        print(f"{name:<16} {legacy:>10.1f} {new:>10.1f}  {str(legacy_ok):>9}  {str(new_ok):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Content-addressed cache for LLM responses, with a memory tier and an optional SQLite tier
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+
+class LLMCache:
+    """
+    Cache of LLM completions keyed by a hash of the model, its parameters and the exact prompt.
+
+    Caching is opt-in per node: only nodes listed in ``nodes`` are served from or
+    written to the cache. Entries live in an in-memory LRU and, when a path is given,
+    in a SQLite file shared across restarts and workers.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), max_entries: int = 256, ttl: float = 3600,
+                 path: Optional[str] = None, max_disk_entries: int = 10000):
+        """
+        Initialize the cache
+
+        Args:
+            nodes: Agent nodes allowed to use the cache, e.g. "conversation" ("*" for all)
+            max_entries: Entries kept in memory
+            ttl: Seconds before an entry expires
+            path: SQLite file for the disk tier, or None for memory only
+            max_disk_entries: Entries kept on disk before the least recently used are evicted
+        """
+        self.nodes = set(nodes)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._conn = None
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_accessed ON llm_responses (accessed)")
+            self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> 'LLMCache':
+        """Cache configured by the MEDLAMA_LLM_CACHE_* environment variables (no nodes = disabled)"""
+        nodes = [node.strip() for node in os.getenv("MEDLAMA_LLM_CACHE_NODES", "").split(",") if node.strip()]
+        return cls(
+            nodes=nodes,
+            max_entries=int(os.getenv("MEDLAMA_LLM_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("MEDLAMA_LLM_CACHE_TTL", "3600")),
+            path=os.getenv("MEDLAMA_LLM_CACHE_PATH") or None,
+        )
+
+    @staticmethod
+    def key(model: str, params: Dict[str, Any], prompt: str) -> str:
+        """
+        Content address of a completion request
+
+        Args:
+            model: Model name
+            params: Generation parameters (temperature, ...)
+            prompt: Exact prompt text
+
+        Returns:
+            Hex digest identifying the request
+        """
+        payload = json.dumps({"model": model, "params": params, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def enabled_for(self, node: str) -> bool:
+        """Whether a node may use the cache"""
+        return "*" in self.nodes or node in self.nodes
+
+    def _count(self, node: str, outcome: str) -> None:
+        counters = self._stats.setdefault(node, {"hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, node: str, key: str) -> Optional[str]:
+        """
+        Cached completion for a request, checking memory first and then disk
+
+        Args:
+            node: Node making the call
+            key: Key from LLMCache.key()
+
+        Returns:
+            The cached completion, or None on a miss or when the node is not enabled
+        """
+        if not self.enabled_for(node):
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self._count(node, "hits")
+                return entry[0]
+            if entry is not None:
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value, created FROM llm_responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl:
+                    self._conn.execute("UPDATE llm_responses SET accessed = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self._remember(key, row[0], row[1])
+                    self._count(node, "hits")
+                    return row[0]
+
+            self._count(node, "misses")
+            return None
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def put(self, node: str, key: str, value: str) -> None:
+        """
+        Store a completion
+
+        Args:
+            node: Node that made the call (ignored unless enabled)
+            key: Key from LLMCache.key()
+            value: Completion text
+        """
+        if not self.enabled_for(node) or not value:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE key IN "
+                    "(SELECT key FROM llm_responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counters per node"""
+        with self._lock:
+            return {
+                "nodes": sorted(self.nodes),
+                "memory_entries": len(self._memory),
+                "per_node": {node: dict(counters) for node, counters in self._stats.items()},
+            }
+
+
+# Process-wide cache shared by every agent instance
+llm_cache = LLMCache.from_env()
@@ -43,7 +43,31 @@ class NIMClient:
         """
         # Placeholder implementation - will be replaced with actual NIM API call
         print("NOTE: Using placeholder NIM client - needs implementation in Phase 2")
-        # Local-only mock response for test coverage
+        return self._mock_completion()
+
+    async def achat_completion(self,
+                               messages: List[Dict[str, str]],
+                               model: str = "gemma-2",
+                               temperature: float = 0.3,
+                               max_tokens: int = 2048) -> Dict[str, Any]:
+        """
+        Async version of chat_completion that does not block the event loop
+
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+            model: Model to use (default is gemma-2)
+            temperature: Temperature for generation
+            max_tokens: Maximum tokens to generate
+
+        Returns:
+            Response dictionary with generated content
+        """
+        # Placeholder implementation - will be replaced with an httpx.AsyncClient call to the NIM API
+        print("NOTE: Using placeholder NIM client - needs implementation in Phase 2")
+        return self._mock_completion()
+
+    def _mock_completion(self) -> Dict[str, Any]:
+        """Local-only mock response for test coverage"""
         return {
             "id": "mock-nim",
             "object": "chat.completion",
@@ -60,7 +84,7 @@ class NIMClient:
                 }
             ]
         }
-            
+
     def text_completion(self, 
                          prompt: str,
                          model: str = "gemma-2",
@@ -81,3 +105,12 @@ class NIMClient:
         # Convert to chat format and use chat_completion
         messages = [{"role": "user", "content": prompt}]
         return self.chat_completion(messages, model, temperature, max_tokens)
+
+    async def atext_completion(self,
+                               prompt: str,
+                               model: str = "gemma-2",
+                               temperature: float = 0.3,
+                               max_tokens: int = 2048) -> Dict[str, Any]:
+        """Async version of text_completion"""
+        messages = [{"role": "user", "content": prompt}]
+        return await self.achat_completion(messages, model, temperature, max_tokens)
@@ -2,40 +2,74 @@
 Perplexity API client for medical research (local only)
 """
 import os
-import time
 import requests
-from functools import wraps
-from typing import Dict, Any
+import httpx
+from typing import Dict, Any, Tuple
 from langchain_core.tools import tool
 
-# Rate Limiting Decorator
-def api_rate_limit(seconds: int = 1):
-    """Decorator to add sleep time between API calls"""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            time.sleep(seconds)  # Wait before making the API call
-            return func(*args, **kwargs)
-        return wrapper
-    return decorator
+from utils.rate_limiter import api_rate_limit
+from utils.research_cache import research_cache, condition_key
+
+PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
+
+# Completion budget requested from Perplexity, charged against the tokens-per-minute limit
+MAX_RESEARCH_TOKENS = 2048
+REQUEST_TIMEOUT = 60.0
+
+def _research_tokens(query: str) -> int:
+    """Token estimate charged to the rate limiter for one research call"""
+    return len(query) // 4 + MAX_RESEARCH_TOKENS
+
+def _mock_research(query: str) -> str:
+    """Local-only mock for test coverage"""
+    if "diabetes" in query.lower():
+        return "mock message for local dev, not an LLM response"
+    if "flu" in query.lower():
+        return "Common symptoms of flu include fever, cough, and sore throat."
+    return "mock message for local dev, not an LLM response"
+
+def _research_request(query: str) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Build the Perplexity payload and headers for a research query"""
+    headers = {
+        "accept": "application/json",
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {os.getenv('PERPLEXITY_API_KEY', '')}"
+    }
+    payload = {
+        "model": "sonar-pro",
+        "messages": [
+            {"role": "system", "content": "You are a medical research assistant. Provide precise and well-sourced responses."},
+            {"role": "user", "content": query}
+        ],
+        "temperature": 0.2,
+        "max_tokens": MAX_RESEARCH_TOKENS,
+        "top_p": 0.8,
+        "frequency_penalty": 0.0,
+    }
+    return payload, headers
+
+# Shared async HTTP client so concurrent research calls reuse connections
+_async_client = None
+
+def _get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+    return _async_client
 
 # Medical Research Tool for LangGraph agent
 @tool
-@api_rate_limit(1)
+@api_rate_limit("perplexity", tokens=_research_tokens)
 def perplexity_research(query: str) -> str:
     """Research medical conditions using Perplexity API. Provide citations and links to reliable, authentic research sources."""
-    # Local-only mock for test coverage
     # Always use mock for local test coverage
     if True:
-        if "diabetes" in query.lower():
-            return "mock message for local dev, not an LLM response"
-        if "flu" in query.lower():
-            return "Common symptoms of flu include fever, cough, and sore throat."
-        return "mock message for local dev, not an LLM response"
+        return _mock_research(query)
     # ...existing code for real API call...
+    payload, headers = _research_request(query)
     try:
         print("RESPONSE: Sending request to Perplexity API...")
-        response = requests.post("https://api.perplexity.ai/chat/completions", json=payload, headers=headers)
+        response = requests.post(PERPLEXITY_URL, json=payload, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         json_response = response.json()
         return json_response["choices"][0].get("message", {}).get("content", "No content found.")
@@ -43,16 +77,34 @@ def perplexity_research(query: str) -> str:
         print(f"RESPONSE: API Error Details: {str(e)}")
         return f"Error researching topic: {str(e)}"
 
+@api_rate_limit("perplexity", tokens=_research_tokens)
+async def aperplexity_research(query: str) -> str:
+    """Async version of perplexity_research that does not block the event loop"""
+    # Always use mock for local test coverage
+    if True:
+        return _mock_research(query)
+    payload, headers = _research_request(query)
+    try:
+        print("RESPONSE: Sending async request to Perplexity API...")
+        response = await _get_async_client().post(PERPLEXITY_URL, json=payload, headers=headers)
+        response.raise_for_status()
+        json_response = response.json()
+        return json_response["choices"][0].get("message", {}).get("content", "No content found.")
+    except httpx.HTTPError as e:
+        print(f"RESPONSE: API Error Details: {str(e)}")
+        return f"Error researching topic: {str(e)}"
+
+async def aclose() -> None:
+    """Close the shared async HTTP client"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
 # Function to get research on specific medical conditions
-def get_medical_research(condition: str) -> Dict[str, Any]:
-    """
-    Get detailed research information about a specific medical condition
-    Args:
-        condition: The medical condition to research
-    Returns:
-        Dictionary containing research results
-    """
-    query = f"""
+def _condition_query(condition: str) -> str:
+    """Research prompt for a single condition"""
+    return f"""
     Provide a comprehensive research summary on {condition}, including:
     1. Definition and overview
     2. Common symptoms and progression
@@ -65,9 +117,37 @@ def get_medical_research(condition: str) -> Dict[str, Any]:
     Include citations to medical journals, trusted health organizations (NIH, CDC, WHO, Mayo Clinic),
     and peer-reviewed research where possible.
     """
+
+def get_medical_research(condition: str) -> Dict[str, Any]:
+    """
+    Get detailed research information about a specific medical condition
+    Args:
+        condition: The medical condition to research
+    Returns:
+        Dictionary containing research results
+    """
+    key = condition_key(condition)
+    research_data = research_cache.get(key)
+    if research_data is None:
+        research_data = perplexity_research(_condition_query(condition))
+        if not research_data.startswith("Error researching topic"):
+            research_cache.put(key, research_data)
     
-    research_data = perplexity_research(query)
-    
+    return {
+        "condition": condition,
+        "research": research_data,
+        "source": "Perplexity AI"
+    }
+
+async def aget_medical_research(condition: str) -> Dict[str, Any]:
+    """Async version of get_medical_research"""
+    key = condition_key(condition)
+    research_data = research_cache.get(key)
+    if research_data is None:
+        research_data = await aperplexity_research(_condition_query(condition))
+        if not research_data.startswith("Error researching topic"):
+            research_cache.put(key, research_data)
+
     return {
         "condition": condition,
         "research": research_data,
@@ -0,0 +1,278 @@
+"""
+Routes each agent node to a model tier, falling back to the default tier when a tier is slow or down
+"""
+import os
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.rate_limiter import rate_limiters
+
+
+@dataclass
+class ModelTier:
+    """A model the router can send prompts to"""
+    name: str
+    model: str  # Model name, part of the LLM cache key
+    invoke: Callable[[str], str]
+    ainvoke: Callable[[str], Awaitable[str]]
+    stream: Optional[Callable[[str], Iterator[str]]] = None
+    astream: Optional[Callable[[str], AsyncIterator[str]]] = None
+    timeout: Optional[float] = None  # Seconds before a call counts as failed and falls back
+    provider: Optional[str] = None  # Rate-limit budget each call is charged to (None = not limited)
+
+
+class TierMetrics:
+    """Latency and failure counters per model tier"""
+
+    def __init__(self, window: int = 200):
+        """
+        Initialize the counters
+
+        Args:
+            window: Recent calls per tier used for the latency percentiles
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._tiers: Dict[str, Dict[str, Any]] = {}
+
+    def _tier(self, tier: str) -> Dict[str, Any]:
+        return self._tiers.setdefault(tier, {
+            "calls": 0, "failures": 0, "fallbacks": 0, "latencies": deque(maxlen=self.window)
+        })
+
+    def record(self, tier: str, seconds: float, ok: bool) -> None:
+        """Record one call to a tier"""
+        with self._lock:
+            counters = self._tier(tier)
+            counters["calls"] += 1
+            if ok:
+                counters["latencies"].append(seconds)
+            else:
+                counters["failures"] += 1
+
+    def fallback(self, tier: str) -> None:
+        """Record that a call to a tier was handed to the next tier"""
+        with self._lock:
+            self._tier(tier)["fallbacks"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, failures, fallbacks and p50/p95 latency (ms) of successful calls per tier"""
+        with self._lock:
+            stats = {}
+            for tier, counters in self._tiers.items():
+                latencies = sorted(counters["latencies"])
+                stats[tier] = {
+                    "calls": counters["calls"],
+                    "failures": counters["failures"],
+                    "fallbacks": counters["fallbacks"],
+                    "p50_ms": _percentile_ms(latencies, 0.5),
+                    "p95_ms": _percentile_ms(latencies, 0.95),
+                }
+            return stats
+
+
+def _percentile_ms(ordered: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted latencies in milliseconds"""
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000, 1)
+
+
+class ModelRouter:
+    """
+    Sends each node's prompts to its configured tier.
+
+    Nodes without a route use the default tier. When a routed tier raises, exceeds its
+    timeout or has been marked down, the call moves on to the default tier. A tier is
+    marked down for ``cooldown`` seconds after ``failure_threshold`` consecutive failures.
+    Every request waits for the rate-limit budget of the provider serving it, so a
+    fallback is charged to the tier that actually answers.
+    """
+
+    def __init__(self, tiers: Dict[str, ModelTier], default: str, routes: Optional[Dict[str, str]] = None,
+                 failure_threshold: int = 3, cooldown: float = 30, metrics: Optional[TierMetrics] = None):
+        """
+        Initialize the router
+
+        Args:
+            tiers: Available tiers by name
+            default: Tier used for unrouted nodes and as the fallback
+            routes: Node name -> tier name, e.g. {"conversation": "fast"}
+            failure_threshold: Consecutive failures before a tier is skipped
+            cooldown: Seconds a failing tier is skipped
+            metrics: Latency counters (defaults to the process-wide counters)
+        """
+        unknown = {tier for tier in [default, *(routes or {}).values()] if tier not in tiers}
+        if unknown:
+            raise ValueError(f"Unknown model tier(s): {', '.join(sorted(unknown))}")
+        self.tiers = tiers
+        self.default = default
+        self.routes = dict(routes or {})
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.metrics = metrics or tier_metrics
+        self._failures: Dict[str, int] = {}
+        self._down_until: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(thread_name_prefix="model-tier")
+
+    @classmethod
+    def from_env(cls, tiers: Dict[str, ModelTier], default: str) -> 'ModelRouter':
+        """Router configured by MEDLAMA_MODEL_ROUTES, e.g. "conversation=fast,extraction=fast" """
+        return cls(
+            tiers,
+            default,
+            routes=parse_routes(os.getenv("MEDLAMA_MODEL_ROUTES", "")),
+            failure_threshold=int(os.getenv("MEDLAMA_TIER_FAILURE_THRESHOLD", "3")),
+            cooldown=float(os.getenv("MEDLAMA_TIER_COOLDOWN", "30")),
+        )
+
+    def chain(self, node: str) -> List[ModelTier]:
+        """Tiers to try for a node, in order"""
+        names = [self.routes.get(node, self.default)]
+        if names[0] != self.default:
+            names.append(self.default)
+        return [self.tiers[name] for name in names]
+
+    def primary(self, node: str) -> ModelTier:
+        """Tier a node is routed to when everything is healthy"""
+        return self.chain(node)[0]
+
+    def _available(self, tier: ModelTier, last: bool) -> bool:
+        # The last tier in the chain is always tried; there is nothing left to fall back to
+        with self._lock:
+            return last or self._down_until.get(tier.name, 0) <= time.monotonic()
+
+    def _settle(self, tier: ModelTier, started: float, error: Optional[BaseException]) -> None:
+        self.metrics.record(tier.name, time.monotonic() - started, error is None)
+        with self._lock:
+            if error is None:
+                self._failures[tier.name] = 0
+                return
+            self._failures[tier.name] = self._failures.get(tier.name, 0) + 1
+            if self._failures[tier.name] >= self.failure_threshold:
+                self._down_until[tier.name] = time.monotonic() + self.cooldown
+
+    def _call(self, tier: ModelTier, prompt: str, token_sink: Optional[Callable[[str], None]],
+              emitted: List[bool]) -> str:
+        if tier.provider:
+            rate_limiters.get(tier.provider).acquire()
+        if token_sink and tier.stream:
+            chunks = []
+            for chunk in tier.stream(prompt):
+                chunks.append(chunk)
+                emitted[0] = True
+                token_sink(chunk)
+            return "".join(chunks)
+        if tier.timeout:
+            # A call that times out keeps running in its worker; its result is discarded
+            content = self._executor.submit(tier.invoke, prompt).result(timeout=tier.timeout)
+        else:
+            content = tier.invoke(prompt)
+        if token_sink:
+            token_sink(content)
+        return content
+
+    def invoke(self, node: str, prompt: str,
+               token_sink: Optional[Callable[[str], None]] = None) -> Tuple[str, ModelTier]:
+        """
+        Run a prompt on the node's tier, falling back to the default tier
+
+        Args:
+            node: Calling node
+            prompt: Prompt text
+            token_sink: Receives chunks as they are generated (a tier without streaming sends one chunk)
+
+        Returns:
+            The completion text and the tier that produced it
+        """
+        chain = self.chain(node)
+        for position, tier in enumerate(chain):
+            last = position == len(chain) - 1
+            if not self._available(tier, last):
+                self.metrics.fallback(tier.name)
+                continue
+            started, emitted = time.monotonic(), [False]
+            try:
+                content = self._call(tier, prompt, token_sink, emitted)
+            except Exception as e:
+                self._settle(tier, started, e)
+                # Tokens already streamed cannot be taken back, so only fall back before the first one
+                if last or emitted[0]:
+                    raise
+                print(f"WARNING: Model tier '{tier.name}' failed for {node} ({e!r}); falling back")
+                self.metrics.fallback(tier.name)
+                continue
+            self._settle(tier, started, None)
+            return content, tier
+
+    async def _acall(self, tier: ModelTier, prompt: str, token_sink: Optional[Callable[[str], None]],
+                     emitted: List[bool]) -> str:
+        if tier.provider:
+            await rate_limiters.get(tier.provider).aacquire()
+        if token_sink and tier.astream:
+            chunks = []
+            async for chunk in tier.astream(prompt):
+                chunks.append(chunk)
+                emitted[0] = True
+                token_sink(chunk)
+            return "".join(chunks)
+        if tier.timeout:
+            content = await asyncio.wait_for(tier.ainvoke(prompt), timeout=tier.timeout)
+        else:
+            content = await tier.ainvoke(prompt)
+        if token_sink:
+            token_sink(content)
+        return content
+
+    async def ainvoke(self, node: str, prompt: str,
+                      token_sink: Optional[Callable[[str], None]] = None) -> Tuple[str, ModelTier]:
+        """Async version of invoke"""
+        chain = self.chain(node)
+        for position, tier in enumerate(chain):
+            last = position == len(chain) - 1
+            if not self._available(tier, last):
+                self.metrics.fallback(tier.name)
+                continue
+            started, emitted = time.monotonic(), [False]
+            try:
+                content = await self._acall(tier, prompt, token_sink, emitted)
+            except Exception as e:
+                self._settle(tier, started, e)
+                if last or emitted[0]:
+                    raise
+                print(f"WARNING: Model tier '{tier.name}' failed for {node} ({e!r}); falling back")
+                self.metrics.fallback(tier.name)
+                continue
+            self._settle(tier, started, None)
+            return content, tier
+
+
+def parse_routes(spec: str) -> Dict[str, str]:
+    """
+    Parse a route list such as "conversation=fast, extraction=fast"
+
+    Args:
+        spec: Comma-separated node=tier pairs
+
+    Returns:
+        Node name -> tier name
+    """
+    routes = {}
+    for pair in spec.split(","):
+        if not pair.strip():
+            continue
+        node, separator, tier = pair.partition("=")
+        if not separator or not node.strip() or not tier.strip():
+            raise ValueError(f"Invalid model route: {pair.strip()!r}")
+        routes[node.strip()] = tier.strip()
+    return routes
+
+
+# Process-wide latency counters shared by every router
+tier_metrics = TierMetrics()
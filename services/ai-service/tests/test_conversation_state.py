@@ -1,5 +1,8 @@
 import unittest
-from utils.conversation_state import ConversationSession, ConversationStateManager, parse_structured_response
+from utils.conversation_state import (
+    ConversationSession, ConversationStateManager, parse_structured_response,
+    ReplaceMessages, merge_messages, apply_update
+)
 
 class TestConversationSession(unittest.TestCase):
     def test_add_and_get_latest_message(self):
@@ -53,6 +56,28 @@ class TestConversationStateManager(unittest.TestCase):
         self.assertIsNone(manager.get_session(sid))
         self.assertEqual(manager.list_sessions(), [])
 
+class TestMergeMessages(unittest.TestCase):
+    def test_appends_by_default(self):
+        current = [{"role": "user", "content": "A"}]
+        merged = merge_messages(current, [{"role": "assistant", "content": "B"}])
+        self.assertEqual([m["content"] for m in merged], ["A", "B"])
+        self.assertEqual(len(current), 1)
+
+    def test_replace(self):
+        merged = merge_messages([{"role": "user", "content": "A"}], ReplaceMessages([{"role": "assistant", "content": "B"}]))
+        self.assertEqual(merged, [{"role": "assistant", "content": "B"}])
+        self.assertNotIsInstance(merged, ReplaceMessages)
+
+    def test_empty_current(self):
+        self.assertEqual(merge_messages(None, [{"role": "user", "content": "A"}]), [{"role": "user", "content": "A"}])
+
+    def test_apply_update(self):
+        state = {"messages": [{"role": "user", "content": "A"}], "question_count": 1}
+        updated = apply_update(state, {"messages": [{"role": "assistant", "content": "B"}], "question_count": 2})
+        self.assertEqual(len(updated["messages"]), 2)
+        self.assertEqual(updated["question_count"], 2)
+        self.assertEqual(apply_update(state, {"question_count": 3})["messages"], state["messages"])
+
 class TestParseStructuredResponse(unittest.TestCase):
     def test_parse_valid_json(self):
         resp = '{"a": 1, "b": 2}'
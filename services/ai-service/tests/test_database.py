@@ -0,0 +1,74 @@
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+from utils.database import AsyncDatabase, default_client_options
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    async def to_list(self, length=None):
+        return [dict(document) for document in self.documents]
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor(self.documents)
+
+
+class TestAsyncDatabase(unittest.TestCase):
+    def test_does_not_connect_on_construction(self):
+        db = AsyncDatabase(uri="mongodb://localhost:27017", database_name="test")
+        self.assertIsNone(db._client)
+
+    def test_pool_options_can_be_overridden(self):
+        db = AsyncDatabase(uri="mongodb://localhost:27017", maxPoolSize=5)
+        self.assertEqual(db.client_options["maxPoolSize"], 5)
+        self.assertTrue(db.client_options["retryReads"])
+
+    def test_not_ready_without_uri(self):
+        db = AsyncDatabase(uri="")
+        db.uri = None
+        self.assertFalse(asyncio.run(db.ready()))
+
+    def test_client_requires_uri(self):
+        db = AsyncDatabase(uri="")
+        db.uri = None
+        with self.assertRaises(RuntimeError):
+            db.client
+
+    def test_reads_the_flask_app_database_and_settings(self):
+        with patch.dict(os.environ, {"DATABASE_POOL_SIZE": "7"}, clear=True):
+            db = AsyncDatabase(uri="mongodb://localhost:27017")
+            self.assertEqual(db.database_name, "main")
+            self.assertEqual(default_client_options()["maxPoolSize"], 7)
+
+    def test_get_doctors_filters_by_specialty_and_sorts_by_distance(self):
+        db = AsyncDatabase(uri="mongodb://localhost:27017")
+        doctors = FakeCollection([
+            {"name": "far", "latitude": 1.05, "longitude": 1.0},
+            {"name": "near", "latitude": 1.01, "longitude": 1.0},
+        ])
+        with patch.object(db, "collection", return_value=doctors):
+            results = asyncio.run(db.get_doctors(1.0, 1.0, "cardiologist", limit=1))
+        self.assertEqual([doctor["name"] for doctor in results], ["near"])
+        self.assertEqual(doctors.queries[0]["specialty_tokens"], {"$in": ["cardiology"]})
+
+    def test_get_health_centers_has_no_specialty_filter(self):
+        db = AsyncDatabase(uri="mongodb://localhost:27017")
+        centers = FakeCollection([{"name": "clinic", "latitude": 1.0, "longitude": 1.02}])
+        with patch.object(db, "collection", return_value=centers) as collection:
+            results = asyncio.run(db.get_health_centers(1.0, 1.0))
+        collection.assert_called_with("health_centers")
+        self.assertEqual(results[0]["name"], "clinic")
+        self.assertNotIn("specialty_tokens", centers.queries[0])
+
+if __name__ == "__main__":
+    unittest.main()
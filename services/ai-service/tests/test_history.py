@@ -0,0 +1,59 @@
+import unittest
+from utils.history import HistoryManager, estimate_tokens
+
+def conversation(turns):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Symptom detail number {i}."})
+        messages.append({"role": "assistant", "content": f"Follow-up question {i}?"})
+    return messages
+
+class TestHistoryManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = HistoryManager(max_tokens=500, keep_messages=4, fold_batch=2, summary_tokens=100)
+
+    def test_short_history_is_verbatim(self):
+        messages = conversation(2)
+        history, state = self.manager.compact(messages)
+        self.assertEqual(state["covered"], 0)
+        self.assertIn("Symptom detail number 0.", history)
+        self.assertNotIn("Summary of earlier conversation", history)
+
+    def test_folds_in_batches_and_reuses_summary(self):
+        calls = []
+
+        def summarize(prompt):
+            calls.append(prompt)
+            return f"summary {len(calls)}"
+
+        messages = conversation(4)
+        history, state = self.manager.compact(messages, None, summarize)
+        self.assertEqual(state, {"text": "summary 1", "covered": 4})
+        self.assertIn("summary 1", history)
+        self.assertNotIn("Symptom detail number 0.", history)
+        self.assertIn("Symptom detail number 3.", history)
+
+        # Two more messages stay under keep_messages + fold_batch, so no new summary call
+        messages += [{"role": "user", "content": "More."}, {"role": "assistant", "content": "Ok?"}]
+        _, state = self.manager.compact(messages, state, summarize)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(state["covered"], 4)
+
+    def test_budget_enforced_for_long_messages(self):
+        messages = [{"role": "user", "content": "x" * 1200} for _ in range(3)]
+        history, state = self.manager.compact(messages)
+        self.assertLessEqual(estimate_tokens(history), self.manager.max_tokens)
+        self.assertEqual(state["covered"], 2)
+
+    def test_fallback_summary_and_reset(self):
+        messages = conversation(4)
+        _, state = self.manager.compact(messages, None, lambda prompt: 1 / 0)
+        self.assertIn("Symptom detail number 0.", state["text"])
+        self.assertLessEqual(len(state["text"]), self.manager.summary_tokens * 4)
+        # A replaced history (e.g. a new topic) drops the stale summary
+        history, state = self.manager.compact(conversation(1), state)
+        self.assertEqual(state["covered"], 0)
+        self.assertNotIn("Summary", history)
+
+if __name__ == "__main__":
+    unittest.main()
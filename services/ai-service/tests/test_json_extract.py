@@ -0,0 +1,85 @@
+import unittest
+from unittest.mock import patch
+from utils import json_extract
+from utils.json_extract import (
+    IncrementalJSONParser, extract_json, extract_json_objects, iter_json_stream, matches_schema, repair_json
+)
+from utils.symptom_profile import TURN_RESPONSE_SCHEMA
+
+class TestExtractJSON(unittest.TestCase):
+    def test_plain_and_fenced(self):
+        self.assertEqual(extract_json('{"a": 1}'), {"a": 1})
+        self.assertEqual(extract_json('```json\n{"a": 1}\n```'), {"a": 1})
+        self.assertEqual(extract_json('```\n{"a": 1}\n```'), {"a": 1})
+
+    def test_prose_and_trailing_braces(self):
+        text = 'Here you go:\n{"a": {"b": [1, {"c": 2}]}}\nHope that helps {smile}.'
+        self.assertEqual(extract_json(text), {"a": {"b": [1, {"c": 2}]}})
+
+    def test_braces_and_quotes_inside_strings(self):
+        text = '{"message": "use { and } freely, even \\"quoted\\" ones"}'
+        self.assertEqual(extract_json(text)["message"], 'use { and } freely, even "quoted" ones')
+
+    def test_multiple_objects(self):
+        self.assertEqual(extract_json_objects('{"a": 1} and {"b": 2}'), [{"a": 1}, {"b": 2}])
+
+    def test_unbalanced_prose_brace(self):
+        self.assertEqual(extract_json('I think {maybe... anyway: {"a": 1}'), {"a": 1})
+
+    def test_schema_picks_matching_object(self):
+        text = ('Example: {"proceed_to_research": "?"}\n'
+                '{"proceed_to_research": false, "assistant_message": "When did it start?"}')
+        self.assertEqual(extract_json(text, TURN_RESPONSE_SCHEMA)["assistant_message"], "When did it start?")
+        self.assertIsNone(extract_json('{"a": 1}', {"b": int}))
+        self.assertFalse(matches_schema([1], None))
+        self.assertTrue(matches_schema({"a": "x"}, {"a": (str, int)}))
+
+    def test_no_json(self):
+        self.assertIsNone(extract_json("no json here"))
+        self.assertIsNone(extract_json(""))
+        self.assertEqual(extract_json_objects("{not json}"), [])
+
+class TestRepairJSON(unittest.TestCase):
+    def test_trailing_commas(self):
+        self.assertEqual(extract_json('{"a": [1, 2,], "b": 3,}'), {"a": [1, 2], "b": 3})
+
+    def test_single_quotes_and_python_literals(self):
+        self.assertEqual(extract_json("{'a': 'it\\'s', 'b': True, 'c': None}"), {"a": "it's", "b": True, "c": None})
+        self.assertEqual(extract_json("{'msg': 'he said \"hi\"'}"), {"msg": 'he said "hi"'})
+
+    def test_braces_inside_single_quoted_strings(self):
+        text = "Result: {'note': 'use { and } freely', 'nested': {'k': '}{'}} done"
+        self.assertEqual(extract_json(text), {"note": "use { and } freely", "nested": {"k": "}{"}})
+        self.assertEqual(list(iter_json_stream(text)), [extract_json(text)])
+        self.assertEqual(extract_json("{'smile': ':}', 'ok': True}"), {"smile": ":}", "ok": True})
+        # An apostrophe in prose is not a string opener
+        self.assertEqual(extract_json("I {don't know} but {'a': 1}"), {"a": 1})
+
+    def test_strings_left_alone(self):
+        self.assertEqual(repair_json('{"a": "True, ]"}'), '{"a": "True, ]"}')
+
+class TestIncrementalParser(unittest.TestCase):
+    def test_objects_emitted_when_complete(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('thinking... {"a": {"b": "}'), [])
+        self.assertEqual(parser.feed('"}'), [])
+        self.assertEqual(parser.feed('} then {"c": 1}'), [{"a": {"b": "}"}}, {"c": 1}])
+        self.assertEqual(parser.close(), [])
+
+    def test_each_object_parsed_once(self):
+        depth = 200
+        text = "prose {" + '{"a": ' * depth + "1" + "}" * depth + " more prose"
+        with patch.object(json_extract, "_parse", wraps=json_extract._parse) as parse:
+            objects = extract_json_objects(text)
+        self.assertEqual(len(objects), 1)
+        self.assertEqual(parse.call_count, depth)
+        # Linear in the input: re-parsing each level would be quadratic in the depth
+        self.assertLess(sum(len(call.args[0]) for call in parse.call_args_list), 4 * len(text))
+
+    def test_character_stream(self):
+        text = 'x {"a": [1, {"b": "x\\"}y"}]} y {"c": 2}'
+        self.assertEqual(list(iter_json_stream(text)), extract_json_objects(text))
+        self.assertEqual(list(iter_json_stream(text)), [{"a": [1, {"b": 'x"}y'}]}, {"c": 2}])
+
+if __name__ == "__main__":
+    unittest.main()
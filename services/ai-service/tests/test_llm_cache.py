@@ -0,0 +1,55 @@
+import itertools
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from models.llm_cache import LLMCache
+
+class TestLLMCache(unittest.TestCase):
+    def test_key_depends_on_model_params_and_prompt(self):
+        key = LLMCache.key("gemini-1.5-pro", {"temperature": 0.3}, "prompt")
+        self.assertEqual(key, LLMCache.key("gemini-1.5-pro", {"temperature": 0.3}, "prompt"))
+        self.assertNotEqual(key, LLMCache.key("gemini-1.5-flash", {"temperature": 0.3}, "prompt"))
+        self.assertNotEqual(key, LLMCache.key("gemini-1.5-pro", {"temperature": 0.7}, "prompt"))
+        self.assertNotEqual(key, LLMCache.key("gemini-1.5-pro", {"temperature": 0.3}, "prompt "))
+
+    def test_only_enabled_nodes_use_cache(self):
+        cache = LLMCache(nodes=["conversation"])
+        cache.put("analysis", "k", "report")
+        self.assertIsNone(cache.get("analysis", "k"))
+        cache.put("conversation", "k", "reply")
+        self.assertEqual(cache.get("conversation", "k"), "reply")
+        self.assertEqual(cache.stats()["per_node"]["conversation"], {"hits": 1, "misses": 0})
+        self.assertTrue(LLMCache(nodes=["*"]).enabled_for("analysis"))
+
+    def test_memory_lru_and_ttl(self):
+        cache = LLMCache(nodes=["*"], max_entries=2, ttl=60)
+        cache.put("n", "a", "1")
+        cache.put("n", "b", "2")
+        cache.get("n", "a")
+        cache.put("n", "c", "3")
+        self.assertIsNone(cache.get("n", "b"))
+        self.assertEqual(cache.get("n", "a"), "1")
+        with patch("models.llm_cache.time.time", return_value=time.time() + 120):
+            self.assertIsNone(cache.get("n", "a"))
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "llm.sqlite3")
+            LLMCache(nodes=["*"], path=path).put("n", "k", "reply")
+            restarted = LLMCache(nodes=["*"], path=path)
+            self.assertEqual(restarted.get("n", "k"), "reply")
+            self.assertEqual(restarted.stats()["memory_entries"], 1)
+
+    def test_disk_eviction(self):
+        cache = LLMCache(nodes=["*"], max_entries=1, path=":memory:", max_disk_entries=2)
+        clock = itertools.count(time.time())
+        with patch("models.llm_cache.time.time", side_effect=lambda: next(clock)):
+            for key in ("a", "b", "c"):
+                cache.put("n", key, key)
+        self.assertIsNone(cache.get("n", "a"))
+        self.assertEqual(cache.get("n", "b"), "b")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from unittest.mock import patch
 from agents.medical_agent import *
@@ -37,6 +38,19 @@ class TestMedicalAgent(unittest.TestCase):
         details = self.agent._extract_symptom_details(messages)
         self.assertIn("extracted_data", details)
 
+    def test_extract_symptom_details_retries_prose_reply(self):
+        messages = [{"role": "user", "content": "I have a fever and cough."}]
+        with patch.object(ChatGoogleGenerativeAI, "invoke", side_effect=self.mock_llm_invoke):
+            details = self.agent._extract_symptom_details(messages)
+        self.assertEqual(details["last_updated"], 0)
+        self.assertEqual(details["extracted_data"], "Error processing symptoms")
+
+        reply = self.MockLLMResponse('{"symptoms": ["fever", "cough"]}')
+        with patch.object(ChatGoogleGenerativeAI, "invoke", return_value=reply):
+            details = self.agent._extract_symptom_details(messages, details)
+        self.assertEqual(details["last_updated"], 1)
+        self.assertEqual(details["profile"]["symptoms"], ["fever", "cough"])
+
     def test_interactive_conversation(self):
         state = {
             "messages": [{"role": "user", "content": "I have a fever."}],
@@ -46,6 +60,13 @@ class TestMedicalAgent(unittest.TestCase):
         result = self.agent._interactive_conversation(state)
         self.assertIn("messages", result)
 
+    def test_triage_flags_emergency_without_llm(self):
+        state = {"messages": [{"role": "user", "content": "Crushing chest pressure going down my left arm"}]}
+        with patch.object(ChatGoogleGenerativeAI, "invoke", side_effect=AssertionError("LLM called")):
+            result = self.agent._triage(state)
+        self.assertIn("heart_attack", result["triage"]["new_flags"])
+        self.assertEqual(self.agent._triage({"messages": [{"role": "user", "content": "I have a cold."}]}), {})
+
     def test_determine_research_needs(self):
         state = {
             "messages": [{"role": "user", "content": "I have a fever."}],
@@ -65,6 +86,80 @@ class TestMedicalAgent(unittest.TestCase):
             self.assertIn("analysis_complete", result)
             self.assertIn("fever", result["report"]["content"].lower())
 
+    def test_agenerate_analysis(self):
+        state = {
+            "messages": [{"role": "user", "content": "I have a fever."}],
+            "symptom_details": {"extracted_data": "Fever"},
+            "research_results": {"medical_research": "Fever research"}
+        }
+
+        async def mock_llm_ainvoke(prompt, *args, **kwargs):
+            return self.mock_llm_invoke(prompt)
+
+        with patch.object(ChatGoogleGenerativeAI, "ainvoke", side_effect=mock_llm_ainvoke):
+            result = asyncio.run(self.agent._agenerate_analysis(state))
+            self.assertIn("fever", result["report"]["content"].lower())
+
+    def _research_agent(self, **kwargs):
+        # Every turn goes straight to research so a single message reaches the report
+        with patch.object(MedicalAgent, "_determine_next_stage", return_value="start_research"):
+            return MedicalAgent(gemini_api_key="dummy_key", perplexity_api_key="dummy_key",
+                                research_cache=ResearchCache(None), **kwargs)
+
+    def test_stream_chat_streams_report_tokens(self):
+        agent = self._research_agent()
+        chunks = [self.MockLLMResponse("Mocked "), self.MockLLMResponse("report")]
+        with patch.object(ChatGoogleGenerativeAI, "invoke", side_effect=self.mock_llm_invoke), \
+                patch.object(ChatGoogleGenerativeAI, "stream", return_value=iter(chunks)), \
+                patch("agents.medical_agent.perplexity_research", return_value="Fever research"):
+            events = list(agent.stream_chat("I have a fever."))
+        tokens = [data for event, data in events if event == "token"]
+        self.assertEqual("".join(tokens), "Mocked report")
+        self.assertIn("Mocked report", events[-1][1]["report"]["content"])
+
+    def test_stream_chat_streams_fanout_research(self):
+        agent = self._research_agent(research_mode="fanout")
+
+        def research(condition):
+            return {"condition": condition, "research": f"{condition} research", "source": "Perplexity AI"}
+
+        with patch.object(ChatGoogleGenerativeAI, "invoke", side_effect=self.mock_llm_invoke), \
+                patch.object(agent, "_ranked_conditions", return_value=["Influenza", "Common cold"]), \
+                patch("agents.medical_agent.get_medical_research", side_effect=research):
+            events = list(agent.stream_chat("I have a fever."))
+        researched = sorted(data["condition"] for event, data in events if event == "research")
+        self.assertEqual(researched, ["Common cold", "Influenza"])
+
+    def _speculate(self, agent, state, profile):
+        update = {"conversation_stage": "conversation", "symptom_details": {"profile": profile},
+                  "messages": [{"role": "assistant", "content": "How severe is it?"}]}
+        agent._speculate(state, update)
+        return {**state, "symptom_details": update["symptom_details"],
+                "research_results": update.get("research_results", state.get("research_results", {}))}
+
+    def test_prefetch_is_scoped_per_conversation(self):
+        agent = MedicalAgent(gemini_api_key="dummy_key", perplexity_api_key="dummy_key", speculative_research=True,
+                             prefetcher=ResearchPrefetcher(max_workers=1), research_cache=ResearchCache(None))
+        profile = {"symptoms": ["cough"], "onset": "2 days", "severity": "mild"}
+        start = {"messages": [{"role": "user", "content": "I have a cough."}], "research_results": {}}
+        with patch.object(agent, "_research", return_value={"medical_research": "Cough research"}):
+            first = self._speculate(agent, dict(start), profile)
+            second = self._speculate(agent, dict(start), profile)
+            self.assertNotEqual(first["research_results"]["prefetch_key"], second["research_results"]["prefetch_key"])
+            # The first conversation's profile changes; the second one's prefetch must survive
+            self._speculate(agent, first, {**profile, "symptoms": ["cough", "fever"]})
+            prefetched = agent._claim_prefetch(second, agent._research_key(second))
+            self.assertEqual(prefetched.result(5), {"medical_research": "Cough research"})
+
+    def test_prefetch_key_recorded_only_when_started(self):
+        agent = MedicalAgent(gemini_api_key="dummy_key", perplexity_api_key="dummy_key", speculative_research=True,
+                             prefetcher=ResearchPrefetcher(max_workers=1), research_cache=ResearchCache(None))
+        profile = {"symptoms": ["cough"], "onset": "2 days", "severity": "mild"}
+        start = {"messages": [{"role": "user", "content": "I have a cough."}], "research_results": {}}
+        with patch.object(agent.prefetcher, "prefetch", return_value=False):
+            state = self._speculate(agent, start, profile)
+        self.assertNotIn("prefetch_key", state["research_results"])
+
     def test_final_response(self):
         state = {
             "messages": [{"role": "user", "content": "I have a fever."}],
@@ -73,12 +168,47 @@ class TestMedicalAgent(unittest.TestCase):
         result = self.agent._final_response(state)
         self.assertIn("messages", result)
 
+    def test_chat_thread_sends_only_new_message(self):
+        agent = MedicalAgent(gemini_api_key="dummy_key", perplexity_api_key="dummy_key", checkpoint_path=":memory:")
+        with patch.object(ChatGoogleGenerativeAI, "invoke", side_effect=self.mock_llm_invoke):
+            first = agent.chat_thread("thread-1", "I have a fever.", new_thread=True)
+            second = agent.chat_thread("thread-1", "It started yesterday.")
+        self.assertEqual(len(second["messages"]), len(first["messages"]) + 2)
+        self.assertEqual(second["messages"][:len(first["messages"])], first["messages"])
+        self.assertEqual(second["question_count"], first["question_count"] + 1)
+
+    def test_achat_thread_sends_only_new_message(self):
+        agent = MedicalAgent(gemini_api_key="dummy_key", perplexity_api_key="dummy_key", checkpoint_path=":memory:")
+
+        async def mock_llm_ainvoke(prompt, *args, **kwargs):
+            return self.mock_llm_invoke(prompt)
+
+        async def run():
+            first = await agent.achat_thread("thread-1", "I have a fever.", new_thread=True)
+            second = await agent.achat_thread("thread-1", "It started yesterday.")
+            return first, second
+
+        with patch.object(ChatGoogleGenerativeAI, "ainvoke", side_effect=mock_llm_ainvoke):
+            first, second = asyncio.run(run())
+        self.assertEqual(len(second["messages"]), len(first["messages"]) + 2)
+        self.assertEqual(second["question_count"], first["question_count"] + 1)
+
+    def test_delete_thread(self):
+        agent = MedicalAgent(gemini_api_key="dummy_key", perplexity_api_key="dummy_key", checkpoint_path=":memory:")
+        config = {"configurable": {"thread_id": "thread-1"}}
+        with patch.object(ChatGoogleGenerativeAI, "invoke", side_effect=self.mock_llm_invoke):
+            agent.chat_thread("thread-1", "I have a fever.", new_thread=True)
+        self.assertIsNotNone(agent.checkpointer.get_tuple(config))
+        agent.delete_thread("thread-1")
+        self.assertIsNone(agent.checkpointer.get_tuple(config))
+
     def test_reset_conversation(self):
         state = {
             "messages": [{"role": "user", "content": "I have a fever."}]
         }
         result = self.agent._reset_conversation(state)
         self.assertIn("messages", result)
+        self.assertIsInstance(result["messages"], ReplaceMessages)
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,3 +1,4 @@
+import asyncio
 import unittest
 from models.nim_client import *
 
@@ -13,5 +14,9 @@ class TestNimClient(unittest.TestCase):
         content = result.get("choices", [{}])[0].get("message", {}).get("content", "")
         self.assertTrue(any(symptom in content.lower() for symptom in ["fever", "cough", "sore throat"]), "NIMClient did not mention common flu symptoms.")
 
+    def test_async_text_completion(self):
+        result = asyncio.run(self.client.atext_completion("What are common symptoms of flu?"))
+        self.assertEqual(result, self.client.text_completion("What are common symptoms of flu?"))
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,6 +1,7 @@
 """
 Basic test for perplexity_research mock function in local dev mode.
 """
+import asyncio
 import sys
 import os
 import pytest
@@ -20,5 +21,11 @@ class TestPerplexityClient(unittest.TestCase):
         result = perplexity_research("What are common symptoms of flu?")
         self.assertTrue(any(symptom in result.lower() for symptom in ["fever", "cough", "sore throat"]), "Perplexity did not mention common flu symptoms.")
 
+    def test_async_research(self):
+        result = asyncio.run(aperplexity_research("What are common symptoms of flu?"))
+        self.assertIn("fever", result.lower())
+        research = asyncio.run(aget_medical_research("influenza"))
+        self.assertEqual(research["condition"], "influenza")
+
 if __name__ == "__main__":
     unittest.main()
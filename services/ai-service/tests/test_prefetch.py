@@ -0,0 +1,48 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from utils.prefetch import ResearchPrefetcher
+from utils.symptom_profile import SymptomProfile
+
+class TestResearchPrefetcher(unittest.TestCase):
+    def setUp(self):
+        self.prefetcher = ResearchPrefetcher(max_workers=2, ttl=60)
+
+    def test_hit_returns_background_result(self):
+        release = threading.Event()
+
+        def research():
+            release.wait(5)
+            return {"medical_research": "flu"}
+
+        self.assertTrue(self.prefetcher.prefetch("key", research))
+        self.assertFalse(self.prefetcher.prefetch("key", research))
+        future = self.prefetcher.take("key")
+        release.set()
+        self.assertEqual(future.result(5), {"medical_research": "flu"})
+        self.assertIsNone(self.prefetcher.take("key"))
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats["started"], stats["hits"], stats["hit_rate"]), (1, 1, 1.0))
+
+    def test_discard_and_expiry_count_as_waste(self):
+        self.prefetcher.prefetch("old", lambda: "old")
+        self.prefetcher.discard("old")
+        self.prefetcher.discard(None)
+        self.prefetcher.prefetch("stale", lambda: "stale")
+        with patch("utils.prefetch.time.time", return_value=time.time() + 120):
+            self.assertIsNone(self.prefetcher.take("stale"))
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats["wasted"], stats["waste_rate"], stats["pending"]), (2, 1.0, 0))
+
+    def test_none_key_is_ignored(self):
+        self.assertFalse(self.prefetcher.prefetch(None, lambda: "x"))
+        self.assertIsNone(self.prefetcher.take(None))
+
+class TestProfileStability(unittest.TestCase):
+    def test_stable_needs_symptoms_onset_and_severity(self):
+        self.assertFalse(SymptomProfile(symptoms=["cough"], onset="2 days").is_stable())
+        self.assertTrue(SymptomProfile(symptoms=["cough"], onset="2 days", severity="mild").is_stable())
+
+if __name__ == "__main__":
+    unittest.main()
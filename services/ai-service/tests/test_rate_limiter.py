@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from utils.rate_limiter import TokenBucket, ProviderLimiter, RateLimiterRegistry, api_rate_limit
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestTokenBucket(unittest.TestCase):
+    def test_idle_bucket_does_not_wait(self):
+        bucket = TokenBucket(rate=1.0, capacity=2.0, clock=FakeClock())
+        self.assertEqual(bucket.reserve(), 0.0)
+        self.assertEqual(bucket.reserve(), 0.0)
+
+    def test_exhausted_bucket_waits_for_refill(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2.0, capacity=1.0, clock=clock)
+        bucket.reserve()
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        # Queued callers are served in order
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        clock.now = 10.0
+        self.assertEqual(bucket.reserve(), 0.0)
+
+class TestProviderLimiter(unittest.TestCase):
+    def test_token_budget_limits_large_calls(self):
+        clock = FakeClock()
+        limiter = ProviderLimiter(requests_per_second=100, tokens_per_minute=600, clock=clock)
+        self.assertEqual(limiter._reserve(600), 0.0)
+        self.assertAlmostEqual(limiter._reserve(60), 6.0)
+
+    def test_metrics_track_throttling(self):
+        limiter = ProviderLimiter(requests_per_second=1000)
+        limiter.acquire()
+        metrics = limiter.metrics()
+        self.assertEqual(metrics["acquired"], 1)
+        self.assertEqual(metrics["queue_depth"], 0)
+
+    def test_async_acquire(self):
+        limiter = ProviderLimiter(requests_per_second=1000)
+        self.assertEqual(asyncio.run(limiter.aacquire()), 0.0)
+
+class TestRegistry(unittest.TestCase):
+    def test_separate_budget_per_key(self):
+        registry = RateLimiterRegistry()
+        self.assertIs(registry.get("gemini", "a"), registry.get("gemini", "a"))
+        self.assertIsNot(registry.get("gemini", "a"), registry.get("gemini", "b"))
+        self.assertIn("gemini", registry.metrics())
+
+class TestDecorator(unittest.TestCase):
+    def test_wraps_sync_and_async_functions(self):
+        @api_rate_limit("test-sync")
+        def add(a, b):
+            return a + b
+
+        @api_rate_limit("test-async", tokens=lambda text: len(text))
+        async def echo(text):
+            return text
+
+        self.assertEqual(add(1, 2), 3)
+        self.assertEqual(asyncio.run(echo("hi")), "hi")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+from utils.research_cache import ResearchCache, age_band, onset_band, profile_key, condition_key
+from utils.symptom_profile import SymptomProfile
+
+class TestResearchKeys(unittest.TestCase):
+    def test_age_band(self):
+        self.assertEqual(age_band("I am a 45-year-old man"), "40-64")
+        self.assertEqual(age_band("72 y/o with cough"), "65+")
+        self.assertEqual(age_band("I'm 16"), "0-17")
+        self.assertEqual(age_band("I am 5 days into this fever"), "unknown")
+
+    def test_onset_band(self):
+        self.assertEqual(onset_band("started 3 days ago"), "1-6d")
+        self.assertEqual(onset_band("for a couple of weeks"), "1-4w")
+        self.assertEqual(onset_band("since last night"), "<1d")
+        self.assertEqual(onset_band("a while"), "unknown")
+
+    def test_profile_key_ignores_order_and_wording(self):
+        first = profile_key(None, ["Fever and cough for 3 days", "I'm 30"])
+        second = profile_key(None, ["A cough, and a fever too. Started 2 days ago.", "I am 35 years old"])
+        self.assertEqual(first, second)
+        self.assertEqual(first, "profile:cough;fever|history:|onset:1-6d|age:18-39")
+        self.assertIsNone(profile_key(None, ["Nothing specific"]))
+
+    def test_profile_key_keeps_location_and_quality(self):
+        keys = {profile_key(None, [text]) for text in
+                ("Sharp pain in my right knee", "Ear pain and discharge", "Burning pain when I urinate")}
+        self.assertEqual(len(keys), 3)
+
+    def test_profile_key_drops_negated_findings(self):
+        self.assertEqual(profile_key(None, ["No fever, but a cough"]), profile_key(None, ["I have a cough"]))
+        self.assertIsNone(profile_key(None, ["I don't have a fever"]))
+
+    def test_profile_key_uses_structured_profile(self):
+        profile = SymptomProfile(symptoms=["Sharp pain in the right knee"], onset="2 weeks",
+                                 history=["no history of heart disease", "type 2 diabetes"])
+        self.assertEqual(profile_key(profile, ["I am 50"]),
+                         "profile:pain@right knee/sharp|history:type 2 diabetes|onset:1-4w|age:40-64")
+        self.assertNotEqual(profile_key(profile, []), profile_key(SymptomProfile(symptoms=["knee pain"]), []))
+
+    def test_profile_key_maps_findings_to_canonical_terms(self):
+        cache = ResearchCache(":memory:")
+        wordings = [
+            ["Sharp pain in the right knee"],
+            ["right knee pain, sharp"],
+            ["My right knee hurts, it's sharp"],
+            ["sharp right knee ache"],
+            ["Knee pain (right), sharp", "also a dry cough"],
+            ["coughing, dry", "sharp aching right knee"],
+        ]
+        cache.put(profile_key(SymptomProfile(symptoms=wordings[0], onset="2 weeks"), []), {"research": "knee"})
+        for symptoms in wordings[1:4]:
+            self.assertIsNotNone(cache.get(profile_key(SymptomProfile(symptoms=symptoms, onset="10 days"), [])))
+        self.assertEqual(profile_key(SymptomProfile(symptoms=wordings[4]), []),
+                         profile_key(SymptomProfile(symptoms=wordings[5]), []))
+        self.assertIsNone(cache.get(profile_key(SymptomProfile(symptoms=["dull pain in the left knee"], onset="2 weeks"), [])))
+        self.assertEqual(cache.hits, 3)
+
+    def test_condition_key(self):
+        self.assertEqual(condition_key("  Type 2   Diabetes "), condition_key("type 2 diabetes"))
+
+class TestResearchCache(unittest.TestCase):
+    def test_disabled_without_path(self):
+        cache = ResearchCache()
+        cache.put("k", "v")
+        self.assertIsNone(cache.get("k"))
+        self.assertFalse(cache.stats()["enabled"])
+
+    def test_hit_miss_and_ttl(self):
+        cache = ResearchCache(":memory:", ttl=60)
+        self.assertIsNone(cache.get("k"))
+        cache.put("k", "research")
+        self.assertEqual(cache.get("k"), "research")
+        with patch("utils.research_cache.time.time", return_value=10**12):
+            self.assertIsNone(cache.get("k"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 2, 0))
+        self.assertEqual(stats["hit_rate"], 0.333)
+
+    def test_lru_eviction(self):
+        cache = ResearchCache(":memory:", max_entries=2)
+        now = time.time()
+        with patch("utils.research_cache.time.time", side_effect=[now, now + 1, now + 2, now + 3]):
+            cache.put("a", 1)
+            cache.put("b", 2)
+            cache.get("a")
+            cache.put("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_persists_across_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache", "research.sqlite3")
+            ResearchCache(path).put("k", {"research": "text"})
+            self.assertEqual(ResearchCache(path).get("k"), {"research": "text"})
+
+if __name__ == "__main__":
+    unittest.main()
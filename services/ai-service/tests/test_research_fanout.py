@@ -0,0 +1,31 @@
+import unittest
+from utils.research_fanout import build_ranking_prompt, parse_ranked_conditions, extract_citations, merge_research
+
+class TestResearchFanout(unittest.TestCase):
+    def test_parse_ranked_conditions(self):
+        response = '```json\n{"conditions": ["Influenza", "COVID-19", "influenza", " Common  cold ", "Strep throat"]}\n```'
+        self.assertEqual(parse_ranked_conditions(response, 3), ["Influenza", "COVID-19", "Common cold"])
+        self.assertEqual(parse_ranked_conditions("I am not sure.", 3), [])
+        self.assertEqual(parse_ranked_conditions('{"conditions": "flu"}', 3), [])
+
+    def test_ranking_prompt(self):
+        prompt = build_ranking_prompt("Fever and cough", 4)
+        self.assertIn("Fever and cough", prompt)
+        self.assertIn("4 most probable", prompt)
+
+    def test_extract_citations(self):
+        text = "See https://www.cdc.gov/flu/. Also (https://pubmed.ncbi.nlm.nih.gov/123) and https://www.cdc.gov/flu/"
+        self.assertEqual(extract_citations(text), ["https://www.cdc.gov/flu/", "https://pubmed.ncbi.nlm.nih.gov/123"])
+
+    def test_merge_research_keeps_rank_order_and_dedupes_sources(self):
+        merged = merge_research([
+            {"condition": "Influenza", "research": "Flu. https://www.cdc.gov/flu", "source": "Perplexity AI"},
+            {"condition": "COVID-19", "research": "Covid. https://www.cdc.gov/flu https://www.who.int/covid", "source": "Perplexity AI"},
+        ])
+        self.assertEqual(merged["conditions"], ["Influenza", "COVID-19"])
+        self.assertEqual(merged["citations"], ["https://www.cdc.gov/flu", "https://www.who.int/covid"])
+        self.assertLess(merged["medical_research"].index("1. Influenza"), merged["medical_research"].index("2. COVID-19"))
+        self.assertIn("Sources:", merged["medical_research"])
+
+if __name__ == "__main__":
+    unittest.main()
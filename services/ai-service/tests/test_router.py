@@ -0,0 +1,113 @@
+import asyncio
+import time
+import unittest
+from models.router import ModelRouter, ModelTier, TierMetrics, parse_routes
+from utils.rate_limiter import rate_limiters
+
+
+def make_tier(name, reply=None, error=None, delay=0.0, timeout=None, stream=False, provider=None):
+    calls = []
+
+    def invoke(prompt):
+        calls.append(prompt)
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise error
+        return reply or f"{name}:{prompt}"
+
+    async def ainvoke(prompt):
+        calls.append(prompt)
+        if delay:
+            await asyncio.sleep(delay)
+        if error:
+            raise error
+        return reply or f"{name}:{prompt}"
+
+    def chunks(prompt):
+        calls.append(prompt)
+        yield f"{name}:"
+        yield prompt
+
+    tier = ModelTier(name, f"{name}-model", invoke=invoke, ainvoke=ainvoke,
+                     stream=chunks if stream else None, timeout=timeout, provider=provider)
+    return tier, calls
+
+
+class TestModelRouter(unittest.TestCase):
+    def test_routes_nodes_to_tiers(self):
+        fast, fast_calls = make_tier("fast")
+        large, large_calls = make_tier("large")
+        router = ModelRouter({"fast": fast, "large": large}, "large", {"conversation": "fast"}, metrics=TierMetrics())
+        self.assertEqual(router.invoke("conversation", "q")[0], "fast:q")
+        content, tier = router.invoke("analysis", "report")
+        self.assertEqual((content, tier.name), ("large:report", "large"))
+        self.assertEqual(router.primary("conversation").model, "fast-model")
+        self.assertEqual((len(fast_calls), len(large_calls)), (1, 1))
+
+    def test_unknown_tier_rejected(self):
+        large, _ = make_tier("large")
+        with self.assertRaises(ValueError):
+            ModelRouter({"large": large}, "large", {"conversation": "fast"})
+
+    def test_falls_back_on_error_and_marks_tier_down(self):
+        metrics = TierMetrics()
+        fast, fast_calls = make_tier("fast", error=RuntimeError("down"))
+        large, _ = make_tier("large")
+        router = ModelRouter({"fast": fast, "large": large}, "large", {"conversation": "fast"},
+                             failure_threshold=2, cooldown=60, metrics=metrics)
+        for _ in range(3):
+            content, tier = router.invoke("conversation", "q")
+            self.assertEqual(tier.name, "large")
+        # Skipped after two consecutive failures
+        self.assertEqual(len(fast_calls), 2)
+        stats = metrics.stats()
+        self.assertEqual(stats["fast"]["failures"], 2)
+        self.assertEqual(stats["fast"]["fallbacks"], 3)
+        self.assertEqual(stats["large"]["calls"], 3)
+        self.assertIsNotNone(stats["large"]["p95_ms"])
+
+    def test_falls_back_when_slow(self):
+        fast, _ = make_tier("fast", delay=0.5, timeout=0.05)
+        large, _ = make_tier("large")
+        router = ModelRouter({"fast": fast, "large": large}, "large", {"extraction": "fast"}, metrics=TierMetrics())
+        self.assertEqual(router.invoke("extraction", "q")[1].name, "large")
+        self.assertEqual(asyncio.run(router.ainvoke("extraction", "q"))[1].name, "large")
+
+    def test_default_tier_errors_propagate(self):
+        large, _ = make_tier("large", error=RuntimeError("down"))
+        router = ModelRouter({"large": large}, "large", metrics=TierMetrics())
+        with self.assertRaises(RuntimeError):
+            router.invoke("analysis", "q")
+
+    def test_token_sink(self):
+        fast, _ = make_tier("fast")
+        large, _ = make_tier("large", stream=True)
+        router = ModelRouter({"fast": fast, "large": large}, "large", {"conversation": "fast"}, metrics=TierMetrics())
+        tokens = []
+        self.assertEqual(router.invoke("analysis", "q", tokens.append)[0], "large:q")
+        self.assertEqual(tokens, ["large:", "q"])
+        tokens.clear()
+        router.invoke("conversation", "q", tokens.append)
+        self.assertEqual(tokens, ["fast:q"])
+
+    def test_charges_the_provider_that_serves_the_call(self):
+        fast, _ = make_tier("fast", error=RuntimeError("down"), provider="test-router-fast")
+        large, _ = make_tier("large", provider="test-router-large")
+        router = ModelRouter({"fast": fast, "large": large}, "large", {"conversation": "fast"}, metrics=TierMetrics())
+        router.invoke("conversation", "q")
+        asyncio.run(router.ainvoke("analysis", "q"))
+        metrics = rate_limiters.metrics()
+        self.assertEqual(metrics["test-router-fast"]["acquired"], 1)
+        self.assertEqual(metrics["test-router-large"]["acquired"], 2)
+
+    def test_parse_routes(self):
+        self.assertEqual(parse_routes(" conversation=fast, extraction = fast ,"),
+                         {"conversation": "fast", "extraction": "fast"})
+        self.assertEqual(parse_routes(""), {})
+        with self.assertRaises(ValueError):
+            parse_routes("conversation")
+
+
+if __name__ == "__main__":
+    unittest.main()
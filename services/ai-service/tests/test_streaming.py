@@ -0,0 +1,46 @@
+import json
+import threading
+import unittest
+from utils.streaming import EventStream, format_sse
+
+class TestFormatSse(unittest.TestCase):
+    def test_event_format(self):
+        text = format_sse("token", "Hello")
+        self.assertEqual(text, 'event: token\ndata: "Hello"\n\n')
+        payload = format_sse("node", {"node": "generate_analysis"}).split("data: ", 1)[1]
+        self.assertEqual(json.loads(payload), {"node": "generate_analysis"})
+
+class TestEventStream(unittest.TestCase):
+    def test_events_arrive_before_producer_finishes(self):
+        release = threading.Event()
+
+        def producer(emit):
+            emit("token", "first")
+            release.wait(5)
+            emit("token", "second")
+            return {"report": "done"}
+
+        stream = iter(EventStream(producer))
+        self.assertEqual(next(stream), ("token", "first"))
+        release.set()
+        self.assertEqual(list(stream), [("token", "second"), ("done", {"report": "done"})])
+
+    def test_error_ends_stream(self):
+        def producer(emit):
+            raise RuntimeError("boom")
+
+        self.assertEqual(list(EventStream(producer)), [("error", {"detail": "boom"})])
+
+    def test_heartbeat_while_waiting(self):
+        release = threading.Event()
+
+        def producer(emit):
+            release.wait(5)
+
+        stream = iter(EventStream(producer, heartbeat=0.01))
+        self.assertEqual(next(stream), ("ping", None))
+        release.set()
+        self.assertEqual(list(stream)[-1], ("done", None))
+
+if __name__ == "__main__":
+    unittest.main()
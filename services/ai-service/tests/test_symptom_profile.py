@@ -0,0 +1,61 @@
+import unittest
+from utils.symptom_profile import SymptomProfile, build_profile_update_prompt, validate_turn_response
+
+class TestSymptomProfile(unittest.TestCase):
+    def test_merge_adds_new_list_entries_once(self):
+        profile = SymptomProfile(symptoms=["Headache"])
+        changed = profile.merge({"symptoms": ["headache", "nausea"], "modifiers": "worse with light"})
+        self.assertTrue(changed)
+        self.assertEqual(profile.symptoms, ["Headache", "nausea"])
+        self.assertEqual(profile.modifiers, ["worse with light"])
+
+    def test_merge_keeps_text_fields_without_new_value(self):
+        profile = SymptomProfile(onset="3 days ago", severity="7/10")
+        self.assertFalse(profile.merge({"onset": "", "severity": None}))
+        self.assertEqual(profile.onset, "3 days ago")
+        profile.merge({"severity": "9/10"})
+        self.assertEqual(profile.severity, "9/10")
+
+    def test_round_trip_and_summary(self):
+        profile = SymptomProfile.from_dict({"symptoms": ["fever"], "history": ["asthma"], "unknown": 1})
+        self.assertEqual(SymptomProfile.from_dict(profile.to_dict()), profile)
+        self.assertIn("Symptoms: fever", profile.summary())
+        self.assertIn("Relevant history: asthma", profile.summary())
+        self.assertTrue(SymptomProfile().is_empty())
+
+    def test_prompt_contains_only_new_messages(self):
+        prompt = build_profile_update_prompt(SymptomProfile(symptoms=["fever"]), ["It started yesterday."])
+        self.assertIn("It started yesterday.", prompt)
+        self.assertIn('"fever"', prompt)
+
+class TestValidateTurnResponse(unittest.TestCase):
+    def test_combined_response(self):
+        proceed, message, update = validate_turn_response({
+            "proceed_to_research": "false",
+            "assistant_message": " How long has it lasted? ",
+            "symptom_profile": {"symptoms": ["cough"], "onset": None}
+        }, require_profile=True)
+        self.assertFalse(proceed)
+        self.assertEqual(message, "How long has it lasted?")
+        self.assertEqual(update["symptoms"], ["cough"])
+
+    def test_profile_optional_outside_combined_mode(self):
+        self.assertEqual(validate_turn_response({"proceed_to_research": True, "assistant_message": "Thanks."}),
+                         (True, "Thanks.", {}))
+
+    def test_rejects_invalid_schema(self):
+        invalid = [
+            [],
+            {"assistant_message": "Hi"},
+            {"proceed_to_research": "maybe", "assistant_message": "Hi"},
+            {"proceed_to_research": False, "assistant_message": ""},
+            {"proceed_to_research": False, "assistant_message": "Hi", "symptom_profile": {"onset": 3}},
+        ]
+        for data in invalid:
+            with self.assertRaises(ValueError):
+                validate_turn_response(data)
+        with self.assertRaises(ValueError):
+            validate_turn_response({"proceed_to_research": False, "assistant_message": "Hi"}, require_profile=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+from utils.triage import RedFlagMatcher, RedFlagRule, red_flag_matcher, CRISIS_ADVICE, EMERGENCY_ADVICE
+
+class TestRedFlagMatcher(unittest.TestCase):
+    def flags(self, *messages):
+        result = red_flag_matcher.triage(list(messages))
+        return result["flags"] if result else []
+
+    def test_heart_attack_needs_co_occurrence(self):
+        self.assertIn("heart_attack", self.flags("Crushing chest pressure radiating to my left arm"))
+        self.assertIn("heart_attack", self.flags("My chest hurts and there is pain", "I'm sweating a lot"))
+        self.assertEqual(self.flags("I have chest pain when I cough"), [])
+
+    def test_stroke_signs(self):
+        self.assertIn("stroke", self.flags("My face is drooping and my speech is slurred"))
+        self.assertIn("stroke_sudden", self.flags("Suddenly I can't lift my arm"))
+        self.assertEqual(self.flags("My arm is weak after the gym"), [])
+
+    def test_anaphylaxis(self):
+        self.assertIn("anaphylaxis", self.flags("I ate peanuts and my throat is swelling"))
+        self.assertEqual(self.flags("I have a peanut allergy"), [])
+
+    def test_negation(self):
+        self.assertEqual(self.flags("I don't have chest pain or shortness of breath"), [])
+        self.assertEqual(self.flags("No slurred speech, no facial droop"), [])
+        self.assertEqual(self.flags("I'm not suicidal"), [])
+        # Negation ends at the clause boundary
+        self.assertIn("stroke", self.flags("No chest pain, but my arm is numb and my speech is slurred"))
+
+    def test_negation_does_not_hide_later_findings(self):
+        self.assertIn("heart_attack", self.flags("no fever, crushing chest pain down my left arm"))
+        self.assertIn("heart_attack", self.flags(
+            "I don't know what is happening, I have crushing chest pain spreading to my left arm"))
+        self.assertIn("heart_attack", self.flags(
+            "It doesn't go away, crushing chest pressure radiating to my jaw and I am sweating"))
+        self.assertIn("stroke", self.flags(
+            "I haven't been able to speak properly, my face is drooping and my arm is weak"))
+        self.assertIn("heart_attack", self.flags("I have no fever and crushing chest pain down my left arm"))
+
+    def test_negation_inside_feature_is_not_a_cue(self):
+        self.assertIn("cannot_breathe", self.flags("I can not breathe"))
+        self.assertIn("severe_bleeding", self.flags("The bleeding doesn't stop"))
+        self.assertIn("self_harm", self.flags("I don't want to live anymore"))
+
+    def test_advisory(self):
+        result = red_flag_matcher.triage(["Crushing chest pressure spreading to my jaw"])
+        self.assertTrue(result["emergency"])
+        self.assertIn("heart attack", result["advisory"])
+        self.assertIn(EMERGENCY_ADVICE, result["advisory"])
+        self.assertEqual(red_flag_matcher.triage(["I want to kill myself"])["advisory"], CRISIS_ADVICE)
+        self.assertIsNone(red_flag_matcher.triage(["I have a runny nose"]))
+
+    def test_already_flagged_rules_are_not_new(self):
+        result = red_flag_matcher.triage(["I got stung and can't breathe"], flagged=["anaphylaxis"])
+        self.assertEqual(result["new_flags"], ["cannot_breathe"])
+        self.assertNotIn("allergic", result["advisory"])
+        again = red_flag_matcher.triage(["I got stung and can't breathe"], flagged=result["flags"])
+        self.assertEqual(again["new_flags"], [])
+
+    def test_custom_rules(self):
+        matcher = RedFlagMatcher(
+            rules=[RedFlagRule("stiff_neck_fever", "meningitis", (frozenset({"stiff_neck"}), frozenset({"fever"})))],
+            feature_patterns={"stiff_neck": r"stiff neck", "fever": r"fever"}
+        )
+        self.assertEqual([rule.name for rule in matcher.match("fever and a stiff neck")], ["stiff_neck_fever"])
+        self.assertEqual(matcher.match("stiff neck, no fever"), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+SQLite checkpointer shared by the agent's sync and async graphs
+"""
+import os
+import asyncio
+import sqlite3
+import threading
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+
+class ThreadedSqliteSaver(SqliteSaver):
+    """
+    SqliteSaver whose async methods run the sync ones in a worker thread.
+
+    SqliteSaver only implements the sync interface, so an async graph compiled with
+    it fails on its first checkpoint read. Running the calls in a thread lets the sync
+    and async graphs share one saver (and so one set of threads) without blocking the
+    event loop. Calls are serialized on a lock because they share one connection.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, **kwargs: Any):
+        super().__init__(conn, **kwargs)
+        self._calls = threading.Lock()
+
+    @classmethod
+    def from_path(cls, path: Optional[str]) -> Optional['ThreadedSqliteSaver']:
+        """Saver for a SQLite file (":memory:" for a process-local one), or None without a path"""
+        if not path:
+            return None
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        return cls(sqlite3.connect(path, check_same_thread=False))
+
+    def get_tuple(self, *args: Any, **kwargs: Any):
+        with self._calls:
+            return super().get_tuple(*args, **kwargs)
+
+    def list(self, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        # Read everything under the lock rather than holding it while the caller iterates
+        with self._calls:
+            return iter(list(super().list(*args, **kwargs)))
+
+    def put(self, *args: Any, **kwargs: Any):
+        with self._calls:
+            return super().put(*args, **kwargs)
+
+    def put_writes(self, *args: Any, **kwargs: Any) -> None:
+        with self._calls:
+            return super().put_writes(*args, **kwargs)
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Delete every checkpoint (and pending write) stored for a thread"""
+        with self._calls:
+            delete = getattr(super(), "delete_thread", None)
+            if delete is not None:
+                delete(thread_id)
+                return
+            # Savers predating delete_thread keep everything in the checkpoints table
+            with self.cursor() as cur:
+                cur.execute("DELETE FROM checkpoints WHERE thread_id = ?", (str(thread_id),))
+
+    async def aget_tuple(self, *args: Any, **kwargs: Any):
+        return await asyncio.to_thread(self.get_tuple, *args, **kwargs)
+
+    async def alist(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        for item in await asyncio.to_thread(lambda: list(self.list(*args, **kwargs))):
+            yield item
+
+    async def aput(self, *args: Any, **kwargs: Any):
+        return await asyncio.to_thread(self.put, *args, **kwargs)
+
+    async def aput_writes(self, *args: Any, **kwargs: Any) -> None:
+        return await asyncio.to_thread(self.put_writes, *args, **kwargs)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
@@ -3,9 +3,10 @@ Conversation state management utilities
 """
 from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, field
-import json
 import uuid
 
+from utils.json_extract import extract_json
+
 
 @dataclass
 class ConversationSession:
@@ -18,6 +19,8 @@ class ConversationSession:
     conversation_stage: str = "conversation"  # conversation, research, complete
     symptom_details: Dict[str, Any] = field(default_factory=dict)
     question_count: int = 0
+    history_summary: Dict[str, Any] = field(default_factory=dict)
+    triage: Dict[str, Any] = field(default_factory=dict)
     created_at: Optional[str] = None
     updated_at: Optional[str] = None
 
@@ -32,6 +35,8 @@ class ConversationSession:
             "conversation_stage": self.conversation_stage,
             "symptom_details": self.symptom_details,
             "question_count": self.question_count,
+            "history_summary": self.history_summary,
+            "triage": self.triage,
             "created_at": self.created_at,
             "updated_at": self.updated_at
         }
@@ -80,6 +85,45 @@ class ConversationSession:
         self.conversation_stage = "conversation"
         self.symptom_details.clear()
         self.question_count = 0
+        self.history_summary.clear()
+        self.triage.clear()
+
+
+class ReplaceMessages(list):
+    """Message list that replaces the conversation history instead of extending it"""
+
+
+def merge_messages(current: Optional[List[Dict[str, Any]]], update: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Reducer for the agent's message channel: updates are appended unless wrapped in ReplaceMessages
+
+    Args:
+        current: Messages so far
+        update: Messages returned by a node
+
+    Returns:
+        New message list
+    """
+    if isinstance(update, ReplaceMessages):
+        return list(update)
+    return list(current or []) + list(update or [])
+
+
+def apply_update(state: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a node's update to a state outside the graph, the way the graph would
+
+    Args:
+        state: Current state
+        update: Node result
+
+    Returns:
+        New state; messages are merged with merge_messages, other keys overwritten
+    """
+    merged = {**state, **update}
+    if "messages" in update:
+        merged["messages"] = merge_messages(state.get("messages"), update["messages"])
+    return merged
 
 
 class ConversationStateManager:
@@ -117,7 +161,7 @@ class ConversationStateManager:
 def parse_structured_response(response: str) -> Dict[str, Any]:
     """
     Parse a structured JSON response from the LLM, with fallback handling.
-    This function will be improved in later phases with the notebook's logic.
+    The first JSON object is used, wherever it appears in the text (see utils.json_extract).
     
     Args:
         response: Raw response from LLM
@@ -125,21 +169,11 @@ def parse_structured_response(response: str) -> Dict[str, Any]:
     Returns:
         Parsed response dictionary
     """
-    try:
-        # Try to find JSON in the response
-        import re
-        json_match = re.search(r'\{.*\}', response, re.DOTALL)
-        if json_match:
-            return json.loads(json_match.group())
-        else:
-            # Fallback: treat as regular text response
-            return {
-                "proceed_to_research": False,
-                "assistant_message": response
-            }
-    except json.JSONDecodeError:
-        # Fallback for invalid JSON
-        return {
-            "proceed_to_research": False,
-            "assistant_message": response
-        }
+    data = extract_json(response)
+    if data is not None:
+        return data
+    # Fallback: no (repairable) JSON object, treat as regular text response
+    return {
+        "proceed_to_research": False,
+        "assistant_message": response
+    }
@@ -0,0 +1,210 @@
+"""
+Shared, lazily-connected async MongoDB access for the AI service
+"""
+import os
+import heapq
+import asyncio
+import importlib.util
+import sys
+from typing import Any, Dict, List, Optional
+
+# Database holding the provider collections; the Flask app reads the same variable
+DEFAULT_DATABASE = "main"
+
+# Half-width of the provider search box in degrees, as in the Flask app's box backend
+SEARCH_RADIUS = 0.1
+
+# Fields the Flask app strips from every provider it returns (spatial_index.INTERNAL_FIELDS)
+PUBLIC_PROJECTION = {field: 0 for field in ("_id", "location", "geo_cell", "specialty_tokens", "updated_at")}
+
+# Specialty normalization is shared with the Flask app so both filter doctors the same way
+_SPECIALTIES = "medlama_specialties"
+_SPECIALTIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "specialties.py")
+
+
+def _normalize_specialty(text: Optional[str]) -> List[str]:
+    """Canonical specialty tokens for a free-text specialty (see the root specialties module)"""
+    if _SPECIALTIES not in sys.modules:
+        spec = importlib.util.spec_from_file_location(_SPECIALTIES, _SPECIALTIES_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[_SPECIALTIES] = module
+    return sys.modules[_SPECIALTIES].normalize_specialty(text)
+
+
+def _setting(name: str, default: int) -> int:
+    """Integer setting from MONGODB_<name>, falling back to the Flask app's DATABASE_<name>"""
+    return int(os.getenv(f"MONGODB_{name}") or os.getenv(f"DATABASE_{name}") or default)
+
+
+def default_client_options() -> Dict[str, Any]:
+    """
+    Connection pool and timeout settings, overridable through the environment.
+
+    The Flask app's DATABASE_* variables are used when the MONGODB_* ones are not
+    set, so one configuration drives both processes.
+
+    Returns:
+        Keyword arguments for the Motor client
+    """
+    return {
+        "maxPoolSize": _setting("POOL_SIZE", 50),
+        "minPoolSize": _setting("MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _setting("MAX_IDLE_MS", 60000),
+        "waitQueueTimeoutMS": _setting("WAIT_QUEUE_TIMEOUT_MS", 2000),
+        "serverSelectionTimeoutMS": _setting("SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _setting("CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _setting("SOCKET_TIMEOUT_MS", 10000),
+        "retryReads": True,
+        "retryWrites": True,
+    }
+
+
+class AsyncDatabase:
+    """
+    Async MongoDB handle backed by Motor.
+
+    No connection is made until the first query, so importing the API does not
+    require a reachable database. One instance (and so one connection pool) is
+    meant to be shared by every request handler in the process.
+    """
+
+    def __init__(self, uri: Optional[str] = None, database_name: Optional[str] = None, **client_options: Any):
+        """
+        Initialize the database handle
+
+        Args:
+            uri: MongoDB connection string (defaults to MONGODB_URI, then the Flask app's
+                database-connection-string)
+            database_name: Database to use (defaults to MONGODB_DATABASE, then "main")
+            client_options: Overrides for the pool and timeout settings
+        """
+        self.uri = uri or os.getenv("MONGODB_URI") or os.getenv("database-connection-string")
+        self.database_name = database_name or os.getenv("MONGODB_DATABASE", DEFAULT_DATABASE)
+        self.client_options = {**default_client_options(), **client_options}
+        self._client = None
+
+    @property
+    def client(self):
+        """Create the Motor client on first use"""
+        if self._client is None:
+            if not self.uri:
+                raise RuntimeError("MONGODB_URI is not set")
+            # Imported lazily so the service still starts where Motor is not installed
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self._client = AsyncIOMotorClient(self.uri, **self.client_options)
+        return self._client
+
+    @property
+    def database(self):
+        """The configured database"""
+        return self.client[self.database_name]
+
+    def collection(self, name: str):
+        """
+        Get a collection from the configured database
+
+        Args:
+            name: Collection name
+
+        Returns:
+            Motor collection
+        """
+        return self.database[name]
+
+    async def _nearby(self, name: str, latitude: float, longitude: float, query: Optional[Dict[str, Any]] = None,
+                      limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Providers inside the search box, closest first
+
+        Args:
+            name: Provider collection
+            latitude: Search centre latitude
+            longitude: Search centre longitude
+            query: Extra MongoDB filter
+            limit: Maximum number of providers to return
+            offset: Number of closest providers to skip
+
+        Returns:
+            Provider documents with a planar ``distance`` in degrees
+        """
+        parameters = {
+            "latitude": {"$lt": latitude + SEARCH_RADIUS, "$gt": latitude - SEARCH_RADIUS},
+            "longitude": {"$lt": longitude + SEARCH_RADIUS, "$gt": longitude - SEARCH_RADIUS},
+        }
+        if query:
+            parameters.update(query)
+
+        results = []
+        for document in await self.collection(name).find(parameters, PUBLIC_PROJECTION).to_list(length=None):
+            document["distance"] = ((document["latitude"] - latitude) ** 2 + (document["longitude"] - longitude) ** 2) ** 0.5
+            results.append(document)
+
+        if limit:
+            return heapq.nsmallest(offset + limit, results, key=lambda x: x["distance"])[offset:]
+        results.sort(key=lambda x: x["distance"])
+        return results[offset:]
+
+    async def get_doctors(self, latitude: float, longitude: float, specialty: Optional[str] = None,
+                          limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Doctors near a point, optionally filtered by specialty
+
+        Args:
+            latitude: Search centre latitude
+            longitude: Search centre longitude
+            specialty: Free-text specialty, matched on the doctors' specialty tokens
+            limit: Maximum number of doctors to return
+            offset: Number of closest doctors to skip
+
+        Returns:
+            Doctor documents ordered by distance
+        """
+        tokens = _normalize_specialty(specialty)
+        query = {"specialty_tokens": {"$in": tokens}} if tokens else None
+        return await self._nearby("doctors", latitude, longitude, query, limit=limit, offset=offset)
+
+    async def get_health_centers(self, latitude: float, longitude: float, limit: Optional[int] = None,
+                                 offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        Health centers near a point
+
+        Args:
+            latitude: Search centre latitude
+            longitude: Search centre longitude
+            limit: Maximum number of health centers to return
+            offset: Number of closest health centers to skip
+
+        Returns:
+            Health center documents ordered by distance
+        """
+        return await self._nearby("health_centers", latitude, longitude, limit=limit, offset=offset)
+
+    async def ready(self, timeout: float = 2.0) -> bool:
+        """
+        Readiness probe: ping the server without blocking the event loop
+
+        Args:
+            timeout: Seconds to wait for the ping
+
+        Returns:
+            True when the server answered
+        """
+        if not self.uri:
+            return False
+        try:
+            await asyncio.wait_for(self.client.admin.command("ping"), timeout)
+            return True
+        except Exception as e:
+            print(f"ERROR: Database readiness check failed: {str(e)}")
+            return False
+
+    def close(self) -> None:
+        """Close the pool; the next query opens a new one"""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+# Process-wide instance shared by the API routes
+database = AsyncDatabase()
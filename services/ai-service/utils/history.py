@@ -0,0 +1,190 @@
+"""
+Token-budgeted conversation history: recent turns verbatim, older turns folded into a rolling summary
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple, Callable
+
+from utils.text_processing import format_conversation_history
+
+# Rough characters-per-token ratio used for the local token estimate
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of a text without calling a tokenizer service.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Approximate number of tokens
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class HistoryManager:
+    """
+    Keeps the prompt's conversation history within a token budget.
+
+    The newest messages are kept verbatim; older ones are folded into a rolling
+    summary that is stored in the conversation state ({"text", "covered"}) so it
+    is only extended, never rebuilt. Folding happens in batches, so most turns
+    reuse the stored summary without any extra LLM call.
+
+    Folding is split into pending() / fold() so the caller can produce the new
+    summary with a sync or an async LLM call; compact() does both for sync callers.
+    """
+
+    def __init__(self, max_tokens: int = 2000, keep_messages: int = 6, fold_batch: int = 4, summary_tokens: int = 400):
+        """
+        Initialize the manager
+
+        Args:
+            max_tokens: Budget for the rendered history (summary plus verbatim messages)
+            keep_messages: Messages kept verbatim once older ones are folded
+            fold_batch: Extra messages allowed to pile up before folding, to batch summary calls
+            summary_tokens: Maximum size of the rolling summary
+        """
+        self.max_tokens = max_tokens
+        self.keep_messages = keep_messages
+        self.fold_batch = fold_batch
+        self.summary_tokens = summary_tokens
+
+    @classmethod
+    def from_env(cls) -> 'HistoryManager':
+        """Create a manager configured by the MEDLAMA_HISTORY_* environment variables"""
+        return cls(
+            max_tokens=int(os.getenv("MEDLAMA_HISTORY_TOKENS", "2000")),
+            keep_messages=int(os.getenv("MEDLAMA_HISTORY_KEEP_MESSAGES", "6")),
+            fold_batch=int(os.getenv("MEDLAMA_HISTORY_FOLD_BATCH", "4")),
+            summary_tokens=int(os.getenv("MEDLAMA_HISTORY_SUMMARY_TOKENS", "400")),
+        )
+
+    def _normalize(self, messages: List[Dict[str, Any]], summary_state: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        state = {"text": "", "covered": 0, **(summary_state or {})}
+        # The history was replaced (e.g. a new topic), so the summary no longer applies
+        if state["covered"] > len(messages):
+            state = {"text": "", "covered": 0}
+        return state
+
+    def pending(self, messages: List[Dict[str, Any]],
+                summary_state: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Work out which messages have to be folded into the summary this turn
+
+        Args:
+            messages: Full message history
+            summary_state: Stored summary state, if any
+
+        Returns:
+            (summary state, messages to fold); the list is empty when no fold is due
+        """
+        state = self._normalize(messages, summary_state)
+        recent = messages[state["covered"]:]
+
+        fold = 0
+        if len(recent) > self.keep_messages + self.fold_batch:
+            fold = len(recent) - self.keep_messages
+
+        # Fold further if the verbatim part alone would blow the budget; the last message always stays
+        budget = self.max_tokens - self.summary_tokens
+        verbatim = sum(estimate_tokens(format_conversation_history([msg])) for msg in recent[fold:])
+        while verbatim > budget and fold < len(recent) - 1:
+            verbatim -= estimate_tokens(format_conversation_history([recent[fold]]))
+            fold += 1
+
+        return state, recent[:fold]
+
+    def fold_prompt(self, summary_text: str, messages: List[Dict[str, Any]]) -> str:
+        """
+        Prompt asking an LLM to extend the rolling summary
+
+        Args:
+            summary_text: Current summary
+            messages: Messages to fold in
+
+        Returns:
+            Prompt string
+        """
+        return f"""
+        Update the running summary of a medical consultation with the new messages.
+        Keep every symptom, timing, severity, medication and history detail; drop pleasantries.
+        Stay under {self.summary_tokens * 3 // 4} words and return only the summary text.
+
+        Current summary:
+        {summary_text or "(none)"}
+
+        New messages:
+        {format_conversation_history(messages)}
+        """
+
+    def fold(self, summary_state: Dict[str, Any], messages: List[Dict[str, Any]],
+             new_summary: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Record that ``messages`` are now covered by the summary
+
+        Args:
+            summary_state: State returned by pending()
+            messages: The messages that were folded
+            new_summary: Summary produced by the LLM, or None to fall back to clipped excerpts
+
+        Returns:
+            New summary state
+        """
+        if not messages:
+            return summary_state
+        if not new_summary:
+            excerpts = [format_conversation_history([msg])[:200] for msg in messages]
+            new_summary = "\n".join(filter(None, [summary_state["text"]] + excerpts))
+        limit = self.summary_tokens * CHARS_PER_TOKEN
+        text = new_summary.strip()
+        if len(text) > limit:
+            # Keep the newest part of an overlong summary
+            text = "..." + text[-(limit - 3):]
+        return {"text": text, "covered": summary_state["covered"] + len(messages)}
+
+    def render(self, messages: List[Dict[str, Any]], summary_state: Optional[Dict[str, Any]] = None) -> str:
+        """
+        History text for the prompt: the summary followed by the verbatim messages
+
+        Args:
+            messages: Full message history
+            summary_state: Summary state after any due fold
+
+        Returns:
+            Formatted history within the token budget
+        """
+        state = self._normalize(messages, summary_state)
+        history = format_conversation_history(messages[state["covered"]:])
+        limit = self.max_tokens * CHARS_PER_TOKEN
+        if state["text"]:
+            history = f"Summary of earlier conversation:\n{state['text']}\n\nRecent messages:\n{history}"
+        if len(history) > limit:
+            # A single message longer than the whole budget: keep its end
+            history = "..." + history[-(limit - 3):]
+        return history
+
+    def compact(self, messages: List[Dict[str, Any]], summary_state: Optional[Dict[str, Any]] = None,
+                summarize: Optional[Callable[[str], str]] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Fold messages if due and render the history
+
+        Args:
+            messages: Full message history
+            summary_state: Stored summary state, if any
+            summarize: Function turning a fold prompt into summary text (None for clipped excerpts)
+
+        Returns:
+            (history text, new summary state)
+        """
+        state, to_fold = self.pending(messages, summary_state)
+        if to_fold:
+            new_summary = None
+            if summarize is not None:
+                try:
+                    new_summary = summarize(self.fold_prompt(state["text"], to_fold))
+                except Exception as e:
+                    print(f"ERROR: History summarization failed: {str(e)}")
+            state = self.fold(state, to_fold, new_summary)
+        return self.render(messages, state), state
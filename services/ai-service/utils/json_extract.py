@@ -0,0 +1,313 @@
+"""
+Single-pass extraction of JSON objects from LLM output, with repair and schema checks
+"""
+import re
+import json
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Characters that matter while scanning: braces and quotes outside strings, the closing quote and escapes inside them
+_STRUCTURE = re.compile(r"""[{}"']""")
+_IN_STRING = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_STRING = {'"': re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL), "'": re.compile(r"'(?:[^'\\]|\\.)*'", re.DOTALL)}
+# A single quote only opens a string where a key or value can start; elsewhere it is an apostrophe
+_VALUE_START = "{[,:"
+# Stands in for an already parsed child object while its parent is parsed
+_PLACEHOLDER = "\x00"
+_INVALID = object()
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+Schema = Dict[str, Any]
+
+
+def repair_json(candidate: str) -> str:
+    """
+    Fix the mistakes LLMs commonly make in JSON
+
+    Converts single-quoted strings to double-quoted ones, drops trailing commas
+    before a closing bracket and maps Python's True/False/None to JSON literals.
+
+    Args:
+        candidate: Text of one object, braces included
+
+    Returns:
+        Repaired text (unchanged where nothing needed fixing)
+    """
+    out: List[str] = []
+    quote = None
+    i, length = 0, len(candidate)
+    while i < length:
+        char = candidate[i]
+        if quote is not None:
+            if char == "\\" and i + 1 < length:
+                following = candidate[i + 1]
+                # \' is not a JSON escape; inside a converted string it is just a quote
+                out.append("'" if following == "'" and quote == "'" else char + following)
+                i += 2
+                continue
+            if char == quote:
+                out.append('"')
+                quote = None
+            elif char == '"':
+                out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            else:
+                out.append(char)
+        elif char in "\"'":
+            out.append('"')
+            quote = char
+        elif char in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+            out.append(char)
+        elif char.isalpha():
+            end = i
+            while end < length and (candidate[end].isalnum() or candidate[end] == "_"):
+                end += 1
+            word = candidate[i:end]
+            out.append(_LITERALS.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out)
+
+
+def matches_schema(data: Any, schema: Optional[Schema]) -> bool:
+    """
+    Whether parsed JSON has every required key with an accepted type
+
+    Args:
+        data: Parsed value
+        schema: Required key -> type or tuple of types (None accepts any object)
+
+    Returns:
+        True if data is an object satisfying the schema
+    """
+    if not isinstance(data, dict):
+        return False
+    return all(key in data and isinstance(data[key], expected) for key, expected in (schema or {}).items())
+
+
+def _fill(value: Any, children: List[Any]) -> Any:
+    """Replace child placeholders in a parsed skeleton with the children's parsed values"""
+    if isinstance(value, dict):
+        return {key: _fill(item, children) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_fill(item, children) for item in value]
+    if isinstance(value, str) and value.startswith(_PLACEHOLDER):
+        return children[int(value[1:])]
+    return value
+
+
+def _opens_string(text: str, quote: int) -> bool:
+    """Whether the single quote at this offset starts a string rather than being an apostrophe"""
+    i = quote - 1
+    while i >= 0 and text[i].isspace():
+        i -= 1
+    return i >= 0 and text[i] in _VALUE_START
+
+
+def _parse(candidate: str) -> Optional[Any]:
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(candidate))
+    except ValueError:
+        return None
+
+
+class IncrementalJSONParser:
+    """
+    Finds top-level JSON objects in text that arrives in chunks.
+
+    Each character is scanned once: outside an object the scanner jumps to the next
+    "{", inside one it only stops at braces, quotes and escapes. Single-quoted strings
+    (which repair_json converts) are skipped like double-quoted ones when the quote
+    follows "{", "[", "," or ":"; any other single quote is an apostrophe.
+
+    Every object is parsed (repairing it if needed) once, when it closes. A parent is
+    parsed with its children replaced by placeholders and their values filled back in,
+    so each character is parsed once however deep the nesting. A top-level object
+    that fails the schema falls back to the complete objects nested inside it, so
+    JSON wrapped in braces of surrounding prose is still found.
+    """
+
+    def __init__(self, schema: Optional[Schema] = None):
+        """
+        Initialize the parser
+
+        Args:
+            schema: Required key -> type(s) an object must have to be returned
+        """
+        self.schema = schema
+        self._buffer = ""
+        self._pos = 0
+        # Quote character of the string being scanned, or None outside strings
+        self._quote: Optional[str] = None
+        self._escape = False
+        # Open objects: [start offset, complete child objects as (start, end, children, value)]
+        self._stack: List[list] = []
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        Scan the next chunk of output
+
+        Args:
+            chunk: Newly received text
+
+        Returns:
+            Objects completed by this chunk, in order
+        """
+        self._buffer += chunk
+        text, pos, found = self._buffer, self._pos, []
+        while pos < len(text):
+            if self._escape:
+                self._escape = False
+                pos += 1
+                continue
+            if not self._stack:
+                pos = text.find("{", pos)
+                if pos < 0:
+                    pos = len(text)
+                    break
+                self._stack.append([pos, []])
+                pos += 1
+                continue
+            match = (_IN_STRING[self._quote] if self._quote else _STRUCTURE).search(text, pos)
+            if match is None:
+                pos = len(text)
+                break
+            char, pos = match.group(), match.end()
+            if char == "\\":
+                self._escape = True
+            elif char in "\"'":
+                if self._quote:
+                    self._quote = None
+                elif char == '"' or _opens_string(text, pos - 1):
+                    # Skip a whole string at once; only an unterminated one needs the slow path
+                    string = _STRING[char].match(text, pos - 1)
+                    if string:
+                        pos = string.end()
+                    else:
+                        self._quote = char
+            elif char == "{":
+                self._stack.append([pos - 1, []])
+            else:
+                start, children = self._stack.pop()
+                node = (start, pos, children, self._parse_node(text, start, pos, children))
+                if self._stack:
+                    self._stack[-1][1].append(node)
+                else:
+                    self._emit(text, node, found)
+
+        if self._stack:
+            self._buffer, self._pos = text, pos
+        else:
+            # Nothing open: drop the scanned text so memory stays bounded while streaming
+            self._buffer, self._pos = "", 0
+        return found
+
+    def close(self) -> List[Dict[str, Any]]:
+        """
+        Finish the stream
+
+        Returns:
+            Complete objects inside a brace that was never closed (e.g. a stray "{" in prose)
+        """
+        found: List[Dict[str, Any]] = []
+        for _, children in self._stack:
+            for child in children:
+                self._emit(self._buffer, child, found)
+        self._buffer, self._pos, self._stack = "", 0, []
+        self._quote, self._escape = None, False
+        return found
+
+    @staticmethod
+    def _parse_node(text: str, start: int, end: int, children: List[tuple]) -> Any:
+        """Parsed value of a closed object, reusing its children's values (_INVALID if it is not JSON)"""
+        if any(child[3] is _INVALID for child in children):
+            # A broken child cannot be part of a valid parent
+            return _INVALID
+        parts, pos = [], start
+        for i, (child_start, child_end, _, _) in enumerate(children):
+            parts.append(text[pos:child_start])
+            parts.append('"\\u0000%d"' % i)
+            pos = child_end
+        parts.append(text[pos:end])
+        data = _parse("".join(parts))
+        if not isinstance(data, dict):
+            return _INVALID
+        return _fill(data, [child[3] for child in children]) if children else data
+
+    def _emit(self, text: str, node: Tuple[int, int, list, Any], found: List[Dict[str, Any]]) -> None:
+        _, _, children, data = node
+        if data is not _INVALID and matches_schema(data, self.schema):
+            found.append(data)
+            return
+        for child in children:
+            self._emit(text, child, found)
+
+
+def extract_json_objects(text: str, schema: Optional[Schema] = None) -> List[Dict[str, Any]]:
+    """
+    Every JSON object in a text, ignoring surrounding prose and code fences
+
+    Args:
+        text: LLM output
+        schema: Required key -> type(s); objects without them are skipped
+
+    Returns:
+        Parsed objects in order of appearance
+    """
+    parser = IncrementalJSONParser(schema)
+    return parser.feed(text or "") + parser.close()
+
+
+def extract_json(text: str, schema: Optional[Schema] = None) -> Optional[Dict[str, Any]]:
+    """
+    First JSON object in a text that satisfies the schema
+
+    Args:
+        text: LLM output
+        schema: Required key -> type(s)
+
+    Returns:
+        The parsed object, or None if there is none
+    """
+    # Fast path: the whole reply is one valid object
+    stripped = (text or "").strip()
+    if stripped.startswith("{") and stripped.endswith("}"):
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            data = None
+        if matches_schema(data, schema):
+            return data
+    parser = IncrementalJSONParser(schema)
+    for objects in (parser.feed(text or ""), parser.close()):
+        if objects:
+            return objects[0]
+    return None
+
+
+def iter_json_stream(chunks: Iterable[str], schema: Optional[Schema] = None):
+    """
+    Yield objects from streamed output as soon as each one is complete
+
+    Args:
+        chunks: Text chunks, e.g. from a streaming LLM call
+        schema: Required key -> type(s)
+
+    Yields:
+        Parsed objects in order of appearance
+    """
+    parser = IncrementalJSONParser(schema)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
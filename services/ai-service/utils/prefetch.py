@@ -0,0 +1,120 @@
+"""
+Speculative background research started while the conversation is still gathering information
+"""
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class ResearchPrefetcher:
+    """
+    Runs research for a symptom profile in the background, keyed by the research cache key.
+
+    The research step takes the prefetch when the profile key is unchanged (a hit) and
+    discards it otherwise (waste). Prefetches nobody takes within ``ttl`` also count as waste.
+    """
+
+    def __init__(self, max_workers: int = 4, ttl: float = 900):
+        """
+        Initialize the prefetcher
+
+        Args:
+            max_workers: Research calls allowed to run in the background at once
+            ttl: Seconds an untaken prefetch is kept
+        """
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="research-prefetch")
+        self._pending: Dict[str, Tuple[Future, float]] = {}
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+
+    @classmethod
+    def from_env(cls) -> 'ResearchPrefetcher':
+        """Prefetcher configured by MEDLAMA_PREFETCH_WORKERS and MEDLAMA_PREFETCH_TTL"""
+        return cls(
+            max_workers=int(os.getenv("MEDLAMA_PREFETCH_WORKERS", "4")),
+            ttl=float(os.getenv("MEDLAMA_PREFETCH_TTL", "900")),
+        )
+
+    def _expire(self, now: float) -> None:
+        for key, (future, started) in list(self._pending.items()):
+            if now - started > self.ttl:
+                del self._pending[key]
+                future.cancel()
+                self.wasted += 1
+
+    def prefetch(self, key: Optional[str], research: Callable[[], Any]) -> bool:
+        """
+        Start research for a profile unless it is already running or done
+
+        Args:
+            key: Research cache key of the profile (None is ignored)
+            research: Function performing the research
+
+        Returns:
+            True if a new prefetch was started
+        """
+        if key is None:
+            return False
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if key in self._pending:
+                return False
+            self._pending[key] = (self._executor.submit(research), now)
+            self.started += 1
+        return True
+
+    def take(self, key: Optional[str]) -> Optional[Future]:
+        """
+        Claim the prefetch for a profile
+
+        Args:
+            key: Research cache key of the profile
+
+        Returns:
+            The (possibly still running) future, or None if nothing was prefetched
+        """
+        if key is None:
+            return None
+        with self._lock:
+            self._expire(time.time())
+            entry = self._pending.pop(key, None)
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def discard(self, key: Optional[str]) -> None:
+        """
+        Drop a prefetch whose profile has changed since it was started
+
+        Args:
+            key: Research cache key the prefetch was started for
+        """
+        with self._lock:
+            entry = self._pending.pop(key, None) if key is not None else None
+            if entry is not None:
+                entry[0].cancel()
+                self.wasted += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit and waste rates of finished prefetches"""
+        with self._lock:
+            settled = self.hits + self.wasted
+            return {
+                "started": self.started,
+                "pending": len(self._pending),
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "hit_rate": round(self.hits / settled, 3) if settled else 0.0,
+                "waste_rate": round(self.wasted / settled, 3) if settled else 0.0,
+            }
+
+
+# Process-wide prefetcher shared across sessions and requests
+research_prefetcher = ResearchPrefetcher.from_env()
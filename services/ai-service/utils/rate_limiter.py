@@ -0,0 +1,236 @@
+"""
+Token-bucket rate limiting for external model and research APIs
+"""
+import os
+import time
+import asyncio
+import inspect
+import threading
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# Default budgets per provider: requests per second, tokens per minute (None = unlimited)
+# and the token estimate charged for a call when the caller does not provide one.
+PROVIDER_LIMITS: Dict[str, Dict[str, Any]] = {
+    "gemini": {"requests_per_second": 5.0, "tokens_per_minute": 1_000_000, "tokens_per_call": 2_000},
+    "perplexity": {"requests_per_second": 0.8, "tokens_per_minute": None, "tokens_per_call": 2_048},
+    "nim": {"requests_per_second": 10.0, "tokens_per_minute": None, "tokens_per_call": 1_000},
+}
+
+# Environment variable holding each provider's API key, used to keep separate budgets per key
+PROVIDER_KEY_ENV = {
+    "gemini": "GEMINI_API_KEY",
+    "perplexity": "PERPLEXITY_API_KEY",
+    "nim": "NVIDIA_NIM_API_KEY",
+}
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations.
+
+    A reservation always succeeds but may push the balance below zero; the
+    caller then waits for the returned delay. Callers are therefore served in
+    arrival order and nobody waits while budget is still available.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the bucket full
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held, i.e. the allowed burst
+            clock: Monotonic clock, injectable for tests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        """
+        Take ``amount`` tokens and return how long to wait before using them
+
+        Args:
+            amount: Tokens needed
+
+        Returns:
+            Seconds to wait (0 when the budget was available)
+        """
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        self._tokens -= amount
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+
+class ProviderLimiter:
+    """Requests-per-second and tokens-per-minute budget for one provider API key"""
+
+    def __init__(self,
+                 requests_per_second: float,
+                 tokens_per_minute: Optional[float] = None,
+                 tokens_per_call: int = 0,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the limiter
+
+        Args:
+            requests_per_second: Sustained request rate
+            tokens_per_minute: Sustained token rate, or None for no token budget
+            tokens_per_call: Token estimate charged when acquire() gets none
+            clock: Monotonic clock, injectable for tests
+        """
+        self.requests = TokenBucket(requests_per_second, max(1.0, requests_per_second), clock)
+        self.tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute, clock) if tokens_per_minute else None
+        self.tokens_per_call = tokens_per_call
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.total_wait = 0.0
+
+    def _reserve(self, tokens: Optional[int]) -> float:
+        with self._lock:
+            delay = self.requests.reserve(1)
+            if self.tokens is not None:
+                delay = max(delay, self.tokens.reserve(self.tokens_per_call if tokens is None else tokens))
+            self.acquired += 1
+            if delay > 0:
+                self.throttled += 1
+                self.total_wait += delay
+                self.waiting += 1
+            return delay
+
+    def _done_waiting(self) -> None:
+        with self._lock:
+            self.waiting -= 1
+
+    def acquire(self, tokens: Optional[int] = None) -> float:
+        """
+        Block until a request (and its tokens) fit in the budget
+
+        Args:
+            tokens: Estimated tokens for the call
+
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self._reserve(tokens)
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            finally:
+                self._done_waiting()
+        return delay
+
+    async def aacquire(self, tokens: Optional[int] = None) -> float:
+        """
+        Async version of acquire() that yields to the event loop while waiting
+
+        Args:
+            tokens: Estimated tokens for the call
+
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self._reserve(tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._done_waiting()
+        return delay
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and throttling counters"""
+        with self._lock:
+            return {
+                "queue_depth": self.waiting,
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "total_wait_seconds": round(self.total_wait, 3),
+            }
+
+
+class RateLimiterRegistry:
+    """Process-wide limiters, one per (provider, API key)"""
+
+    def __init__(self):
+        self._limiters: Dict[Tuple[str, str], ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, api_key: Optional[str] = None) -> ProviderLimiter:
+        """
+        Get (or create) the limiter for a provider and key
+
+        Limits come from PROVIDER_LIMITS and can be overridden with
+        RATE_LIMIT_<PROVIDER>_RPS and RATE_LIMIT_<PROVIDER>_TPM.
+
+        Args:
+            provider: Provider name, e.g. "gemini" or "perplexity"
+            api_key: API key the budget belongs to (defaults to the provider's key variable)
+
+        Returns:
+            The shared limiter
+        """
+        if api_key is None:
+            api_key = os.getenv(PROVIDER_KEY_ENV.get(provider, ""), "")
+        key = (provider, api_key)
+        with self._lock:
+            if key not in self._limiters:
+                limits = PROVIDER_LIMITS.get(provider, {"requests_per_second": 1.0, "tokens_per_minute": None, "tokens_per_call": 0})
+                prefix = f"RATE_LIMIT_{provider.upper()}"
+                tokens_per_minute = os.getenv(f"{prefix}_TPM")
+                self._limiters[key] = ProviderLimiter(
+                    requests_per_second=float(os.getenv(f"{prefix}_RPS", limits["requests_per_second"])),
+                    tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else limits["tokens_per_minute"],
+                    tokens_per_call=limits["tokens_per_call"],
+                )
+            return self._limiters[key]
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Metrics for every limiter, keyed by provider (API keys are not exposed)"""
+        with self._lock:
+            limiters = list(self._limiters.items())
+        report: Dict[str, Dict[str, Any]] = {}
+        for (provider, _), limiter in limiters:
+            totals = report.setdefault(provider, {"queue_depth": 0, "acquired": 0, "throttled": 0, "total_wait_seconds": 0.0})
+            for name, value in limiter.metrics().items():
+                totals[name] += value
+        return report
+
+
+rate_limiters = RateLimiterRegistry()
+
+
+def api_rate_limit(provider: str = "gemini", tokens: Union[int, Callable[..., int], None] = None):
+    """
+    Decorator that waits for the provider's budget before calling the function.
+
+    Works on both regular and ``async def`` functions; the latter wait with
+    asyncio.sleep so the event loop keeps running.
+
+    Args:
+        provider: Provider whose budget the call uses
+        tokens: Token estimate per call, or a function of the call's arguments returning one
+    """
+    def decorator(func):
+        def estimate(args, kwargs):
+            return tokens(*args, **kwargs) if callable(tokens) else tokens
+
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                await rate_limiters.get(provider).aacquire(estimate(args, kwargs))
+                return await func(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            rate_limiters.get(provider).acquire(estimate(args, kwargs))
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,400 @@
+"""
+Disk-backed cache for Perplexity research, keyed by a canonical symptom profile
+"""
+import os
+import re
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+from utils.text_processing import extract_symptom_keywords
+from utils.symptom_profile import SymptomProfile
+from utils.triage import NEGATION, CLAUSE_BREAK
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 5000
+
+# "45 years old", "45-year-old", "45 yo", "45 y/o", "I'm 45", "I am 45", "aged 45"
+_AGE_PATTERNS = [
+    re.compile(r"\b(\d{1,3})\s*-?\s*(?:years?|yrs?)[-\s]old\b"),
+    re.compile(r"\b(\d{1,3})\s*(?:yo|y/o)\b"),
+    re.compile(r"\b(?:i'?m|i am|aged?)\s+(\d{1,3})\b(?!\s*(?:days?|weeks?|months?|hours?|minutes?|%|/))"),
+]
+
+# Upper bound (inclusive) of each age band
+AGE_BANDS = [(17, "0-17"), (39, "18-39"), (64, "40-64"), (200, "65+")]
+
+# "3 days", "a couple of weeks", "for two months"
+_COUNT_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+                "seven": 7, "few": 3, "couple": 2, "several": 4}
+_UNIT_DAYS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+_DURATION = re.compile(
+    r"\b(\d+|an?|one|two|three|four|five|six|seven|few|couple|several)\s+(?:of\s+)?"
+    r"(minute|hour|day|week|month|year)s?\b"
+)
+# "yesterday", "since Monday", "last night"
+_RELATIVE_DAYS = {"today": 0, "tonight": 0, "this morning": 0, "this afternoon": 0, "this evening": 0,
+                  "last night": 0, "yesterday": 1, "last week": 7, "last month": 30, "last year": 365}
+_RELATIVE_ONSET = re.compile(
+    r"\b(?:today|tonight|this (?:morning|afternoon|evening)|last (?:night|week|month|year)|yesterday"
+    r"|since (?:mon|tues|wednes|thurs|fri|satur|sun)day|(?:mon|tues|wednes|thurs|fri|satur|sun)day)\b"
+)
+# Exclusive upper bound in days of each onset band
+ONSET_BANDS = [(1, "<1d"), (7, "1-6d"), (31, "1-4w"), (365, "1-12m"), (float("inf"), "1y+")]
+
+_TIMING = re.compile(
+    r"(?:\b(?:for|since|over|about|around|past|last|almost|nearly)\s+)?(?:the\s+)?(?:" + _DURATION.pattern + r"|"
+    + _RELATIVE_ONSET.pattern + r")(?:\s+ago\b)?"
+)
+# Separators between findings listed in one clause
+_ITEM_BREAK = re.compile(r"\b(?:and|with|plus|also)\b")
+# Words that carry no clinical detail
+_FILLER = frozenset(
+    "a an the my i i'm im me it it's its this that there is am are was were be been being have has had "
+    "having got get getting feel feeling felt some any of in on at to too really very quite bit little "
+    "lot kind sort like just also pretty started start began begin ago since for when which who".split()
+)
+
+
+def age_band(text: str) -> str:
+    """
+    Coarse age band mentioned in the text
+
+    Args:
+        text: Patient messages
+
+    Returns:
+        Band label such as "40-64", or "unknown"
+    """
+    text = text.lower()
+    for pattern in _AGE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            age = int(match.group(1))
+            for upper, label in AGE_BANDS:
+                if age <= upper:
+                    return label
+    return "unknown"
+
+
+def onset_band(text: str) -> str:
+    """
+    Coarse band for how long the symptoms have lasted
+
+    Args:
+        text: Onset description or patient messages
+
+    Returns:
+        Band label such as "1-6d", or "unknown"
+    """
+    text = text.lower()
+    match = _DURATION.search(text)
+    if match:
+        count = match.group(1)
+        days = (int(count) if count.isdigit() else _COUNT_WORDS.get(count, 1)) * _UNIT_DAYS[match.group(2)]
+    else:
+        match = _RELATIVE_ONSET.search(text)
+        if not match:
+            return "unknown"
+        days = _RELATIVE_DAYS.get(match.group(0), 1)
+    for upper, label in ONSET_BANDS:
+        if days < upper:
+            return label
+    return ONSET_BANDS[-1][1]
+
+
+def _findings(text: str) -> List[str]:
+    """
+    Affirmed findings in free text, each normalized to its content words
+
+    The text is split into clauses and list items; a negation cue drops the rest of
+    its comma-separated segment, so "no fever or chills, but a cough" yields only the cough. Timing
+    phrases are removed (they are keyed separately as the onset band) while location
+    and quality words are kept: "sharp pain in my right knee" -> "sharp pain right knee".
+    """
+    text = text.lower()
+    for pattern in _AGE_PATTERNS:
+        text = pattern.sub(" ", text)
+    findings = []
+    for clause in CLAUSE_BREAK.split(_TIMING.sub(" ", text)):
+        for segment in clause.split(","):
+            negation = NEGATION.search(segment)
+            if negation:
+                segment = segment[:negation.start()]
+            for item in _ITEM_BREAK.split(segment):
+                words = [word for word in re.findall(r"[a-z0-9]+(?:'[a-z]+)?", item) if word not in _FILLER]
+                if words:
+                    findings.append(" ".join(words))
+    return findings
+
+
+# Canonical name for each symptom term (extract_symptom_keywords hits and common variants);
+# body-part keywords map to None because they are recorded as the finding's location
+_SYMPTOM_TERMS = {
+    "pain": "pain", "ache": "pain", "aches": "pain", "aching": "pain", "hurt": "pain", "hurts": "pain",
+    "hurting": "pain", "sore": "pain", "soreness": "pain", "painful": "pain", "tender": "pain",
+    "fever": "fever", "temperature": "fever", "hot": "fever", "feverish": "fever", "cold": "cold",
+    "nausea": "nausea", "nauseous": "nausea", "nauseated": "nausea", "sick": "nausea",
+    "vomit": "vomiting", "vomiting": "vomiting", "throwing": "vomiting",
+    "dizzy": "dizziness", "dizziness": "dizziness", "lightheaded": "dizziness",
+    "tired": "fatigue", "fatigue": "fatigue", "exhausted": "fatigue", "weak": "fatigue", "weakness": "fatigue",
+    "cough": "cough", "coughing": "cough", "sneeze": "sneezing", "sneezing": "sneezing",
+    "congestion": "congestion", "congested": "congestion", "stuffy": "congestion", "runny": "congestion",
+    "headache": "headache", "headaches": "headache", "migraine": "headache", "migraines": "headache",
+    "shortness of breath": "shortness of breath", "breathing": "shortness of breath",
+    "breath": "shortness of breath", "breathless": "shortness of breath",
+    "chest": None, "heart": None, "cardiac": None, "stomach": None, "abdomen": None, "belly": None,
+    "swelling": "swelling", "swollen": "swelling", "rash": "rash", "itch": "itching", "itching": "itching",
+    "itchy": "itching", "numb": "numbness", "numbness": "numbness", "tingling": "tingling",
+    "diarrhea": "diarrhea", "diarrhoea": "diarrhea", "constipation": "constipation",
+    "constipated": "constipation", "bleeding": "bleeding", "blood": "bleeding", "discharge": "discharge",
+    "chills": "chills", "shivering": "chills", "wheeze": "wheezing", "wheezing": "wheezing",
+    "palpitations": "palpitations", "tightness": "tightness", "pressure": "pressure",
+}
+# Variants ("hurts", "coughing", "rash") that extract_symptom_keywords does not pick up
+_SYMPTOM_VARIANTS = re.compile(r"\b(?:" + "|".join(
+    term for term, name in _SYMPTOM_TERMS.items() if name and not extract_symptom_keywords(term)) + r")\b")
+# Where a finding is felt, by canonical body part
+_LOCATION_TERMS = {
+    "head": "head", "forehead": "head", "temple": "head", "eye": "eye", "eyes": "eye", "ear": "ear",
+    "ears": "ear", "nose": "nose", "sinus": "sinus", "sinuses": "sinus", "throat": "throat", "neck": "neck",
+    "jaw": "jaw", "tooth": "tooth", "teeth": "tooth", "shoulder": "shoulder", "shoulders": "shoulder",
+    "arm": "arm", "arms": "arm", "elbow": "elbow", "wrist": "wrist", "hand": "hand", "hands": "hand",
+    "finger": "finger", "fingers": "finger", "chest": "chest", "heart": "chest", "cardiac": "chest",
+    "breast": "breast", "back": "back", "stomach": "abdomen", "abdomen": "abdomen", "abdominal": "abdomen",
+    "belly": "abdomen", "tummy": "abdomen", "pelvis": "pelvis", "pelvic": "pelvis", "groin": "groin",
+    "hip": "hip", "hips": "hip", "leg": "leg", "legs": "leg", "thigh": "leg", "calf": "leg",
+    "knee": "knee", "knees": "knee", "ankle": "ankle", "ankles": "ankle", "foot": "foot", "feet": "foot",
+    "toe": "toe", "toes": "toe", "joint": "joint", "joints": "joint", "muscle": "muscle",
+    "muscles": "muscle", "skin": "skin", "urinate": "urination", "urinating": "urination",
+    "urination": "urination", "pee": "urination", "peeing": "urination", "bladder": "bladder",
+}
+_LOCATION_WORDS = re.compile(r"\b(?:" + "|".join(_LOCATION_TERMS) + r")\b")
+_SIDE_WORDS = re.compile(r"\b(?:left|right|upper|lower|both)\b")
+# How a finding feels
+_QUALITY_TERMS = {
+    "sharp": "sharp", "dull": "dull", "burning": "burning", "throbbing": "throbbing", "pounding": "throbbing",
+    "stabbing": "stabbing", "shooting": "shooting", "cramping": "cramping", "cramps": "cramping",
+    "crampy": "cramping", "crushing": "crushing", "squeezing": "crushing", "dry": "dry",
+    "productive": "productive", "wet": "productive",
+}
+_QUALITY_WORDS = re.compile(r"\b(?:" + "|".join(_QUALITY_TERMS) + r")\b")
+
+
+def _canonical_findings(text: str) -> List[str]:
+    """
+    Affirmed findings in free text, mapped to a canonical vocabulary
+
+    Each finding becomes symptom@location/quality, using the symptom terms found by
+    extract_symptom_keywords (and common variants) plus body-part, side and quality
+    words, so "sharp pain in my right knee", "right knee hurts, sharp" and "sharp right
+    knee ache" all become "pain@right knee/sharp". A list item with only quality words
+    qualifies the neighbouring finding. Items without a known symptom keep their
+    content words, so unlisted findings still count.
+    """
+    findings = []
+    pending = set()
+    for item in _findings(text):
+        qualities = {_QUALITY_TERMS[word] for word in _QUALITY_WORDS.findall(item)}
+        keywords = extract_symptom_keywords(item) + _SYMPTOM_VARIANTS.findall(item)
+        symptoms = {_SYMPTOM_TERMS[word] for word in keywords if _SYMPTOM_TERMS.get(word)}
+        locations = sorted({_LOCATION_TERMS[word] for word in _LOCATION_WORDS.findall(item)})
+        if not symptoms and not locations and qualities:
+            # "sharp" in "my knee hurts, sharp": describe the previous finding, or the next one
+            if findings and isinstance(findings[-1], tuple):
+                findings[-1][2].update(qualities)
+            else:
+                pending.update(qualities)
+            continue
+        if not symptoms:
+            findings.append(item)
+            continue
+        location = " ".join(sorted(set(_SIDE_WORDS.findall(item))) + locations) if locations else ""
+        for symptom in sorted(symptoms):
+            findings.append((symptom, location, qualities | pending))
+        pending = set()
+
+    names = []
+    for finding in findings:
+        if isinstance(finding, str):
+            names.append(finding)
+            continue
+        symptom, location, qualities = finding
+        name = symptom + ("@" + location if location else "")
+        names.append(name + ("/" + "+".join(sorted(qualities)) if qualities else ""))
+    return names
+
+
+def profile_key(profile: Optional[SymptomProfile], user_messages: List[str]) -> Optional[str]:
+    """
+    Canonical cache key for a presentation
+
+    Built from the structured profile when there is one (symptoms mapped to a canonical
+    vocabulary with their location and quality, relevant history, the onset band and the
+    age band), otherwise from the patient's own words. Negated findings are left out and
+    findings are sorted, so wording and order do not matter but every affirmed detail does.
+
+    Args:
+        profile: Structured symptom profile, or None/empty to use the messages
+        user_messages: Patient messages, searched for an age (and for symptoms without a profile)
+
+    Returns:
+        Key string, or None when no symptom was found (too generic to share)
+    """
+    text = " ".join(user_messages)
+    if profile is not None and not profile.is_empty():
+        symptoms = sorted({finding for symptom in profile.symptoms for finding in _canonical_findings(symptom)})
+        history = sorted({finding for item in profile.history for finding in _findings(item)})
+        onset = onset_band(profile.onset or "")
+    else:
+        symptoms = sorted(set(_canonical_findings("\n".join(user_messages))))
+        history = []
+        onset = onset_band(text)
+        if not any(finding.split("@")[0].split("/")[0] in _SYMPTOM_TERMS.values() for finding in symptoms):
+            return None
+    if not symptoms:
+        return None
+    return (f"profile:{';'.join(symptoms)}|history:{';'.join(history)}"
+            f"|onset:{onset}|age:{age_band(text)}")
+
+
+def condition_key(condition: str) -> str:
+    """Cache key for research on a single named condition"""
+    return "condition:" + " ".join(condition.lower().split())
+
+
+class ResearchCache:
+    """
+    SQLite cache of research results with a TTL and LRU eviction.
+
+    A cache without a path is disabled: get() always misses and put() does nothing,
+    so callers never need to check whether caching is configured.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Initialize the cache
+
+        Args:
+            path: SQLite file (":memory:" for a process-local cache), or None to disable
+            ttl: Seconds before an entry expires
+            max_entries: Entries kept before the least recently used are evicted
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            if path != ":memory:" and os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS research ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS research_accessed ON research (accessed)")
+            self._conn.commit()
+
+    @classmethod
+    def from_env(cls) -> 'ResearchCache':
+        """Cache configured by MEDLAMA_RESEARCH_CACHE_PATH/_TTL/_MAX_ENTRIES (disabled without a path)"""
+        return cls(
+            path=os.getenv("MEDLAMA_RESEARCH_CACHE_PATH") or None,
+            ttl=float(os.getenv("MEDLAMA_RESEARCH_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+            max_entries=int(os.getenv("MEDLAMA_RESEARCH_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self._conn is not None
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def get(self, key: Optional[str]) -> Optional[Any]:
+        """
+        Look up a cached result
+
+        Args:
+            key: Cache key (None always misses)
+
+        Returns:
+            The cached value, or None on a miss or an expired entry
+        """
+        if not self.enabled or key is None:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM research WHERE key = ?", (self._hash(key),)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM research WHERE key = ?", (self._hash(key),))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE research SET accessed = ? WHERE key = ?", (now, self._hash(key)))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: Optional[str], value: Any) -> None:
+        """
+        Store a result, evicting the least recently used entries beyond max_entries
+
+        Args:
+            key: Cache key (None is ignored)
+            value: JSON-serializable result
+        """
+        if not self.enabled or key is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO research (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (self._hash(key), json.dumps(value), now, now)
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+            if count > self.max_entries:
+                excess = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM research WHERE key IN (SELECT key FROM research ORDER BY accessed LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM research")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate and size counters"""
+        lookups = self.hits + self.misses
+        entries = 0
+        if self.enabled:
+            with self._lock:
+                entries = self._conn.execute("SELECT COUNT(*) FROM research").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+
+# Process-wide cache shared by the agent and the Perplexity client
+research_cache = ResearchCache.from_env()
@@ -0,0 +1,98 @@
+"""
+Helpers for researching ranked candidate conditions in parallel and merging the results
+"""
+import re
+from typing import Any, Dict, List
+
+from utils.conversation_state import parse_structured_response
+
+_URL = re.compile(r"https?://[^\s\)\]\}>\"',]+")
+
+
+def build_ranking_prompt(symptom_summary: str, max_conditions: int) -> str:
+    """
+    Prompt asking for the most probable conditions, to be researched one by one
+
+    Args:
+        symptom_summary: Symptom information gathered so far
+        max_conditions: Number of conditions wanted
+
+    Returns:
+        Prompt string
+    """
+    return f"""
+    Based on the following symptom information:
+    {symptom_summary}
+
+    List the {max_conditions} most probable medical conditions, most likely first.
+    Respond ONLY with a JSON object of the form {{"conditions": ["condition", ...]}}
+    using standard condition names without explanations.
+    """
+
+
+def parse_ranked_conditions(response: str, max_conditions: int) -> List[str]:
+    """
+    Read the ranked condition names from the LLM's reply
+
+    Args:
+        response: Raw LLM output
+        max_conditions: Maximum number of conditions to keep
+
+    Returns:
+        Condition names in rank order, without duplicates (empty if unparseable)
+    """
+    data = parse_structured_response(response)
+    conditions = data.get("conditions") if isinstance(data, dict) else None
+    if not isinstance(conditions, list):
+        return []
+    ranked: List[str] = []
+    for condition in conditions:
+        name = " ".join(str(condition).split())
+        if name and name.lower() not in (c.lower() for c in ranked):
+            ranked.append(name)
+    return ranked[:max_conditions]
+
+
+def extract_citations(text: str) -> List[str]:
+    """
+    URLs cited in a research text, in order of first appearance
+
+    Args:
+        text: Research text
+
+    Returns:
+        Unique URLs
+    """
+    seen = []
+    for url in _URL.findall(text or ""):
+        url = url.rstrip(".;:")
+        if url not in seen:
+            seen.append(url)
+    return seen
+
+
+def merge_research(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Combine per-condition research into one result for the analysis prompt
+
+    Args:
+        results: get_medical_research() results in rank order
+
+    Returns:
+        {"medical_research": combined text, "conditions": names, "citations": unique URLs}
+    """
+    sections = []
+    citations: List[str] = []
+    for rank, result in enumerate(results, start=1):
+        sections.append(f"### {rank}. {result['condition']}\n{result['research']}")
+        for url in extract_citations(result["research"]):
+            if url not in citations:
+                citations.append(url)
+    combined = "\n\n".join(sections)
+    if citations:
+        combined += "\n\nSources:\n" + "\n".join(f"- {url}" for url in citations)
+    return {
+        "medical_research": combined,
+        "conditions": [result["condition"] for result in results],
+        "citations": citations,
+    }
@@ -0,0 +1,76 @@
+"""
+Server-sent event helpers for streaming agent progress to the client
+"""
+import json
+import queue
+import threading
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+# Event emitted once the producer has returned
+DONE_EVENT = "done"
+ERROR_EVENT = "error"
+
+Emit = Callable[[str, Any], None]
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Encode one server-sent event
+
+    Args:
+        event: Event name
+        data: JSON-serializable payload
+
+    Returns:
+        The event in text/event-stream format
+    """
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class EventStream:
+    """
+    Run a blocking producer in a background thread and iterate over the events it emits.
+
+    The producer gets an ``emit(event, data)`` callback. Its return value is delivered
+    as the final "done" event; an exception becomes an "error" event instead.
+    """
+
+    def __init__(self, producer: Callable[[Emit], Any], heartbeat: Optional[float] = 15.0):
+        """
+        Initialize the stream
+
+        Args:
+            producer: Function doing the work, called with the emit callback
+            heartbeat: Seconds of silence after which a "ping" event is yielded (None to disable)
+        """
+        self.producer = producer
+        self.heartbeat = heartbeat
+        self._queue: "queue.Queue[Tuple[str, Any]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def emit(self, event: str, data: Any = None) -> None:
+        """Queue an event for the consumer"""
+        self._queue.put((event, data))
+
+    def _run(self) -> None:
+        try:
+            result = self.producer(self.emit)
+        except Exception as e:
+            print(f"ERROR: Streaming producer failed: {str(e)}")
+            self.emit(ERROR_EVENT, {"detail": str(e)})
+        else:
+            self.emit(DONE_EVENT, result)
+
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        while True:
+            try:
+                event, data = self._queue.get(timeout=self.heartbeat)
+            except queue.Empty:
+                yield "ping", None
+                continue
+            yield event, data
+            if event in (DONE_EVENT, ERROR_EVENT):
+                return
@@ -0,0 +1,164 @@
+"""
+Structured symptom profile that is updated incrementally, one user message at a time
+"""
+from typing import Dict, Any, List, Optional, Tuple
+from dataclasses import dataclass, field, asdict
+import json
+
+
+@dataclass
+class SymptomProfile:
+    """What the patient has told us so far, in a fixed structure"""
+    symptoms: List[str] = field(default_factory=list)
+    onset: Optional[str] = None
+    severity: Optional[str] = None
+    modifiers: List[str] = field(default_factory=list)
+    history: List[str] = field(default_factory=list)
+
+    LIST_FIELDS = ("symptoms", "modifiers", "history")
+    TEXT_FIELDS = ("onset", "severity")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert profile to dictionary"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> 'SymptomProfile':
+        """Create profile from dictionary, ignoring unknown keys"""
+        data = data or {}
+        profile = cls()
+        profile.merge(data)
+        return profile
+
+    def merge(self, update: Dict[str, Any]) -> bool:
+        """
+        Merge newly extracted details into the profile.
+
+        List fields gain any new entries (compared case-insensitively); text
+        fields are only replaced by a non-empty value.
+
+        Args:
+            update: Partial profile, e.g. parsed from the LLM's JSON output
+
+        Returns:
+            True if anything changed
+        """
+        changed = False
+        for name in self.LIST_FIELDS:
+            values = update.get(name) or []
+            if isinstance(values, str):
+                values = [values]
+            current = getattr(self, name)
+            seen = {item.lower() for item in current}
+            for value in values:
+                value = str(value).strip()
+                if value and value.lower() not in seen:
+                    current.append(value)
+                    seen.add(value.lower())
+                    changed = True
+        for name in self.TEXT_FIELDS:
+            value = update.get(name)
+            if isinstance(value, str) and value.strip() and value.strip() != getattr(self, name):
+                setattr(self, name, value.strip())
+                changed = True
+        return changed
+
+    def is_empty(self) -> bool:
+        """True when nothing has been recorded yet"""
+        return not any(getattr(self, name) for name in self.LIST_FIELDS + self.TEXT_FIELDS)
+
+    def is_stable(self) -> bool:
+        """True once the symptoms, onset and severity are known, so later turns rarely change the research"""
+        return bool(self.symptoms and self.onset and self.severity)
+
+    def summary(self) -> str:
+        """Render the profile as the text summary used in prompts"""
+        if self.is_empty():
+            return "No structured summary yet."
+        lines = []
+        if self.symptoms:
+            lines.append(f"- Symptoms: {'; '.join(self.symptoms)}")
+        if self.onset:
+            lines.append(f"- Onset/duration: {self.onset}")
+        if self.severity:
+            lines.append(f"- Severity: {self.severity}")
+        if self.modifiers:
+            lines.append(f"- Aggravating/relieving factors: {'; '.join(self.modifiers)}")
+        if self.history:
+            lines.append(f"- Relevant history: {'; '.join(self.history)}")
+        return "\n".join(lines)
+
+
+def build_profile_update_prompt(profile: SymptomProfile, new_messages: List[str]) -> str:
+    """
+    Build a prompt asking only for what the newest user message(s) add to the profile.
+
+    Args:
+        profile: Profile built from earlier messages
+        new_messages: User messages received since the profile was last updated
+
+    Returns:
+        Prompt string
+    """
+    return f"""
+    You maintain a structured symptom profile for a medical consultation.
+
+    Current profile (JSON):
+    {json.dumps(profile.to_dict())}
+
+    New patient message(s):
+    {chr(10).join(new_messages)}
+
+    Return ONLY a JSON object with the fields the new message(s) add or change:
+    - "symptoms": list of symptoms, each with location/quality if given
+    - "onset": when it started / how long it has lasted
+    - "severity": how bad it is
+    - "modifiers": list of aggravating or relieving factors
+    - "history": list of relevant medical history, medications or risk factors
+    Omit fields the new message(s) say nothing about. Return {{}} if nothing is new.
+    """
+
+
+# Keys a conversation turn's JSON must have; used to pick the right object out of the reply
+TURN_RESPONSE_SCHEMA = {"proceed_to_research": (bool, str), "assistant_message": str}
+
+
+def validate_turn_response(data: Any, require_profile: bool = False) -> Tuple[bool, str, Dict[str, Any]]:
+    """
+    Check the JSON returned for a conversation turn against the expected schema.
+
+    Args:
+        data: Parsed JSON from the LLM
+        require_profile: Whether a "symptom_profile" object must be present (combined mode)
+
+    Returns:
+        (proceed_to_research, assistant_message, profile update)
+
+    Raises:
+        ValueError: If a key is missing or has the wrong type
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Response is not a JSON object.")
+    proceed = data.get("proceed_to_research")
+    if isinstance(proceed, str) and proceed.strip().lower() in ("true", "false"):
+        proceed = proceed.strip().lower() == "true"
+    if not isinstance(proceed, bool):
+        raise ValueError("'proceed_to_research' must be a boolean.")
+    message = data.get("assistant_message")
+    if not isinstance(message, str) or not message.strip():
+        raise ValueError("'assistant_message' must be a non-empty string.")
+
+    update = data.get("symptom_profile", {})
+    if require_profile and "symptom_profile" not in data:
+        raise ValueError("Response missing 'symptom_profile'.")
+    if not isinstance(update, dict):
+        raise ValueError("'symptom_profile' must be an object.")
+    for name in SymptomProfile.LIST_FIELDS:
+        value = update.get(name)
+        if value is not None and not isinstance(value, (list, str)):
+            raise ValueError(f"'symptom_profile.{name}' must be a list.")
+    for name in SymptomProfile.TEXT_FIELDS:
+        value = update.get(name)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"'symptom_profile.{name}' must be a string.")
+    return proceed, message.strip(), update
@@ -77,6 +77,21 @@ def extract_user_messages(messages: List[Dict[str, Any]]) -> List[str]:
     ]
 
 
+# Common medical symptom keywords, compiled once at import
+SYMPTOM_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\b(?:pain|ache|hurt|sore)\b',
+    r'\b(?:fever|temperature|hot|cold)\b',
+    r'\b(?:nausea|nauseous|sick|vomit)\b',
+    r'\b(?:dizzy|dizziness|lightheaded)\b',
+    r'\b(?:tired|fatigue|exhausted|weak)\b',
+    r'\b(?:cough|sneeze|congestion)\b',
+    r'\b(?:headache|migraine)\b',
+    r'\b(?:shortness of breath|breathing|breath)\b',
+    r'\b(?:chest|heart|cardiac)\b',
+    r'\b(?:stomach|abdomen|belly)\b'
+)]
+
+
 def extract_symptom_keywords(text: str) -> List[str]:
     """
     Extract potential symptom keywords from user input.
@@ -87,25 +102,10 @@ def extract_symptom_keywords(text: str) -> List[str]:
     Returns:
         List of potential symptom keywords
     """
-    # Common medical symptom keywords
-    symptom_patterns = [
-        r'\b(?:pain|ache|hurt|sore)\b',
-        r'\b(?:fever|temperature|hot|cold)\b',
-        r'\b(?:nausea|nauseous|sick|vomit)\b',
-        r'\b(?:dizzy|dizziness|lightheaded)\b',
-        r'\b(?:tired|fatigue|exhausted|weak)\b',
-        r'\b(?:cough|sneeze|congestion)\b',
-        r'\b(?:headache|migraine)\b',
-        r'\b(?:shortness of breath|breathing|breath)\b',
-        r'\b(?:chest|heart|cardiac)\b',
-        r'\b(?:stomach|abdomen|belly)\b'
-    ]
-    
     keywords = []
     text_lower = text.lower()
     
-    for pattern in symptom_patterns:
-        matches = re.findall(pattern, text_lower)
-        keywords.extend(matches)
+    for pattern in SYMPTOM_PATTERNS:
+        keywords.extend(pattern.findall(text_lower))
     
     return list(set(keywords))  # Remove duplicates
@@ -0,0 +1,213 @@
+"""
+Deterministic red-flag triage that flags emergency presentations without calling a model
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from utils.text_processing import SYMPTOM_PATTERNS
+
+# Symptom keywords (SYMPTOM_PATTERNS matches) mapped onto triage features
+KEYWORD_FEATURES = {
+    "chest": "chest", "heart": "chest", "cardiac": "chest",
+    "pain": "pain", "ache": "pain", "hurt": "pain", "sore": "pain",
+    "shortness of breath": "breathing", "breathing": "breath_related", "breath": "breath_related",
+    "nausea": "nausea", "nauseous": "nausea", "sick": "nausea", "vomit": "nausea",
+    "dizzy": "dizzy", "dizziness": "dizzy", "lightheaded": "dizzy",
+}
+
+# Red-flag descriptions the keyword list does not cover
+FEATURE_PATTERNS = {
+    "pressure": r"crush\w*|pressure|squeez\w*|tight\w*|heav(?:y|iness)|elephant",
+    "radiating": r"radiat\w*|spread\w*|shoot\w*\s+(?:down|up|into|to)|(?:left|right)\s+arm|\barms?\b|jaw|shoulder",
+    "sweating": r"sweat\w*|clammy|cold sweat",
+    "breathing": r"short(?:ness)? of breath|out of breath|(?:hard|difficult|trouble|struggl\w*)\s+(?:to\s+)?breath\w*",
+    "face_droop": r"(?:face|mouth|smile|lip|eyelid)\s+(?:\w+\s+){0,3}?(?:droop\w*|numb\w*|uneven|lopsided|sag\w*)|droop\w*",
+    "limb_weakness": r"(?:arm|leg|hand)\s+(?:\w+\s+){0,3}?(?:numb\w*|weak\w*|limp|dead|paraly\w*)"
+                     r"|(?:numb\w*|weak\w*|paraly\w*)\s+(?:\w+\s+){0,3}?(?:arm|leg|hand|side)"
+                     r"|one side of (?:my|the|his|her) (?:body|face)|can'?t (?:lift|move) (?:my |his |her )?(?:arm|leg)",
+    "speech": r"slurr\w*|garbled|(?:trouble|difficulty|can'?t|cannot|unable to)\s+(?:speak\w*|talk\w*|find (?:my |the )?words)",
+    "sudden": r"sudden\w*|out of nowhere|abrupt\w*|came on (?:fast|quickly)",
+    "worst_headache": r"worst (?:headache|pain) (?:of|in) my life|thunderclap",
+    "airway": r"(?:throat|tongue|lips?|face)\s+(?:\w+\s+){0,3}?(?:swell\w*|swollen|closing|tight\w*)"
+              r"|(?:swell\w*|swollen)\s+(?:\w+\s+){0,2}?(?:throat|tongue|lips?)|can'?t swallow|wheez\w*",
+    "allergen": r"allerg\w*|\bstung\b|\bstings?\b|\bbee\b|wasp|peanuts?|\bnuts?\b|shellfish|hives|epi-?pen|anaphyla\w*",
+    "cant_breathe": r"(?:can'?t|cannot|can not|unable to) breathe|gasping|struggling to breathe|choking|turning blue|blue lips",
+    "unresponsive": r"unconscious|unresponsive|passed out|fainted|collapsed|seizure\w*|convuls\w*",
+    "bleeding_severe": r"(?:bleeding|blood)\s+(?:\w+\s+){0,3}?(?:won'?t|will not|doesn'?t|does not|can'?t)\s+stop"
+                       r"|spurting|soak\w* through|(?:vomit\w*|cough\w*|throw\w* up)\s+(?:up\s+)?blood|heavy bleeding|lot of blood",
+    "self_harm": r"suicid\w*|kill(?:ing)? myself|end (?:my life|it all)|(?:hurt|harm)(?:ing)? myself"
+                 r"|(?:don'?t|do not) want to (?:live|be alive)|better off dead",
+}
+
+# Negation cues; a feature starting within a few words after a cue is treated as denied
+NEGATION = re.compile(
+    r"\b(?:no|not|never|without|none|denies|deny|negative for"
+    r"|(?:do|does|did|have|has|is|are|was|were)(?:n'?t| not))\b"
+)
+# Clause boundaries that end a negation's scope (so do commas and "and", see NEGATION_SCOPE)
+CLAUSE_BREAK = re.compile(r"[.!?;\n]+|\b(?:but|however|although|though|except|yet)\b")
+# Words after a cue that it can deny: "no chest pain or shortness of breath", not "no fever and chest pain"
+NEGATION_WINDOW = 6
+NEGATION_SCOPE = re.compile(r"(?:\s+(?!and\b)[\w'-]+){1,%d}" % NEGATION_WINDOW)
+
+EMERGENCY_ADVICE = "Call 911 or your local emergency number now, or go to the nearest emergency department."
+CRISIS_ADVICE = "If you are thinking about harming yourself, call or text 988 (in the US) or your local crisis line now."
+
+
+@dataclass(frozen=True)
+class RedFlagRule:
+    """
+    Emergency presentation recognised by feature co-occurrence.
+
+    Each group lists interchangeable features; the rule fires when at least
+    ``min_groups`` groups (all of them by default) have a feature present.
+    """
+    name: str
+    label: str
+    groups: Tuple[FrozenSet[str], ...]
+    min_groups: Optional[int] = None
+    advice: str = EMERGENCY_ADVICE
+
+    def matches(self, features: Set[str]) -> bool:
+        needed = len(self.groups) if self.min_groups is None else self.min_groups
+        return sum(1 for group in self.groups if group & features) >= needed
+
+
+def _groups(*groups: Iterable[str]) -> Tuple[FrozenSet[str], ...]:
+    return tuple(frozenset(group) for group in groups)
+
+
+RED_FLAG_RULES = [
+    RedFlagRule("heart_attack", "a heart attack",
+                _groups({"chest"}, {"pressure", "pain"}, {"radiating", "sweating", "breathing", "nausea"})),
+    RedFlagRule("stroke", "a stroke", _groups({"face_droop"}, {"limb_weakness"}, {"speech"}), min_groups=2),
+    RedFlagRule("stroke_sudden", "a stroke", _groups({"face_droop", "limb_weakness", "speech"}, {"sudden"})),
+    RedFlagRule("thunderclap_headache", "bleeding in the brain", _groups({"worst_headache"})),
+    RedFlagRule("anaphylaxis", "a severe allergic reaction (anaphylaxis)",
+                _groups({"airway", "cant_breathe"}, {"allergen"})),
+    RedFlagRule("cannot_breathe", "a breathing emergency", _groups({"cant_breathe"})),
+    RedFlagRule("unresponsive", "a loss of consciousness or seizure", _groups({"unresponsive"})),
+    RedFlagRule("severe_bleeding", "severe bleeding", _groups({"bleeding_severe"})),
+    RedFlagRule("self_harm", "a mental health crisis", _groups({"self_harm"}), advice=CRISIS_ADVICE),
+]
+
+
+class RedFlagMatcher:
+    """
+    Finds red-flag rules in patient text using precompiled patterns only.
+
+    Text is split into clauses and comma-separated segments. A negation cue ("no",
+    "don't have", "denies", ...) only denies features starting within a few words after
+    it in the same segment, never later findings, and a cue that is part of a feature
+    itself ("can not breathe", "bleeding doesn't stop") is not a cue. Missing a red flag
+    costs more than a false alarm, so the scope is kept narrow.
+    """
+
+    def __init__(self, rules: Optional[List[RedFlagRule]] = None,
+                 feature_patterns: Optional[Dict[str, str]] = None):
+        """
+        Initialize the matcher
+
+        Args:
+            rules: Red-flag rules (defaults to RED_FLAG_RULES)
+            feature_patterns: Feature name -> regex (defaults to FEATURE_PATTERNS)
+        """
+        self.rules = rules or RED_FLAG_RULES
+        self._features = [(name, re.compile(pattern)) for name, pattern in (feature_patterns or FEATURE_PATTERNS).items()]
+
+    def _spans(self, segment: str) -> List[Tuple[str, int, int]]:
+        spans = [(name, match.start(), match.end())
+                 for name, pattern in self._features for match in pattern.finditer(segment)]
+        spans.extend((KEYWORD_FEATURES[match.group()], match.start(), match.end())
+                     for pattern in SYMPTOM_PATTERNS for match in pattern.finditer(segment)
+                     if match.group() in KEYWORD_FEATURES)
+        return spans
+
+    def features(self, text: str) -> Set[str]:
+        """
+        Features affirmed in the text
+
+        Args:
+            text: Patient text
+
+        Returns:
+            Feature names, excluding negated mentions
+        """
+        found: Set[str] = set()
+        for clause in CLAUSE_BREAK.split(text.lower()):
+            for segment in clause.split(","):
+                spans = self._spans(segment)
+                negated = []
+                for cue in NEGATION.finditer(segment):
+                    if any(start <= cue.start() < end for _, start, end in spans):
+                        continue
+                    scope = NEGATION_SCOPE.match(segment, cue.end())
+                    negated.append((cue.start(), scope.end() if scope else cue.end()))
+                found.update(name for name, start, _ in spans
+                             if not any(low <= start < high for low, high in negated))
+        return found
+
+    def match(self, text: str) -> List[RedFlagRule]:
+        """
+        Rules that fire for the text
+
+        Args:
+            text: Patient text
+
+        Returns:
+            Matching rules in RED_FLAG_RULES order
+        """
+        features = self.features(text)
+        return [rule for rule in self.rules if rule.matches(features)]
+
+    def triage(self, messages: List[str], flagged: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Check the patient's messages for red flags
+
+        Args:
+            messages: User messages so far (features can co-occur across messages)
+            flagged: Rule names already reported, which do not trigger a new advisory
+
+        Returns:
+            {"emergency": True, "flags": all rule names, "new_flags": names not reported
+            before, "advisory": text} or None when no rule fires
+        """
+        rules = self.match("\n".join(messages))
+        if not rules:
+            return None
+        flagged = set(flagged)
+        new_rules = [rule for rule in rules if rule.name not in flagged]
+        return {
+            "emergency": True,
+            "flags": [rule.name for rule in rules],
+            "new_flags": [rule.name for rule in new_rules],
+            "advisory": build_advisory(new_rules or rules),
+        }
+
+
+def build_advisory(rules: List[RedFlagRule]) -> str:
+    """
+    Emergency message for the rules that fired
+
+    Args:
+        rules: Matching rules
+
+    Returns:
+        Advisory text naming the suspected emergencies
+    """
+    labels = []
+    for rule in rules:
+        if rule.advice == EMERGENCY_ADVICE and rule.label not in labels:
+            labels.append(rule.label)
+    parts = []
+    if labels:
+        parts.append(f"Your symptoms could be a sign of {' or '.join(labels)}. {EMERGENCY_ADVICE} "
+                     "Do not wait for this assessment to finish.")
+    if any(rule.advice == CRISIS_ADVICE for rule in rules):
+        parts.append(CRISIS_ADVICE)
+    return " ".join(parts)
+
+
+# Process-wide matcher; patterns are compiled once at import
+red_flag_matcher = RedFlagMatcher()
@@ -0,0 +1,93 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+class SessionStore:
+    """Bounded, thread-safe store of conversation state keyed by session id.
+
+    Sessions idle for longer than ``ttl`` seconds expire, and the least recently
+    used session is evicted once ``max_sessions`` is reached. Each session has its
+    own lock, so concurrent requests for one session run one at a time while
+    different sessions proceed in parallel.
+    """
+
+    def __init__(self, max_sessions=1000, ttl=3600):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        # session id -> [expires_at, state, lock, requests in flight]
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def _entry(self, session_id, create=True):
+        now = time.monotonic()
+        entry = self._entries.get(session_id)
+        if entry is not None and entry[0] < now and not entry[3]:
+            del self._entries[session_id]
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            if not create:
+                return None
+            entry = [now + self.ttl, None, threading.Lock(), 0]
+            self._entries[session_id] = entry
+            self._evict(keep=session_id)
+        entry[0] = now + self.ttl
+        self._entries.move_to_end(session_id)
+        return entry
+
+    def _evict(self, keep=None):
+        # Sessions with a request in flight are skipped rather than dropped mid-turn,
+        # so the store can briefly hold more than max_sessions
+        for session_id in list(self._entries):
+            if len(self._entries) <= self.max_sessions:
+                break
+            if session_id != keep and not self._entries[session_id][3]:
+                del self._entries[session_id]
+                self.evictions += 1
+
+    @contextmanager
+    def session(self, session_id):
+        """Hold the session's lock for the duration of one request"""
+        # Pin the entry before letting go of the store lock: a request still waiting for
+        # the session lock must not lose its entry to eviction or expiry
+        with self._lock:
+            entry = self._entry(session_id)
+            entry[3] += 1
+        try:
+            with entry[2]:
+                yield
+        finally:
+            with self._lock:
+                entry[3] -= 1
+
+    def get(self, session_id):
+        with self._lock:
+            entry = self._entry(session_id, create=False)
+            return entry[1] if entry is not None else None
+
+    def put(self, session_id, state):
+        with self._lock:
+            self._entry(session_id)[1] = state
+
+    def delete(self, session_id):
+        with self._lock:
+            entry = self._entries.get(session_id)
+            if entry is not None:
+                entry[1] = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": sum(1 for entry in self._entries.values() if entry[1] is not None),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,196 @@
+import math
+import threading
+from collections import defaultdict
+
+
+DEFAULT_CELL_SIZE = 0.02
+
+
+EARTH_RADIUS_METERS = 6_371_008.8
+
+# Stored for lookups, ingestion and index refreshes; never part of a provider returned to clients
+INTERNAL_FIELDS = ("_id", "location", "geo_cell", "specialty_tokens", "updated_at")
+
+
+def public_document(document, **fields):
+    """Copy of a provider without its internal fields, plus any extra ``fields``"""
+    return {**{key: value for key, value in document.items() if key not in INTERNAL_FIELDS}, **fields}
+
+
+def planar_distance(latitude, longitude, other_latitude, other_longitude):
+    return ((other_latitude - latitude) ** 2 + (other_longitude - longitude) ** 2) ** 0.5
+
+
+def haversine_meters(latitude, longitude, other_latitude, other_longitude):
+    """Great-circle distance in metres, matching what $geoNear reports"""
+    phi, other_phi = math.radians(latitude), math.radians(other_latitude)
+    d_phi = other_phi - phi
+    d_lambda = math.radians(other_longitude - longitude)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi) * math.cos(other_phi) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
+
+class SpatialIndex:
+    """Uniform lat/lon grid answering box and k-nearest queries in memory.
+
+    Documents are bucketed into square cells of ``cell_size`` degrees. A query
+    scans rings of cells outwards from the query cell and stops as soon as the
+    next ring cannot contain anything closer than the current k-th result.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = defaultdict(dict)
+        self._cell_of = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size))
+
+    def upsert(self, key, document):
+        cell = self._cell(document["latitude"], document["longitude"])
+        with self._lock:
+            previous = self._cell_of.get(key)
+            if previous is not None and previous != cell:
+                self._cells[previous].pop(key, None)
+            self._cells[cell][key] = document
+            self._cell_of[key] = cell
+
+    def remove(self, key):
+        with self._lock:
+            cell = self._cell_of.pop(key, None)
+            if cell is not None:
+                self._cells[cell].pop(key, None)
+
+    def nearest(self, latitude, longitude, k=None, radius=0.1, inner_radius=0, predicate=None):
+        """Return documents inside the ``radius`` box around a point, closest first.
+
+        Each returned document is a public copy (see ``public_document``) with a
+        ``distance`` field. ``k`` caps
+        the number of results; ``predicate`` filters documents before ranking.
+        Documents inside the ``inner_radius`` box are skipped, which lets
+        callers search one ring at a time.
+        """
+        center_row, center_col = self._cell(latitude, longitude)
+        max_ring = math.ceil(radius / self.cell_size) + 1
+        hits = []
+
+        with self._lock:
+            for ring in range(max_ring + 1):
+                for cell in self._ring_cells(center_row, center_col, ring):
+                    bucket = self._cells.get(cell)
+                    if not bucket:
+                        continue
+                    for document in bucket.values():
+                        lat_offset = abs(document["latitude"] - latitude)
+                        lon_offset = abs(document["longitude"] - longitude)
+                        if lat_offset >= radius or lon_offset >= radius:
+                            continue
+                        if lat_offset < inner_radius and lon_offset < inner_radius:
+                            continue
+                        if predicate is not None and not predicate(document):
+                            continue
+                        distance = planar_distance(latitude, longitude, document["latitude"], document["longitude"])
+                        hits.append((distance, document))
+
+                # Anything in a ring we have not scanned yet is at least
+                # ``ring * cell_size`` away from the query point.
+                if k is not None and len(hits) >= k:
+                    hits.sort(key=lambda hit: hit[0])
+                    if hits[k - 1][0] <= ring * self.cell_size:
+                        break
+
+        hits.sort(key=lambda hit: hit[0])
+        if k is not None:
+            hits = hits[:k]
+        return [public_document(document, distance=distance) for distance, document in hits]
+
+    @staticmethod
+    def _ring_cells(center_row, center_col, ring):
+        if ring == 0:
+            yield (center_row, center_col)
+            return
+        for col in range(center_col - ring, center_col + ring + 1):
+            yield (center_row - ring, col)
+            yield (center_row + ring, col)
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield (row, center_col - ring)
+            yield (row, center_col + ring)
+
+
+class CollectionIndex:
+    """Keeps a SpatialIndex in sync with a MongoDB collection.
+
+    The collection is loaded once up front. A background thread then polls for
+    documents inserted (by ``_id``) or re-ingested (by ``updated_at``) since the
+    last refresh, and periodically rebuilds the whole index so that deletions
+    are picked up too.
+    """
+
+    def __init__(self, collection, refresh_interval=30, rebuild_every=20, cell_size=DEFAULT_CELL_SIZE):
+        self.collection = collection
+        self.refresh_interval = refresh_interval
+        self.rebuild_every = rebuild_every
+        self.cell_size = cell_size
+        self.index = SpatialIndex(cell_size)
+        self._last_id = None
+        self._last_updated = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self):
+        index = SpatialIndex(self.cell_size)
+        self._last_id = None
+        self._last_updated = None
+        for document in self.collection.find({}).sort("_id", 1):
+            self._add(index, document)
+        self.index = index
+
+    def refresh(self):
+        changes = []
+        if self._last_id is not None:
+            changes.append({"_id": {"$gt": self._last_id}})
+        if self._last_updated is not None:
+            # $gte because later documents of an in-progress ingest batch share the same timestamp
+            changes.append({"updated_at": {"$gte": self._last_updated}})
+        query = {"$or": changes} if changes else {}
+        for document in self.collection.find(query).sort("_id", 1):
+            self._add(self.index, document)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self.load()
+        self._thread = threading.Thread(target=self._run, name=f"spatial-index-{self.collection.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def nearest(self, latitude, longitude, k=None, radius=0.1, inner_radius=0, predicate=None):
+        return self.index.nearest(latitude, longitude, k=k, radius=radius, inner_radius=inner_radius, predicate=predicate)
+
+    def _run(self):
+        refreshes = 0
+        while not self._stop.wait(self.refresh_interval):
+            refreshes += 1
+            try:
+                if refreshes % self.rebuild_every == 0:
+                    self.load()
+                else:
+                    self.refresh()
+            except Exception as e:
+                print(f"---ERROR--- Failed to refresh spatial index for {self.collection.name}: {e}")
+
+    def _add(self, index, document):
+        key = document.pop("_id")
+        if self._last_id is None or key > self._last_id:
+            self._last_id = key
+        updated_at = document.get("updated_at")
+        if updated_at is not None and (self._last_updated is None or updated_at > self._last_updated):
+            self._last_updated = updated_at
+        if isinstance(document.get("latitude"), (int, float)) and isinstance(document.get("longitude"), (int, float)):
+            index.upsert(key, document)
@@ -0,0 +1,166 @@
+import re
+
+# Maps lay terms, practitioner titles and spelling variants onto one canonical token per specialty
+SPECIALTY_SYNONYMS = {
+    "heart": "cardiology",
+    "cardiac": "cardiology",
+    "cardiologist": "cardiology",
+    "cardiovascular": "cardiology",
+    "skin": "dermatology",
+    "dermatologist": "dermatology",
+    "child": "pediatrics",
+    "children": "pediatrics",
+    "kids": "pediatrics",
+    "pediatric": "pediatrics",
+    "pediatrician": "pediatrics",
+    "paediatrics": "pediatrics",
+    "brain": "neurology",
+    "nerve": "neurology",
+    "neurological": "neurology",
+    "neurologist": "neurology",
+    "stomach": "gastroenterology",
+    "digestive": "gastroenterology",
+    "gastroenterologist": "gastroenterology",
+    "gi": "gastroenterology",
+    "bone": "orthopedics",
+    "bones": "orthopedics",
+    "joint": "orthopedics",
+    "orthopedic": "orthopedics",
+    "orthopaedics": "orthopedics",
+    "orthopedist": "orthopedics",
+    "lung": "pulmonology",
+    "lungs": "pulmonology",
+    "respiratory": "pulmonology",
+    "pulmonary": "pulmonology",
+    "pulmonologist": "pulmonology",
+    "kidney": "nephrology",
+    "renal": "nephrology",
+    "nephrologist": "nephrology",
+    "cancer": "oncology",
+    "oncologist": "oncology",
+    "eye": "ophthalmology",
+    "eyes": "ophthalmology",
+    "ophthalmologist": "ophthalmology",
+    "ear": "otolaryngology",
+    "nose": "otolaryngology",
+    "throat": "otolaryngology",
+    "ent": "otolaryngology",
+    "mental": "psychiatry",
+    "psychiatric": "psychiatry",
+    "psychiatrist": "psychiatry",
+    "hormone": "endocrinology",
+    "diabetes": "endocrinology",
+    "thyroid": "endocrinology",
+    "endocrinologist": "endocrinology",
+    "women": "gynecology",
+    "gynecologist": "gynecology",
+    "obgyn": "gynecology",
+    "pregnancy": "obstetrics",
+    "urinary": "urology",
+    "urologist": "urology",
+    "allergy": "allergy",
+    "allergies": "allergy",
+    "allergist": "allergy",
+    "arthritis": "rheumatology",
+    "rheumatologist": "rheumatology",
+    "primary": "primary-care",
+    "family": "primary-care",
+    "gp": "primary-care",
+    "internist": "internal",
+    "emergency": "emergency",
+    "er": "emergency",
+}
+
+# Multi-word names whose words mean something else on their own; matched before single words
+SPECIALTY_PHRASES = {
+    ("general", "practice"): "primary-care",
+    ("general", "practitioner"): "primary-care",
+    ("general", "surgery"): "general-surgery",
+    ("general", "surgeon"): "general-surgery",
+}
+
+# Words that carry no specialty information and would otherwise match almost every provider
+STOP_WORDS = {"and", "of", "the", "general", "medicine", "practice", "care", "doctor", "doctors", "specialist", "physician", "surgery", "md"}
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def normalize_specialty(text):
+    """Turn a free-text specialty into a sorted list of canonical tokens"""
+    if not text:
+        return []
+    words = _WORD.findall(str(text).lower())
+    tokens = set()
+    i = 0
+    while i < len(words):
+        phrase = SPECIALTY_PHRASES.get(tuple(words[i:i + 2]))
+        if phrase:
+            tokens.add(phrase)
+            i += 2
+            continue
+        if words[i] not in STOP_WORDS:
+            tokens.add(SPECIALTY_SYNONYMS.get(words[i], words[i]))
+        i += 1
+    return sorted(tokens)
+
+
+CANONICAL_SPECIALTIES = set(SPECIALTY_SYNONYMS.values()) | set(SPECIALTY_PHRASES.values())
+
+
+# Practitioner titles, which unlike lay words ("heart", "women", "child") name a specialty on their own
+_TITLE = r"[a-z]+(?:ist|ian)|ent|gp|ob-?gyn|doctor|specialist|physician|surgeon|provider|practitioner"
+
+# "see a cardiologist", "consult your primary care doctor", "referral to an ENT specialist"
+_REFERRAL = re.compile(
+    r"\b(?:see|visit|consult(?:ing)?|contact|(?:follow up|check in|make an appointment|book an appointment) with"
+    r"|referr?(?:al|ed)? to|refer you to)\s+(?:(?:a|an|the|your|with)\s+)?((?:[a-z-]+\s+){0,3}?(?:" + _TITLE + r"))\b"
+)
+_TITLE_WORD = re.compile(r"\b(?:" + _TITLE + r")\b")
+_NEGATION = re.compile(r"\b(?:no|not|never|without|unnecessary|(?:do|does|did|is|are|need)(?:n'?t| not))\b")
+_SENTENCE = re.compile(r"[^.!?\n]+")
+_HEADING = re.compile(r"^\s*(?:#+\s*|\*\*|\d+\.\s*\**)?[^a-z]*(?:recommend|next steps?|referral|follow-up)[^\n]*$")
+_SECTION_BREAK = re.compile(r"^\s*(?:#+\s|\*\*[^*]+\*\*\s*:?\s*$|\d+\.\s)")
+
+# Emergency care is covered by the health centers; a doctor filter for it would hide every other doctor
+_NOT_FILTERS = {"emergency"}
+
+
+def _specialties_in(text):
+    return [token for token in normalize_specialty(text) if token in CANONICAL_SPECIALTIES and token not in _NOT_FILTERS]
+
+
+def _recommendation_lines(report):
+    """Lines of the report's recommendation / next-steps section, if it has one"""
+    lines, inside = [], False
+    for line in report.splitlines():
+        if _HEADING.match(line):
+            # The heading line may carry the recommendation itself ("**Next steps**: see a ...")
+            inside = True
+        elif inside and _SECTION_BREAK.match(line):
+            inside = False
+        if inside:
+            lines.append(line)
+    return lines
+
+
+def recommended_specialties(report):
+    """Pick the specialties an analysis report explicitly recommends, e.g. "see a cardiologist" -> cardiology
+
+    Only referral phrases ("see a ...", "referral to ...") anywhere in the report and practitioner
+    titles in its recommendation section count, and negated ones ("no need to see a ...") are skipped.
+    Lay words elsewhere ("no history of heart disease") never become filters.
+    """
+    if not report:
+        return []
+    report = str(report).lower()
+    found = set()
+    for sentence in _SENTENCE.finditer(report):
+        for match in _REFERRAL.finditer(sentence.group()):
+            if not _NEGATION.search(sentence.group(), 0, match.start(1)):
+                found.update(_specialties_in(match.group(1)))
+    for line in _recommendation_lines(report):
+        for sentence in _SENTENCE.finditer(line):
+            for match in _TITLE_WORD.finditer(sentence.group()):
+                if not _NEGATION.search(sentence.group(), 0, match.start()):
+                    found.update(_specialties_in(match.group()))
+    return sorted(found)
@@ -0,0 +1,83 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import PropertyMock, patch
+from database import Database
+
+
+PROVIDER = {
+    "_id": 1,
+    "name": "Dr Heart",
+    "specialty": "Cardiology",
+    "latitude": 1.0,
+    "longitude": 1.0,
+    "location": {"type": "Point", "coordinates": [1.0, 1.0]},
+    "geo_cell": "100:100",
+    "specialty_tokens": ["cardiology"],
+    "updated_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+}
+
+
+def project(document, projection):
+    return {key: value for key, value in document.items() if not (projection or {}).get(key) == 0}
+
+
+class FakeCursor(list):
+    def sort(self, *args):
+        return self
+
+
+class FakeCollection:
+    """Collection answering every query with all of its documents, honouring exclusion projections"""
+
+    def __init__(self, name, documents):
+        self.name = name
+        self.documents = documents
+
+    def find(self, query=None, projection=None):
+        return FakeCursor(project(dict(document), projection) for document in self.documents)
+
+    def aggregate(self, pipeline, **kwargs):
+        projection = next((stage["$project"] for stage in pipeline if "$project" in stage), None)
+        return iter([project({**document, "distance": 0.0}, projection) for document in self.documents])
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {
+            "doctors": FakeCollection("doctors", [PROVIDER]),
+            "health_centers": FakeCollection("health_centers", []),
+            "provider_versions": FakeCollection("provider_versions", []),
+        }
+
+    def __getitem__(self, name):
+        return self.collections[name]
+
+    def __getattr__(self, name):
+        return self.collections[name]
+
+
+class TestProviderShape(unittest.TestCase):
+    def lookup(self, backend, method, *args, **kwargs):
+        with patch.object(Database, "database", new_callable=PropertyMock, return_value=FakeDatabase()):
+            database = Database(backend=backend)
+            try:
+                return list(getattr(database, method)(*args, **kwargs))
+            finally:
+                database.close()
+
+    def test_every_backend_returns_the_public_shape(self):
+        public = {"name", "specialty", "latitude", "longitude", "distance"}
+        for backend in ("box", "index", "geonear"):
+            for method, args in (("get_doctors", (1.0, 1.0, "cardiologist")),
+                                 ("iter_doctors", (1.0, 1.0, "cardiologist"))):
+                with self.subTest(backend=backend, method=method):
+                    results = self.lookup(backend, method, *args)
+                    self.assertEqual(len(results), 1)
+                    self.assertEqual(set(results[0]), public)
+
+    def test_index_still_filters_on_internal_fields(self):
+        self.assertEqual(self.lookup("index", "get_doctors", 1.0, 1.0, "dermatologist"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import unittest
+from unittest.mock import patch
+from session_store import SessionStore
+
+
+class GatedLock:
+    """Session lock that pauses a request between pinning its entry and acquiring the lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reached = threading.Event()
+        self.gate = threading.Event()
+
+    def locked(self):
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.reached.set()
+        self.gate.wait(5)
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+
+class TestSessionStore(unittest.TestCase):
+    def test_put_get_delete(self):
+        store = SessionStore()
+        self.assertIsNone(store.get("a"))
+        store.put("a", {"messages": []})
+        self.assertEqual(store.get("a"), {"messages": []})
+        store.delete("a")
+        self.assertIsNone(store.get("a"))
+        self.assertEqual(store.stats()["sessions"], 0)
+
+    def test_lru_eviction(self):
+        store = SessionStore(max_sessions=2)
+        store.put("a", 1)
+        store.put("b", 2)
+        store.get("a")
+        store.put("c", 3)
+        self.assertEqual((store.get("a"), store.get("b"), store.get("c")), (1, None, 3))
+        self.assertEqual(store.stats()["evictions"], 1)
+
+    def test_expiry(self):
+        store = SessionStore(ttl=60)
+        store.put("a", 1)
+        with patch("session_store.time.monotonic", return_value=10**12):
+            self.assertIsNone(store.get("a"))
+        self.assertEqual(store.stats()["expirations"], 1)
+
+    def test_requests_for_one_session_run_one_at_a_time(self):
+        store = SessionStore()
+        active, overlaps = [0], []
+
+        def request():
+            with store.session("a"):
+                active[0] += 1
+                overlaps.append(active[0])
+                threading.Event().wait(0.01)
+                active[0] -= 1
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(max(overlaps), 1)
+
+    def test_eviction_while_acquiring_keeps_the_entry(self):
+        store = SessionStore(max_sessions=1)
+        store.put("a", "state")
+        lock = store._entries["a"][2] = GatedLock()
+        seen = []
+
+        def request():
+            with store.session("a"):
+                seen.append(store.get("a"))
+
+        thread = threading.Thread(target=request)
+        thread.start()
+        self.assertTrue(lock.reached.wait(5))
+        # The request is pinned but does not hold the session lock yet
+        store.put("b", 1)
+        store.put("c", 2)
+        with patch("session_store.time.monotonic", return_value=10**12):
+            store.get("a")
+        lock.gate.set()
+        thread.join(5)
+        self.assertEqual(seen, ["state"])
+        self.assertIs(store._entries["a"][2], lock)
+
+
+if __name__ == "__main__":
+    unittest.main()